@@ -0,0 +1,319 @@
+"""
+Persistent biosphere3 flow index for Sustain 4.0 BioEngine
+Resolves user flow names to biosphere3 codes through a local SQLite FTS5 index
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+from data_paths import ensure_data_dir, ensure_path_within_data
+
+# Brightway is optional; the index is only consulted when linking databases
+try:
+    import bw2data as bd  # type: ignore
+except ImportError:
+    bd = None
+
+
+MAX_CANDIDATES = 5
+"""Ranked candidates kept per search term"""
+
+INDEX_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS index_state (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS flows (
+        id INTEGER PRIMARY KEY,
+        code TEXT NOT NULL,
+        name TEXT NOT NULL,
+        name_key TEXT NOT NULL,
+        categories TEXT NOT NULL,
+        unit TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_flows_name_key ON flows (name_key)",
+    """
+    CREATE TABLE IF NOT EXISTS resolved_terms (
+        search_term TEXT NOT NULL,
+        category TEXT NOT NULL,
+        candidates TEXT NOT NULL,
+        PRIMARY KEY (search_term, category)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS project_links (
+        project_key TEXT NOT NULL,
+        flow_name TEXT NOT NULL,
+        search_term TEXT NOT NULL,
+        code TEXT,
+        PRIMARY KEY (project_key, flow_name)
+    )
+    """,
+)
+
+FTS_SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS flows_fts USING fts5(
+        name, categories, content='flows', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+"""
+
+
+def get_index_path():
+    """Returns the biosphere index database path inside ./data."""
+    return ensure_path_within_data(ensure_data_dir() / "biosphere_index.db")
+
+
+def biosphere_fingerprint(database_name: str = 'biosphere3') -> str:
+    """Fingerprint of the current Brightway project's biosphere database"""
+
+    metadata = dict(bd.databases.get(database_name, {}))
+    payload = [bd.projects.current, database_name, len(bd.Database(database_name)), metadata]
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _tokens(text: str) -> List[str]:
+    """Lower-cased, accent-free word tokens (mirrors the FTS5 unicode61 tokenizer)"""
+
+    text = ''.join(ch for ch in unicodedata.normalize('NFKD', text.casefold()) if not unicodedata.combining(ch))
+    return list(dict.fromkeys(''.join(ch if ch.isalnum() else ' ' for ch in text).split()))
+
+
+def _token_matches(query_token: str, name_tokens: List[str]) -> bool:
+    if query_token.isdigit():
+        return query_token in name_tokens
+    return any(token.startswith(query_token) for token in name_tokens)
+
+
+def _match_query(term: str) -> str:
+    """FTS5 query matching any token of the term (words as prefixes, numbers exactly)"""
+
+    return ' OR '.join(f'"{token}"' if token.isdigit() else f'"{token}"*' for token in _tokens(term))
+
+
+def _coverage(term_tokens: List[str], name: str) -> float:
+    """Share of the search term's tokens found in a flow name"""
+
+    if not term_tokens:
+        return 0.0
+    name_tokens = _tokens(name)
+    return sum(_token_matches(token, name_tokens) for token in term_tokens) / len(term_tokens)
+
+
+def _category_tier(categories: str, category: str) -> int:
+    """0 for the exact compartment, 1 for a sub-compartment of it, 2 otherwise"""
+
+    if not category:
+        return 2
+    if categories == category:
+        return 0
+    return 1 if categories.split('::', 1)[0] == category else 2
+
+
+class BiosphereIndex:
+    """SQLite-backed search index over biosphere3 flows with memoized resolutions"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or get_index_path()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        with self._conn:
+            for statement in INDEX_SCHEMA:
+                self._conn.execute(statement)
+            try:
+                self._conn.execute(FTS_SCHEMA)
+                self.fts_available = True
+            except sqlite3.OperationalError:
+                # SQLite built without FTS5: fall back to exact name matches
+                self.fts_available = False
+        self._memo: Dict[Tuple[str, str, str], List[dict]] = {}
+
+    @property
+    def fingerprint(self) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM index_state WHERE key = 'fingerprint'").fetchone()
+        return row[0] if row else None
+
+    def sync(self, biosphere_db, fingerprint: str) -> bool:
+        """Rebuilds the index when the biosphere fingerprint changed; returns True if rebuilt"""
+
+        with self._lock:
+            if self.fingerprint == fingerprint:
+                return False
+
+            rows = []
+            for flow in biosphere_db:
+                name = str(flow.get('name') or '')
+                categories = '::'.join(flow.get('categories') or ())
+                rows.append((flow['code'], name, name.casefold(), categories, flow.get('unit')))
+
+            with self._conn:
+                # Memoized resolutions refer to the previous biosphere contents
+                self._conn.execute("DELETE FROM resolved_terms")
+                self._conn.execute("DELETE FROM project_links")
+                self._conn.execute("DELETE FROM flows")
+                self._conn.executemany(
+                    "INSERT INTO flows (code, name, name_key, categories, unit) VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                if self.fts_available:
+                    self._conn.execute("INSERT INTO flows_fts(flows_fts) VALUES ('rebuild')")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO index_state (key, value) VALUES ('fingerprint', ?)",
+                    (fingerprint,)
+                )
+            self._memo.clear()
+            return True
+
+    def resolve(self, queries: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], List[dict]]:
+        """
+        Ranked biosphere candidates for (search_term, category) pairs
+
+        Exact name matches rank first, then the share of search tokens matched,
+        compartment agreement and finally the FTS5 bm25 rank.
+        All unresolved terms are searched in one batched query and memoized.
+        """
+
+        with self._lock:
+            fingerprint = self.fingerprint
+            queries = list(dict.fromkeys((str(term), str(category or '')) for term, category in queries))
+            results = {}
+            pending = []
+            for query in queries:
+                memo = self._memo.get((fingerprint,) + query)
+                if memo is None:
+                    pending.append(query)
+                else:
+                    results[query] = memo
+
+            if pending:
+                stored = self._load_resolved(pending)
+                missing = [query for query in pending if query not in stored]
+                if missing:
+                    found = self._search(missing)
+                    with self._conn:
+                        self._conn.executemany(
+                            "INSERT OR REPLACE INTO resolved_terms (search_term, category, candidates) VALUES (?, ?, ?)",
+                            [query + (json.dumps(found[query]),) for query in missing]
+                        )
+                    stored.update(found)
+                for query in pending:
+                    self._memo[(fingerprint,) + query] = stored[query]
+                    results[query] = stored[query]
+
+            return results
+
+    def _load_resolved(self, queries: List[Tuple[str, str]]) -> Dict[Tuple[str, str], List[dict]]:
+        self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_terms (search_term TEXT, category TEXT)")
+        with self._conn:
+            self._conn.execute("DELETE FROM lookup_terms")
+            self._conn.executemany("INSERT INTO lookup_terms VALUES (?, ?)", queries)
+        rows = self._conn.execute(
+            """
+            SELECT r.search_term, r.category, r.candidates
+            FROM lookup_terms AS l
+            JOIN resolved_terms AS r USING (search_term, category)
+            """
+        ).fetchall()
+        return {(term, category): json.loads(candidates) for term, category, candidates in rows}
+
+    def _search(self, queries: List[Tuple[str, str]]) -> Dict[Tuple[str, str], List[dict]]:
+        terms = list(dict.fromkeys(term for term, _ in queries))
+        self._conn.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS search_terms (search_term TEXT, name_key TEXT, fts_query TEXT)"
+        )
+        with self._conn:
+            self._conn.execute("DELETE FROM search_terms")
+            self._conn.executemany(
+                "INSERT INTO search_terms VALUES (?, ?, ?)",
+                [(term, term.casefold(), _match_query(term)) for term in terms]
+            )
+
+        hits: Dict[str, Dict[str, dict]] = {term: {} for term in terms}
+        exact = self._conn.execute(
+            """
+            SELECT s.search_term, f.code, f.name, f.categories
+            FROM search_terms AS s
+            JOIN flows AS f ON f.name_key = s.name_key
+            """
+        )
+        for term, code, name, categories in exact:
+            hits[term][code] = {'code': code, 'name': name, 'categories': categories, 'exact': True,
+                                'coverage': 1.0, 'rank': 0.0}
+
+        if self.fts_available:
+            ranked = self._conn.execute(
+                """
+                SELECT s.search_term, f.code, f.name, f.categories, flows_fts.rank
+                FROM search_terms AS s
+                JOIN flows_fts ON flows_fts MATCH s.fts_query
+                JOIN flows AS f ON f.id = flows_fts.rowid
+                WHERE s.fts_query != ''
+                """
+            )
+            term_tokens = {term: _tokens(term) for term in terms}
+            for term, code, name, categories, rank in ranked:
+                if code not in hits[term]:
+                    hits[term][code] = {'code': code, 'name': name, 'categories': categories, 'exact': False,
+                                        'coverage': _coverage(term_tokens[term], name), 'rank': rank}
+
+        found = {}
+        for term, category in queries:
+            candidates = sorted(
+                hits[term].values(),
+                key=lambda hit: (not hit['exact'], -hit['coverage'], _category_tier(hit['categories'], category),
+                                 hit['rank'], len(hit['name']), hit['code'])
+            )
+            found[(term, category)] = candidates[:MAX_CANDIDATES]
+        return found
+
+    def project_links(self, project_key: str) -> Dict[str, Tuple[str, Optional[str]]]:
+        """Flow name -> (search term, biosphere code) remembered for a project (None marks a known miss)"""
+
+        rows = self._conn.execute(
+            "SELECT flow_name, search_term, code FROM project_links WHERE project_key = ?", (project_key,)
+        ).fetchall()
+        return {flow_name: (search_term, code) for flow_name, search_term, code in rows}
+
+    def remember_project_links(self, project_key: str, links: Dict[str, Tuple[str, Optional[str]]]):
+        """Stores (or overrides) a project's flow name -> (search term, biosphere code) choices"""
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO project_links (project_key, flow_name, search_term, code) VALUES (?, ?, ?, ?)",
+                [(project_key, flow_name, term, code) for flow_name, (term, code) in links.items()]
+            )
+
+
+def is_ambiguous(candidates: List[dict], category: str) -> bool:
+    """True when the two best candidates cannot be told apart by name or compartment"""
+
+    if len(candidates) < 2:
+        return False
+    best, runner_up = candidates[0], candidates[1]
+    if best['exact'] != runner_up['exact'] or best['coverage'] != runner_up['coverage']:
+        return False
+    return _category_tier(best['categories'], category) == _category_tier(runner_up['categories'], category)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_biosphere_index() -> BiosphereIndex:
+    """Process-wide biosphere index, opened on first use"""
+
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = BiosphereIndex()
+    return _index
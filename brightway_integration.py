@@ -3,13 +3,23 @@ Brightway 2.5 Integration for Sustain 4.0 BioEngine
 Handles LCI data import, validation, and database creation
 """
 
+import os
+import re
+import sqlite3
+import zipfile
+from abc import ABC, abstractmethod
+import numpy as np  # type: ignore
 import pandas as pd  # type: ignore
-from typing import Dict, List, Tuple, Optional
+from array import array
+from typing import BinaryIO, Dict, Iterator, List, Tuple, Optional, Union
 import streamlit as st  # type: ignore
 from io import BytesIO
-from openpyxl import Workbook  # type: ignore
+from openpyxl import Workbook, load_workbook  # type: ignore
 from openpyxl.styles import Font, PatternFill  # type: ignore
 import plotly.graph_objects as go  # type: ignore
+from inventory import PYARROW_AVAILABLE, InventoryDiff, LCIInventory, as_inventory, diff_inventories
+from biosphere_index import biosphere_fingerprint, get_biosphere_index, is_ambiguous
+from network_layout import get_process_network
 
 # Brightway imports - optional, only needed when actually creating databases
 try:
@@ -20,42 +30,171 @@ except ImportError:
     BRIGHTWAY_AVAILABLE = False
 
 
-class SustainExcelImporter:
+def _cell_text(value) -> str:
+    """Text of one sheet cell; whole-number floats lose their '.0' (missing values become 'nan')"""
+    
+    if value is None:
+        return 'nan'
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _text_column(series: pd.Series) -> pd.Series:
+    """Column form of _cell_text, so DataFrame and streamed rows yield the same text"""
+    
+    if pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty'):
+        return series.astype(str).fillna('nan').str.strip()
+    # Numeric or mixed cells: convert each distinct value once
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    texts = np.array([_cell_text(value) for value in uniques], dtype=object)
+    return pd.Series(texts[codes], index=series.index)
+
+
+def _iter_sheet_rows(worksheet, columns: List[str]) -> Iterator[tuple]:
+    """Yield the requested columns of each data row of a read-only worksheet"""
+    
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, ())
+    positions = {}
+    for position, name in enumerate(header):
+        if name is not None:
+            positions.setdefault(str(name).strip(), position)
+    missing = [column for column in columns if column not in positions]
+    if missing:
+        raise KeyError(missing[0])
+    
+    indices = [positions[column] for column in columns]
+    for row in rows:
+        if row is None:
+            continue
+        width = len(row)
+        values = tuple(row[i] if i < width else None for i in indices)
+        yield tuple(None if value == '' else value for value in values)
+
+
+class _ExchangeColumns:
     """
-    Import LCI data from Sustain 4.0 Excel template into Brightway
+    Compact column buffers for exchanges streamed row by row
+    
+    Repeated strings (codes, types, units, categories, flow names) are stored once and
+    referenced by integer ids; amounts and uncertainties live in typed arrays.
     """
     
-    def __init__(self, excel_path: str):
-        self.excel_path = excel_path
+    def __init__(self):
+        self.strings = []
+        self._string_ids = {}
+        self.activity_codes = array('q')
+        self.types = array('q')
+        self.flow_names = array('q')
+        self.amounts = array('d')
+        self.units = array('q')
+        self.categories = array('q')
+        self.uncertainties = array('d')
+    
+    def __len__(self) -> int:
+        return len(self.amounts)
+    
+    def _intern(self, text: Optional[str]) -> int:
+        if text is None:
+            return -1
+        string_id = self._string_ids.get(text)
+        if string_id is None:
+            string_id = len(self.strings)
+            self._string_ids[text] = string_id
+            self.strings.append(text)
+        return string_id
+    
+    def append(self, activity_code: str, exc_type: str, flow_name: str, amount: float,
+               unit: str, category: Optional[str], uncertainty: float):
+        self.activity_codes.append(self._intern(activity_code))
+        self.types.append(self._intern(exc_type))
+        self.flow_names.append(self._intern(flow_name))
+        self.amounts.append(amount)
+        self.units.append(self._intern(unit))
+        self.categories.append(self._intern(category))
+        self.uncertainties.append(uncertainty)
+    
+    def to_inventory(self, activities: List[dict]) -> LCIInventory:
+        """Hand the buffers over to a columnar inventory without building per-row dicts"""
+        
+        def categorical(ids):
+            return pd.Categorical.from_codes(np.frombuffer(ids, dtype=np.int64), categories=self.strings)
+        
+        return LCIInventory(activities, {
+            'activity_code': categorical(self.activity_codes),
+            'type': categorical(self.types),
+            'flow_name': categorical(self.flow_names),
+            'amount': np.frombuffer(self.amounts, dtype=np.float64),
+            'unit': categorical(self.units),
+            'category': categorical(self.categories),
+            'uncertainty': np.frombuffer(self.uncertainties, dtype=np.float64),
+        })
+
+
+# Sheet names shared by every input format (workbook sheets or bundle member names)
+REQUIRED_SHEETS = ['Project Metadata', 'Process Activities', 'Exchanges']
+FLOW_MAPPING_SHEET = 'Biosphere Flows Mapping'
+
+
+class LCIImporter(ABC):
+    """
+    Base class for LCI importers
+    
+    Subclasses only locate and read the template's sheets (see _sheet_names and
+    _read_sheet); parsing into activities/exchanges, validation and Brightway
+    export are shared, so every input format yields identical structures.
+    """
+    
+    FORMAT_LABEL = 'LCI data'
+    
+    def __init__(self, source: Union[str, BinaryIO]):
+        self.source = source
         self.metadata = {}
         self.activities = []
         self.exchanges = []
+        self.inventory = None
         self.flow_mapping = {}
+        self.exchange_index = {}
+        self.activity_name_index = {}
+        self.biosphere_candidates = {}
         self.validation_errors = []
         self.warnings = []
+    
+    def parse(self) -> bool:
+        """Parse the source and validate it"""
         
-    def parse_excel(self) -> bool:
-        """Parse Excel file and validate structure"""
+        return self._parse_tables()
+    
+    @abstractmethod
+    def _sheet_names(self) -> List[str]:
+        """Names of the sheets available in the source"""
+    
+    @abstractmethod
+    def _read_sheet(self, sheet_name: str, header: Optional[int] = 0) -> pd.DataFrame:
+        """Read one sheet as a DataFrame (header=None for the metadata sheet)"""
+    
+    def _parse_tables(self) -> bool:
+        """Parse the template's sheets through _read_sheet and validate them"""
         
         try:
-            # Read all sheets
-            xl_file = pd.ExcelFile(self.excel_path)
+            sheet_names = self._sheet_names()
             
             # Check required sheets
-            required_sheets = ['Project Metadata', 'Process Activities', 'Exchanges']
-            for sheet in required_sheets:
-                if sheet not in xl_file.sheet_names:
+            for sheet in REQUIRED_SHEETS:
+                if sheet not in sheet_names:
                     self.validation_errors.append(f"❌ Missing required sheet: {sheet}")
                     return False
             
             # Parse each sheet
-            self.metadata = self._parse_metadata(xl_file)
-            self.activities = self._parse_activities(xl_file)
-            self.exchanges = self._parse_exchanges(xl_file)
+            self.metadata = self._parse_metadata(self._read_sheet('Project Metadata', header=None))
+            self.activities = self._parse_activities(self._read_sheet('Process Activities'))
+            self.inventory = LCIInventory(self.activities, self._parse_exchanges(self._read_sheet('Exchanges')))
+            self.exchanges = self.inventory.exchanges
             
             # Optional: Flow mapping
-            if 'Biosphere Flows Mapping' in xl_file.sheet_names:
-                self.flow_mapping = self._parse_flow_mapping(xl_file)
+            if FLOW_MAPPING_SHEET in sheet_names:
+                self.flow_mapping = self._parse_flow_mapping(self._read_sheet(FLOW_MAPPING_SHEET))
             
             # Validate data
             self._validate_data()
@@ -63,91 +202,108 @@ class SustainExcelImporter:
             return len(self.validation_errors) == 0
             
         except Exception as e:
-            self.validation_errors.append(f"❌ Error parsing Excel: {str(e)}")
+            self.validation_errors.append(f"❌ Error parsing {self.FORMAT_LABEL}: {str(e)}")
             return False
     
-    def _parse_metadata(self, xl_file) -> dict:
-        """Parse project metadata sheet"""
+    def _parse_metadata(self, df: pd.DataFrame) -> dict:
+        """Parse project metadata sheet (key/value rows, no header)"""
         
-        df = pd.read_excel(xl_file, sheet_name='Project Metadata', header=None)
+        df = df[df[0].notna() & df[1].notna()]
+        return dict(zip(_text_column(df[0]), _text_column(df[1])))
+    
+    def _parse_activities(self, df: pd.DataFrame) -> List[dict]:
+        """Parse process activities sheet"""
         
-        metadata = {}
-        for _, row in df.iterrows():
-            if pd.notna(row[0]) and pd.notna(row[1]):
-                metadata[str(row[0]).strip()] = str(row[1]).strip()
+        df = df[df['Activity Code'].notna()]
         
-        return metadata
+        columns = zip(
+            _text_column(df['Activity Code']).tolist(),
+            _text_column(df['Activity Name']).tolist(),
+            _text_column(df['Unit']).tolist(),
+            _text_column(df['Location']).tolist(),
+            df['Reference Production'].astype('float64').tolist()
+        )
+        return [
+            {
+                'code': code,
+                'name': name,
+                'unit': unit,
+                'location': location,
+                'reference_production': reference_production
+            }
+            for code, name, unit, location, reference_production in columns
+        ]
     
-    def _parse_activities(self, xl_file) -> List[dict]:
-        """Parse process activities sheet"""
+    def _parse_exchanges(self, df: pd.DataFrame) -> Dict[str, object]:
+        """Parse exchanges sheet into inventory columns"""
         
-        df = pd.read_excel(xl_file, sheet_name='Process Activities')
+        df = df[df['Activity Code'].notna()]
         
-        activities = []
-        for _, row in df.iterrows():
-            if pd.notna(row['Activity Code']):
-                activities.append({
-                    'code': str(row['Activity Code']).strip(),
-                    'name': str(row['Activity Name']).strip(),
-                    'unit': str(row['Unit']).strip(),
-                    'location': str(row['Location']).strip(),
-                    'reference_production': float(row['Reference Production'])
-                })
+        category = df['Category']
         
-        return activities
-    
-    def _parse_exchanges(self, xl_file) -> List[dict]:
-        """Parse exchanges sheet"""
-        
-        df = pd.read_excel(xl_file, sheet_name='Exchanges')
-        
-        exchanges = []
-        for _, row in df.iterrows():
-            if pd.notna(row['Activity Code']):
-                exc = {
-                    'activity_code': str(row['Activity Code']).strip(),
-                    'type': str(row['Exchange Type']).strip().lower(),
-                    'flow_name': str(row['Flow Name']).strip(),
-                    'amount': float(row['Amount']),
-                    'unit': str(row['Unit']).strip(),
-                    'category': str(row['Category']).strip() if pd.notna(row['Category']) else None
-                }
-                
-                # Parse uncertainty if provided
-                if 'Uncertainty' in df.columns and pd.notna(row['Uncertainty']):
-                    uncertainty_str = str(row['Uncertainty'])
-                    if '±' in uncertainty_str:
-                        try:
-                            exc['uncertainty'] = float(uncertainty_str.replace('±', '').strip())
-                        except:
-                            pass
-                
-                exchanges.append(exc)
+        # Uncertainty is only kept for '±' entries that parse as numbers
+        if 'Uncertainty' in df.columns:
+            uncertainty_text = _text_column(df['Uncertainty']).where(df['Uncertainty'].notna(), '')
+            uncertainties = pd.to_numeric(
+                uncertainty_text.str.replace('±', '', regex=False).str.strip(),
+                errors='coerce'
+            ).where(uncertainty_text.str.contains('±', regex=False))
+        else:
+            uncertainties = pd.Series(float('nan'), index=df.index)
         
-        return exchanges
+        return {
+            'activity_code': _text_column(df['Activity Code']).tolist(),
+            'type': _text_column(df['Exchange Type']).str.lower().tolist(),
+            'flow_name': _text_column(df['Flow Name']).tolist(),
+            'amount': df['Amount'].astype('float64').to_numpy(),
+            'unit': _text_column(df['Unit']).tolist(),
+            'category': _text_column(category).astype(object).where(category.notna(), None).tolist(),
+            'uncertainty': uncertainties.astype('float64').to_numpy(),
+        }
     
-    def _parse_flow_mapping(self, xl_file) -> dict:
+    def _parse_flow_mapping(self, df: pd.DataFrame) -> dict:
         """Parse biosphere flow mapping sheet"""
         
-        df = pd.read_excel(xl_file, sheet_name='Biosphere Flows Mapping')
-        
-        mapping = {}
-        for _, row in df.iterrows():
-            if pd.notna(row['User Flow Name']) and pd.notna(row['Biosphere3 Flow Name (Brightway)']):
-                user_name = str(row['User Flow Name']).strip()
-                biosphere_name = str(row['Biosphere3 Flow Name (Brightway)']).strip()
-                mapping[user_name] = biosphere_name
-        
-        return mapping
+        user_names = df['User Flow Name']
+        biosphere_names = df['Biosphere3 Flow Name (Brightway)']
+        df = df[user_names.notna() & biosphere_names.notna()]
+        return dict(zip(
+            _text_column(df['User Flow Name']),
+            _text_column(df['Biosphere3 Flow Name (Brightway)'])
+        ))
     
     def _validate_data(self):
         """Validate data consistency"""
         
+        inventory = as_inventory({'activities': self.activities, 'exchanges': self.exchanges})
+        code_ids = inventory.codes('activity_code').astype(np.int64)
+        code_labels = inventory.labels('activity_code')
+        amounts = inventory.columns['amount']
+        
+        # Linking indexes are built once here and reused by database export and diagrams
+        self.exchange_index = inventory.exchange_index
+        self.activity_name_index = inventory.activity_name_index
+        code_position = {code: idx for idx, code in enumerate(code_labels)}
+        
+        # Exchanges without an activity code cannot be attributed to any activity
+        assigned = code_ids >= 0
+        if not assigned.all():
+            self.validation_errors.append(
+                f"❌ {int((~assigned).sum())} exchange(s) have no activity code"
+            )
+        
+        # Column-wise production flags and mass totals per activity code
+        production = assigned & inventory.isin('type', ['production'])
+        has_production = {code_labels[idx] for idx in np.unique(code_ids[production]).tolist()}
+        is_mass = inventory.isin('unit', ['kg', 'g', 't', 'ton'])
+        input_rows = assigned & is_mass & inventory.isin('type', ['input'])
+        output_rows = assigned & is_mass & inventory.isin('type', ['production', 'emission'])
+        input_mass = np.bincount(code_ids[input_rows], weights=amounts[input_rows], minlength=len(code_labels))
+        output_mass = np.bincount(code_ids[output_rows], weights=amounts[output_rows], minlength=len(code_labels))
+        
         # 1. Check all activity codes in exchanges exist in activities
         activity_codes = {act['code'] for act in self.activities}
-        exchange_codes = {exc['activity_code'] for exc in self.exchanges}
-        
-        orphan_codes = exchange_codes - activity_codes
+        orphan_codes = set(code_labels) - activity_codes
         if orphan_codes:
             self.validation_errors.append(
                 f"❌ Exchanges reference non-existent activities: {orphan_codes}"
@@ -155,90 +311,116 @@ class SustainExcelImporter:
         
         # 2. Check each activity has a production exchange
         for activity in self.activities:
-            has_production = any(
-                exc['activity_code'] == activity['code'] and exc['type'] == 'production'
-                for exc in self.exchanges
-            )
-            if not has_production:
+            if activity['code'] not in has_production:
                 self.validation_errors.append(
                     f"❌ Activity '{activity['name']}' has no production exchange"
                 )
         
         # 3. Check for negative amounts
-        for exc in self.exchanges:
-            if exc['amount'] < 0:
-                self.warnings.append(
-                    f"⚠️ Negative amount in {exc['activity_code']}: {exc['flow_name']}"
-                )
+        flow_names = inventory.labels('flow_name')
+        flow_ids = inventory.codes('flow_name')
+        for position in np.flatnonzero(assigned & (amounts < 0)).tolist():
+            self.warnings.append(
+                f"⚠️ Negative amount in {code_labels[code_ids[position]]}: {flow_names[flow_ids[position]]}"
+            )
         
-        # 4. Basic mass balance check (optional, only warning)
+        # 4. Basic mass balance check (optional, only warning; simplified to mass units)
         for activity in self.activities:
-            inputs = [exc for exc in self.exchanges 
-                     if exc['activity_code'] == activity['code'] and exc['type'] == 'input']
-            outputs = [exc for exc in self.exchanges 
-                      if exc['activity_code'] == activity['code'] and 
-                      (exc['type'] == 'production' or exc['type'] == 'emission')]
+            idx = code_position.get(activity['code'])
+            activity_input = input_mass[idx] if idx is not None else 0
+            activity_output = output_mass[idx] if idx is not None else 0
             
-            # Simplified check (only for mass units)
-            mass_units = ['kg', 'g', 't', 'ton']
-            input_mass = sum(exc['amount'] for exc in inputs 
-                           if exc['unit'] in mass_units)
-            output_mass = sum(exc['amount'] for exc in outputs 
-                            if exc['unit'] in mass_units)
-            
-            if input_mass > 0 and output_mass > 0:
-                balance_ratio = output_mass / input_mass
+            if activity_input > 0 and activity_output > 0:
+                balance_ratio = activity_output / activity_input
                 if balance_ratio < 0.3 or balance_ratio > 1.2:
                     self.warnings.append(
                         f"⚠️ Suspicious mass balance in '{activity['name']}': "
-                        f"Input={input_mass:.2f}kg, Output={output_mass:.2f}kg (ratio: {balance_ratio:.2f})"
+                        f"Input={activity_input:.2f}kg, Output={activity_output:.2f}kg (ratio: {balance_ratio:.2f})"
                     )
     
-    def link_biosphere_flows(self) -> Dict[str, Tuple[str, int]]:
+    def link_biosphere_flows(self, project_key: Optional[str] = None) -> Dict[str, Tuple[str, int]]:
         """
         Link user flow names to biosphere3 database
         
+        All flow names are resolved in one batched query against the persistent
+        biosphere index; results are memoized globally and, when project_key is
+        given, per project. Ranked alternatives for ambiguous matches are kept
+        in self.biosphere_candidates.
+        
+        Args:
+            project_key: Key under which this project's links are remembered (optional)
+        
         Returns:
             dict: {user_flow_name: (biosphere_db, biosphere_code)}
         """
         
+        if 'biosphere3' not in bd.databases:
+            self.warnings.append("⚠️ Biosphere3 database not found. Flows will not be linked.")
+            return {}
         try:
             biosphere_db = bd.Database('biosphere3')
-        except:
-            self.warnings.append("⚠️ Biosphere3 database not found. Flows will not be linked.")
+            index = get_biosphere_index()
+            index.sync(biosphere_db, biosphere_fingerprint('biosphere3'))
+        except (sqlite3.Error, ValueError) as e:
+            self.warnings.append(f"⚠️ Biosphere flow index unavailable ({e}). Flows will not be linked.")
             return {}
         
-        linked_flows = {}
-        unlinked_flows = []
+        # Get unique emission/resource flow names, with the compartment of their first exchange
+        inventory = self.inventory
+        if inventory is None:
+            inventory = as_inventory({'activities': self.activities, 'exchanges': self.exchanges})
+        positions = np.flatnonzero(inventory.isin('type', ['emission', 'resource']))
+        flow_codes = inventory.codes('flow_name')[positions]
+        flow_codes, first = np.unique(flow_codes, return_index=True)
+        category_codes = inventory.codes('category')[positions[first]]
+        flow_labels = inventory.labels('flow_name')
+        category_labels = inventory.labels('category')
         
-        # Get unique emission/resource flow names
-        biosphere_exchanges = [
-            exc for exc in self.exchanges 
-            if exc['type'] in ['emission', 'resource']
-        ]
+        queries = {}
+        for flow_code, category_code in zip(flow_codes.tolist(), category_codes.tolist()):
+            flow_name = flow_labels[flow_code]
+            # Check if user provided mapping
+            search_term = str(self.flow_mapping.get(flow_name, flow_name))
+            category = category_labels[category_code] if category_code >= 0 else ''
+            queries[flow_name] = (search_term, category)
         
-        unique_flows = {exc['flow_name'] for exc in biosphere_exchanges}
+        candidates = index.resolve(queries.values())
+        remembered = index.project_links(project_key) if project_key else {}
         
-        for flow_name in unique_flows:
-            # Check if user provided mapping
-            if flow_name in self.flow_mapping:
-                search_term = self.flow_mapping[flow_name]
-            else:
-                search_term = flow_name
+        linked_flows = {}
+        unlinked_flows = []
+        ambiguous_flows = []
+        new_links = {}
+        self.biosphere_candidates = {}
+        
+        for flow_name, query in queries.items():
+            ranked = candidates[query]
+            search_term, code = remembered.get(flow_name, (None, None))
             
-            # Search biosphere3
-            try:
-                results = biosphere_db.search(search_term)
-                
-                if results:
-                    # Take best match (first result)
-                    best_match = results[0]
-                    linked_flows[flow_name] = ('biosphere3', best_match['code'])
-                else:
-                    unlinked_flows.append(flow_name)
-            except:
+            if search_term != query[0]:
+                # Not yet linked in this project (or its mapping changed): take the best match
+                code = ranked[0]['code'] if ranked else None
+                new_links[flow_name] = (query[0], code)
+                if is_ambiguous(ranked, query[1]):
+                    ambiguous_flows.append(flow_name)
+            
+            if len(ranked) > 1:
+                self.biosphere_candidates[flow_name] = ranked
+            
+            if code is not None:
+                linked_flows[flow_name] = ('biosphere3', code)
+            else:
                 unlinked_flows.append(flow_name)
         
+        if project_key and new_links:
+            index.remember_project_links(project_key, new_links)
+        
+        if ambiguous_flows:
+            self.warnings.append(
+                f"⚠️ Ambiguous biosphere3 matches for: {ambiguous_flows}. "
+                f"The best-ranked candidate was used; add a FlowMapping entry to choose another."
+            )
+        
         if unlinked_flows:
             self.warnings.append(
                 f"⚠️ Could not automatically link flows: {unlinked_flows}. "
@@ -247,42 +429,26 @@ class SustainExcelImporter:
         
         return linked_flows
     
-    def create_brightway_database(self, db_name: str, project_name: str = None) -> str:
-        """
-        Create Brightway database from parsed data
-        
-        Args:
-            db_name: Name for the new database
-            project_name: Brightway project name (optional)
-        
-        Returns:
-            Database name if successful
-        """
+    def _brightway_activities(self, db_name: str, linked_flows: Dict[str, Tuple[str, int]],
+                              codes: Optional[set] = None) -> Dict[tuple, dict]:
+        """Brightway datasets of all activities, or only of the given activity codes"""
         
-        if self.validation_errors:
-            raise ValueError(f"Cannot create database with validation errors: {self.validation_errors}")
-        
-        # Set project if specified
-        if project_name:
-            try:
-                bd.projects.set_current(project_name)
-            except:
-                # If project doesn't exist, it will be created
-                bd.projects.set_current(project_name)
-        
-        # Link biosphere flows
-        linked_flows = self.link_biosphere_flows()
-        
-        # Build database structure
         db_data = {}
+        inventory = as_inventory({'activities': self.activities, 'exchanges': self.exchanges})
+        exchanges = inventory.exchanges
+        supplier_index = inventory.supplier_index
+        no_exchanges = np.zeros(0, dtype=np.int64)
         
         for activity in self.activities:
+            if codes is not None and activity['code'] not in codes:
+                continue
+            
             activity_key = (db_name, activity['code'])
             
             # Get exchanges for this activity
             activity_exchanges = [
-                exc for exc in self.exchanges 
-                if exc['activity_code'] == activity['code']
+                exchanges[position]
+                for position in inventory.exchange_index.get(activity['code'], no_exchanges).tolist()
             ]
             
             # Convert exchanges to Brightway format
@@ -300,15 +466,12 @@ class SustainExcelImporter:
                     bw_exc['type'] = 'production'
                 
                 elif exc['type'] == 'input':
-                    # Try to find if it's another activity in this database
-                    matching_activity = next(
-                        (act for act in self.activities if act['name'] == exc['flow_name']),
-                        None
-                    )
+                    # Try to find if it's another activity in this database (same rule as the LCA engine)
+                    matching_code = supplier_index.get(exc['flow_name'])
                     
-                    if matching_activity:
+                    if matching_code is not None:
                         # Internal link
-                        bw_exc['input'] = (db_name, matching_activity['code'])
+                        bw_exc['input'] = (db_name, matching_code)
                         bw_exc['type'] = 'technosphere'
                     else:
                         # External input - create as generic technosphere
@@ -347,6 +510,34 @@ class SustainExcelImporter:
                 'production amount': activity['reference_production']
             }
         
+        return db_data
+    
+    def create_brightway_database(self, db_name: str, project_name: str = None) -> str:
+        """
+        Create Brightway database from parsed data
+        
+        Args:
+            db_name: Name for the new database
+            project_name: Brightway project name (optional)
+        
+        Returns:
+            Database name if successful
+        """
+        
+        if self.validation_errors:
+            raise ValueError(f"Cannot create database with validation errors: {self.validation_errors}")
+        
+        # Set project if specified
+        if project_name:
+            # Brightway creates the project if it doesn't exist
+            bd.projects.set_current(project_name)
+        
+        # Link biosphere flows
+        linked_flows = self.link_biosphere_flows(project_key=db_name)
+        
+        # Build database structure
+        db_data = self._brightway_activities(db_name, linked_flows)
+        
         # Write database
         if db_name in bd.databases:
             del bd.databases[db_name]
@@ -355,6 +546,355 @@ class SustainExcelImporter:
         db.write(db_data)
         
         return db_name
+    
+    def update_brightway_database(self, db_name: str, previous_lci_data: dict,
+                                  project_name: str = None) -> Optional[InventoryDiff]:
+        """
+        Apply a re-uploaded inventory to an existing Brightway database incrementally
+        
+        Only added, removed and changed activities are written, plus unchanged
+        activities whose technosphere or biosphere links moved (renamed suppliers,
+        changed flow mappings).
+        
+        Args:
+            db_name: Name of the existing database
+            previous_lci_data: The inventory the database was created from
+            project_name: Brightway project name (optional)
+        
+        Returns:
+            The inventory diff, or None if the database does not exist yet
+        """
+        
+        if self.validation_errors:
+            raise ValueError(f"Cannot update database with validation errors: {self.validation_errors}")
+        
+        if project_name:
+            bd.projects.set_current(project_name)
+        
+        if db_name not in bd.databases:
+            return None
+        
+        previous = as_inventory(previous_lci_data)
+        inventory = as_inventory({'activities': self.activities, 'exchanges': self.exchanges})
+        diff = diff_inventories(previous, inventory)
+        rewrite = set(diff.added + diff.changed)
+        
+        # Inputs are linked by activity or product name, so consumers of renamed suppliers move too
+        relinked_names = {
+            name for name in set(previous.supplier_index) | set(inventory.supplier_index)
+            if previous.supplier_index.get(name) != inventory.supplier_index.get(name)
+        }
+        previous_mapping = previous_lci_data.get('flow_mapping') or {}
+        remapped_flows = {
+            name for name in set(previous_mapping) | set(self.flow_mapping)
+            if previous_mapping.get(name) != self.flow_mapping.get(name)
+        }
+        if relinked_names or remapped_flows:
+            moved = (
+                (inventory.isin('type', ['input']) & inventory.isin('flow_name', relinked_names))
+                | (inventory.isin('type', ['emission', 'resource']) & inventory.isin('flow_name', remapped_flows))
+            )
+            activity_labels = inventory.labels('activity_code')
+            rewrite.update(
+                activity_labels[code] for code in np.unique(inventory.codes('activity_code')[moved]).tolist()
+                if code >= 0
+            )
+        
+        db = bd.Database(db_name)
+        for code in diff.removed:
+            try:
+                db.get(code).delete()
+            except Exception:
+                pass  # Already gone from the database
+        
+        if rewrite:
+            linked_flows = self.link_biosphere_flows(project_key=db_name)
+            for (_database, code), dataset in self._brightway_activities(db_name, linked_flows, rewrite).items():
+                exchanges = dataset.pop('exchanges')
+                try:
+                    activity = db.get(code)
+                    activity.exchanges().delete()
+                    for key, value in dataset.items():
+                        activity[key] = value
+                except Exception:
+                    activity = db.new_activity(code, **dataset)
+                activity.save()
+                for exc in exchanges:
+                    activity.new_exchange(**exc).save()
+        
+        if rewrite or diff.removed:
+            db.process()
+        
+        return diff
+
+
+class SustainExcelImporter(LCIImporter):
+    """
+    Import LCI data from Sustain 4.0 Excel template into Brightway
+    """
+    
+    FORMAT_LABEL = 'Excel'
+    
+    def __init__(self, excel_path: Union[str, BinaryIO]):
+        super().__init__(excel_path)
+        self.excel_path = excel_path
+        self._xl_file = None
+    
+    def parse(self) -> bool:
+        """Parse the workbook, streaming .xlsx files and using pandas for legacy .xls"""
+        
+        name = str(getattr(self.excel_path, 'name', self.excel_path)).lower()
+        if name.endswith('.xls'):
+            return self.parse_excel()
+        return self.parse_excel_streaming()
+    
+    def parse_excel(self) -> bool:
+        """Parse Excel file and validate structure"""
+        
+        return self._parse_tables()
+    
+    def _sheet_names(self) -> List[str]:
+        self._xl_file = pd.ExcelFile(self.excel_path)
+        return self._xl_file.sheet_names
+    
+    def _read_sheet(self, sheet_name: str, header: Optional[int] = 0) -> pd.DataFrame:
+        return pd.read_excel(self._xl_file, sheet_name=sheet_name, header=header)
+    
+    def parse_excel_streaming(self) -> bool:
+        """
+        Parse an .xlsx workbook row by row in openpyxl read-only mode
+        
+        Accepts a path or an open binary buffer (e.g. a Streamlit upload), so no temporary
+        copy is needed. Exchanges are accumulated in compact column buffers as rows arrive,
+        which keeps peak memory close to the size of the parsed data.
+        """
+        
+        try:
+            workbook = load_workbook(self.excel_path, read_only=True, data_only=True)
+        except Exception as e:
+            self.validation_errors.append(f"❌ Error parsing Excel: {str(e)}")
+            return False
+        
+        try:
+            # Check required sheets
+            for sheet in REQUIRED_SHEETS:
+                if sheet not in workbook.sheetnames:
+                    self.validation_errors.append(f"❌ Missing required sheet: {sheet}")
+                    return False
+            
+            # Parse each sheet
+            self.metadata = self._stream_metadata(workbook['Project Metadata'])
+            self.activities = self._stream_activities(workbook['Process Activities'])
+            self.inventory = self._stream_exchanges(workbook['Exchanges']).to_inventory(self.activities)
+            self.exchanges = self.inventory.exchanges
+            
+            # Optional: Flow mapping
+            if 'Biosphere Flows Mapping' in workbook.sheetnames:
+                self.flow_mapping = self._stream_flow_mapping(workbook['Biosphere Flows Mapping'])
+            
+            # Validate data
+            self._validate_data()
+            
+            return len(self.validation_errors) == 0
+            
+        except Exception as e:
+            self.validation_errors.append(f"❌ Error parsing Excel: {str(e)}")
+            return False
+        finally:
+            workbook.close()
+    
+    def _stream_metadata(self, worksheet) -> dict:
+        """Stream project metadata sheet (key/value rows, no header)"""
+        
+        metadata = {}
+        for row in worksheet.iter_rows(values_only=True, max_col=2):
+            if len(row) >= 2 and row[0] not in (None, '') and row[1] not in (None, ''):
+                metadata[_cell_text(row[0])] = _cell_text(row[1])
+        
+        return metadata
+    
+    def _stream_activities(self, worksheet) -> List[dict]:
+        """Stream process activities sheet"""
+        
+        columns = ['Activity Code', 'Activity Name', 'Unit', 'Location', 'Reference Production']
+        activities = []
+        for code, name, unit, location, reference_production in _iter_sheet_rows(worksheet, columns):
+            if code is not None:
+                activities.append({
+                    'code': _cell_text(code),
+                    'name': _cell_text(name),
+                    'unit': _cell_text(unit),
+                    'location': _cell_text(location),
+                    'reference_production': float('nan') if reference_production is None else float(reference_production)
+                })
+        
+        return activities
+    
+    def _stream_exchanges(self, worksheet) -> _ExchangeColumns:
+        """Stream exchanges sheet into compact column buffers"""
+        
+        columns = ['Activity Code', 'Exchange Type', 'Flow Name', 'Amount', 'Unit', 'Category']
+        rows = worksheet.iter_rows(values_only=True, max_row=1)
+        header = {_cell_text(name) for name in next(rows, ()) if name is not None}
+        has_uncertainty = 'Uncertainty' in header
+        if has_uncertainty:
+            columns.append('Uncertainty')
+        
+        buffers = _ExchangeColumns()
+        nan = float('nan')
+        for row in _iter_sheet_rows(worksheet, columns):
+            code = row[0]
+            if code is None:
+                continue
+            
+            # Parse uncertainty if provided
+            uncertainty = nan
+            if has_uncertainty and row[6] is not None:
+                uncertainty_str = str(row[6])
+                if '±' in uncertainty_str:
+                    try:
+                        uncertainty = float(uncertainty_str.replace('±', '').strip())
+                    except ValueError:
+                        pass
+            
+            amount = row[3]
+            buffers.append(
+                _cell_text(code),
+                _cell_text(row[1]).lower(),
+                _cell_text(row[2]),
+                nan if amount is None else float(amount),
+                _cell_text(row[4]),
+                None if row[5] is None else _cell_text(row[5]),
+                uncertainty
+            )
+        
+        return buffers
+    
+    def _stream_flow_mapping(self, worksheet) -> dict:
+        """Stream biosphere flow mapping sheet"""
+        
+        columns = ['User Flow Name', 'Biosphere3 Flow Name (Brightway)']
+        mapping = {}
+        for user_name, biosphere_name in _iter_sheet_rows(worksheet, columns):
+            if user_name is not None and biosphere_name is not None:
+                mapping[_cell_text(user_name)] = _cell_text(biosphere_name)
+        
+        return mapping
+
+
+class _ZipBundleImporter(LCIImporter):
+    """
+    Import LCI data from a zip bundle with one file per template sheet
+    
+    Members are matched to sheets by file stem, ignoring case and punctuation
+    (e.g. 'Exchanges.csv' or 'process_activities.csv'); folders inside the zip are ignored.
+    """
+    
+    MEMBER_SUFFIX = ''
+    
+    def __init__(self, source: Union[str, BinaryIO]):
+        super().__init__(source)
+        self._archive = None
+        self._members = {}
+    
+    def parse(self) -> bool:
+        try:
+            self._archive = zipfile.ZipFile(self.source)
+        except (zipfile.BadZipFile, OSError) as e:
+            self.validation_errors.append(f"❌ Error parsing {self.FORMAT_LABEL}: {str(e)}")
+            return False
+        try:
+            return self._parse_tables()
+        finally:
+            self._archive.close()
+    
+    def _sheet_names(self) -> List[str]:
+        members = {}
+        for member in self._archive.namelist():
+            stem, suffix = os.path.splitext(os.path.basename(member))
+            if suffix.lower() == self.MEMBER_SUFFIX and stem:
+                members.setdefault(_sheet_key(stem), member)
+        self._members = {
+            sheet: members[_sheet_key(sheet)]
+            for sheet in REQUIRED_SHEETS + [FLOW_MAPPING_SHEET]
+            if _sheet_key(sheet) in members
+        }
+        return list(self._members)
+    
+    def _read_sheet(self, sheet_name: str, header: Optional[int] = 0) -> pd.DataFrame:
+        with self._archive.open(self._members[sheet_name]) as member:
+            return self._read_member(member, header)
+    
+    @abstractmethod
+    def _read_member(self, member: BinaryIO, header: Optional[int]) -> pd.DataFrame:
+        """Read one zip member as a DataFrame"""
+
+
+class CSVBundleImporter(_ZipBundleImporter):
+    """Import LCI data from a zip of per-sheet CSV files (UTF-8, comma separated)"""
+    
+    FORMAT_LABEL = 'CSV bundle'
+    MEMBER_SUFFIX = '.csv'
+    
+    def _read_member(self, member: BinaryIO, header: Optional[int]) -> pd.DataFrame:
+        return pd.read_csv(member, header=header, encoding='utf-8-sig', float_precision='round_trip')
+
+
+class ParquetBundleImporter(_ZipBundleImporter):
+    """
+    Import LCI data from a zip of per-sheet Parquet files
+    
+    The metadata file is read positionally (first two columns are key and value),
+    whatever its column names are.
+    """
+    
+    FORMAT_LABEL = 'Parquet bundle'
+    MEMBER_SUFFIX = '.parquet'
+    
+    def parse(self) -> bool:
+        if not PYARROW_AVAILABLE:
+            self.validation_errors.append("❌ Parquet bundles require pyarrow: pip install pyarrow")
+            return False
+        return super().parse()
+    
+    def _read_member(self, member: BinaryIO, header: Optional[int]) -> pd.DataFrame:
+        df = pd.read_parquet(BytesIO(member.read()))
+        if header is None:
+            df.columns = range(df.shape[1])
+        return df
+
+
+def _sheet_key(name: str) -> str:
+    """Normalize a sheet or file name for matching ('Process Activities' == 'process_activities')"""
+    
+    return re.sub(r'[^a-z0-9]+', '', name.lower())
+
+
+# Upload extensions accepted by get_importer
+IMPORTER_FILE_TYPES = ['xlsx', 'xls', 'zip']
+
+
+def get_importer(source: Union[str, BinaryIO], filename: Optional[str] = None) -> LCIImporter:
+    """
+    Pick the importer for an uploaded file
+    
+    Workbooks use SustainExcelImporter; zip bundles use the Parquet importer when they
+    contain .parquet members and the CSV importer otherwise.
+    """
+    
+    filename = str(filename or getattr(source, 'name', source)).lower()
+    if not filename.endswith('.zip'):
+        return SustainExcelImporter(source)
+    
+    try:
+        with zipfile.ZipFile(source) as archive:
+            has_parquet = any(name.lower().endswith('.parquet') for name in archive.namelist())
+    except (zipfile.BadZipFile, OSError):
+        has_parquet = False
+    finally:
+        if hasattr(source, 'seek'):
+            source.seek(0)
+    return ParquetBundleImporter(source) if has_parquet else CSVBundleImporter(source)
 
 
 def generate_excel_template(project_data: dict) -> BytesIO:
@@ -477,113 +1017,107 @@ def get_example_lci_file() -> BytesIO:
     return buffer
 
 
-def generate_process_network_diagram(activities: List[dict], exchanges: List[dict]):
-    """Generate interactive network diagram of process flow"""
+# Process network diagram limits: activities shown before grouping by code prefix,
+# nodes or links above which WebGL and label thinning kick in, and large-mode link/label caps
+NETWORK_MAX_NODES = 300
+LARGE_NETWORK_NODES = 150
+LARGE_NETWORK_EDGES = 400
+NETWORK_MAX_EDGES = 2000
+EDGE_LABEL_LIMIT = 40
+NODE_LABEL_LIMIT = 60
+
+
+def generate_process_network_diagram(activities: List[dict], exchanges: List[dict],
+                                     max_nodes: int = NETWORK_MAX_NODES):
+    """
+    Generate interactive network diagram of process flow (layout cached per inventory)
+
+    Networks above max_nodes activities are collapsed into activity-code prefix
+    groups. Above LARGE_NETWORK_NODES nodes (or LARGE_NETWORK_EDGES links) the diagram switches to WebGL
+    traces, draws only the heaviest NETWORK_MAX_EDGES links and labels only the
+    heaviest links and busiest nodes, so the figure payload stays bounded.
+    """
     
-    try:
-        import networkx as nx
-    except ImportError:
-        # If networkx is not installed, return a simple message
-        fig = go.Figure()
-        fig.add_annotation(
-            text="Network diagram requires 'networkx' package.<br>Install with: pip install networkx",
-            xref="paper", yref="paper",
-            x=0.5, y=0.5,
-            showarrow=False,
-            font=dict(size=14, color="gray")
-        )
-        fig.update_layout(
-            xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-            yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-            height=400
-        )
-        return fig
-    
-    # Create directed graph
-    G = nx.DiGraph()
-    
-    # Add nodes
-    for activity in activities:
-        G.add_node(activity['code'], label=activity['name'], unit=activity['unit'])
-    
-    # Add edges (only internal connections)
-    for exc in exchanges:
-        if exc['type'] == 'input':
-            # Find source activity
-            source = next(
-                (act['code'] for act in activities if act['name'] == exc['flow_name']),
-                None
-            )
-            if source and source != exc['activity_code']:
-                G.add_edge(source, exc['activity_code'], 
-                          weight=exc['amount'], 
-                          label=f"{exc['amount']:.2f} {exc['unit']}")
-    
-    # Layout
-    if len(G.nodes()) > 0:
-        pos = nx.spring_layout(G, k=2, iterations=50)
-    else:
-        pos = {}
+    inventory = as_inventory({'activities': activities, 'exchanges': exchanges})
+    network = get_process_network(inventory, max_nodes)
+    large = network.n_nodes > LARGE_NETWORK_NODES or network.n_edges > LARGE_NETWORK_EDGES
+    scatter = go.Scattergl if large else go.Scatter
+    x, y = network.x, network.y
+    
+    # Heaviest links first: aggregated flow count, then absolute amount
+    edges = np.lexsort((-np.abs(network.amounts), -network.counts))
+    hidden_edges = max(len(edges) - NETWORK_MAX_EDGES, 0) if large else 0
+    edges = edges[:len(edges) - hidden_edges]
+    labelled = edges[:EDGE_LABEL_LIMIT] if large else edges
+    sources, targets = network.sources[edges], network.targets[edges]
+    
+    # Edge polyline as one array: x0, x1, gap for every edge
+    edge_x = np.full(3 * len(edges), np.nan)
+    edge_y = np.full(3 * len(edges), np.nan)
+    edge_x[0::3], edge_x[1::3] = x[sources], x[targets]
+    edge_y[0::3], edge_y[1::3] = y[sources], y[targets]
+    
+    edge_trace = scatter(
+        x=edge_x, y=edge_y,
+        line=dict(width=1 if large else 2, color='#888'),
+        opacity=0.6 if large else 1.0,
+        hoverinfo='none',
+        mode='lines'
+    )
     
-    # Create plotly figure
-    edge_trace = go.Scatter(
-        x=[], y=[],
-        line=dict(width=2, color='#888'),
+    # Edge labels at the midpoints, as a single text trace
+    label_trace = scatter(
+        x=(x[network.sources[labelled]] + x[network.targets[labelled]]) / 2,
+        y=(y[network.sources[labelled]] + y[network.targets[labelled]]) / 2,
+        text=network.edge_labels(labelled),
+        mode='text',
         hoverinfo='text',
-        mode='lines',
-        text=[]
+        textfont=dict(size=10, color='#666')
     )
     
-    edge_annotations = []
-    
-    for edge in G.edges(data=True):
-        x0, y0 = pos[edge[0]]
-        x1, y1 = pos[edge[1]]
-        edge_trace['x'] += tuple([x0, x1, None])
-        edge_trace['y'] += tuple([y0, y1, None])
-        
-        # Add edge label
-        edge_annotations.append(
-            dict(
-                x=(x0 + x1) / 2,
-                y=(y0 + y1) / 2,
-                text=edge[2].get('label', ''),
-                showarrow=False,
-                font=dict(size=10, color='#666')
-            )
-        )
+    if large:
+        # Every node keeps its hover label; only the busiest carry visible text
+        busiest = np.argsort(-network.degrees(), kind='stable')[:NODE_LABEL_LIMIT]
+        node_text = np.full(network.n_nodes, '', dtype=object)
+        node_text[busiest] = np.asarray(network.labels, dtype=object)[busiest]
+        marker_size = 8 + 4 * np.log2(network.sizes)
+    else:
+        node_text = network.labels
+        marker_size = 30
     
-    node_trace = go.Scatter(
-        x=[], y=[],
-        text=[],
+    node_trace = scatter(
+        x=x, y=y,
+        text=node_text,
+        hovertext=network.labels,
         mode='markers+text',
         textposition="top center",
         hoverinfo='text',
         marker=dict(
-            size=30,
-            color='#4472C4',
-            line=dict(width=2, color='white')
+            size=marker_size,
+            color=np.where(network.sizes > 1, '#ED7D31', '#4472C4') if network.grouped else '#4472C4',
+            line=dict(width=1 if large else 2, color='white')
         ),
-        textfont=dict(size=12, color='#2c3e50')
+        textfont=dict(size=10 if large else 12, color='#2c3e50')
     )
     
-    for node in G.nodes(data=True):
-        x, y = pos[node[0]]
-        node_trace['x'] += tuple([x])
-        node_trace['y'] += tuple([y])
-        node_trace['text'] += tuple([node[1]['label']])
+    title = "Process Network"
+    if network.grouped:
+        title += f" ({network.n_nodes} groups of {network.n_activities} activities, by code prefix)"
+    if hidden_edges:
+        title += f" - {hidden_edges} weakest links hidden"
     
-    fig = go.Figure(data=[edge_trace, node_trace],
+    fig = go.Figure(data=[edge_trace, label_trace, node_trace],
                    layout=go.Layout(
-                       title="Process Network",
+                       title=title,
                        showlegend=False,
                        hovermode='closest',
-                       annotations=edge_annotations,
                        xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
                        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
                        plot_bgcolor='rgba(0,0,0,0)',
                        paper_bgcolor='rgba(0,0,0,0)',
-                       height=400
+                       height=600 if large else 400,
+                       # Keep zoom and pan across Streamlit reruns of the same inventory
+                       uirevision=f"{inventory.content_hash()}:{max_nodes}"
                    ))
     
     return fig
@@ -0,0 +1,152 @@
+"""
+Characterization factor store for Sustain 4.0 BioEngine
+Loads bundled, versioned factor tables and compiles them into dense per-inventory matrices
+"""
+
+import threading
+from pathlib import Path
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+from typing import Dict, List, Tuple
+
+
+FACTORS_DIR = Path(__file__).resolve().parent / 'characterization_factors'
+DEFAULT_METHOD_VERSION = 'sustain-screening-1.0'
+ANY_COMPARTMENT = ''
+
+# Conversion of exchange units to the reference units used by the factor tables
+UNIT_CONVERSIONS = {
+    'kg': ('kg', 1.0), 'g': ('kg', 1e-3), 't': ('kg', 1e3), 'ton': ('kg', 1e3),
+    'm3': ('m3', 1.0), 'm³': ('m3', 1.0), 'l': ('m3', 1e-3),
+    'mj': ('MJ', 1.0), 'kwh': ('MJ', 3.6), 'gj': ('MJ', 1e3),
+    'm2a': ('m2a', 1.0), 'm²·year': ('m2a', 1.0), 'm2*year': ('m2a', 1.0),
+}
+UNIT_FACTORS = {unit: factor for unit, (_ref_unit, factor) in UNIT_CONVERSIONS.items()}
+
+# Conversions between reference units, applied when a factor's reference unit differs from
+# the flow's (volume-based factors are for water: 1 kg = 1 L = 1e-3 m3)
+REFERENCE_CONVERSIONS = {
+    ('kg', 'm3'): 1e-3,
+}
+
+
+def _normalized(values) -> pd.Series:
+    """Equivalent of str(value).strip().lower() over a column"""
+
+    return pd.Series(values, dtype=object).astype(str).str.strip().str.lower()
+
+
+def available_method_versions() -> List[str]:
+    """Method versions bundled with the application"""
+
+    return sorted(path.stem for path in FACTORS_DIR.glob('*.csv'))
+
+
+class FactorTable:
+    """
+    Characterization factors of one method version
+
+    Factors are held as a dense (categories x keys) matrix where keys are
+    (flow name, compartment) pairs. An extra all-zero last row and column stand
+    for unknown categories and for flows without a factor. Every factor is per
+    its row's reference unit, kept as a code matrix of the same shape.
+    """
+
+    def __init__(self, version: str, frame: pd.DataFrame):
+        self.version = version
+        names = _normalized(frame['flow_name'])
+        compartments = _normalized(frame['compartment'].fillna(ANY_COMPARTMENT))
+        self.categories = list(dict.fromkeys(frame['category'].tolist()))
+        self.category_index = {category: row for row, category in enumerate(self.categories)}
+        self.keys = pd.MultiIndex.from_arrays([names, compartments]).unique()
+        self.factors = np.zeros((len(self.categories) + 1, len(self.keys) + 1))
+        rows = pd.Index(self.categories).get_indexer(frame['category'])
+        cols = self.keys.get_indexer(pd.MultiIndex.from_arrays([names, compartments]))
+        self.factors[rows, cols] = frame['factor'].to_numpy(dtype=np.float64)
+        reference_codes, self.reference_units = pd.factorize(frame['reference_unit'].astype(str).str.strip())
+        self.reference_units = list(self.reference_units)
+        self.reference_codes = np.zeros(self.factors.shape, dtype=np.int64)
+        self.reference_codes[rows, cols] = reference_codes
+
+    @classmethod
+    def load(cls, version: str) -> 'FactorTable':
+        path = FACTORS_DIR / f'{version}.csv'
+        if not path.is_file():
+            raise ValueError(f"Unknown characterization method version: {version}")
+        frame = pd.read_csv(
+            path, comment='#',
+            dtype={'category': str, 'flow_name': str, 'compartment': str, 'reference_unit': str},
+            keep_default_na=False, na_values={'factor': ['']}, float_precision='round_trip'
+        )
+        return cls(version, frame)
+
+    def unit_conversions(self, units) -> np.ndarray:
+        """
+        (units x reference units) factors converting each unit to each reference unit
+
+        Units of the same reference unit convert by UNIT_CONVERSIONS and across
+        reference units by REFERENCE_CONVERSIONS; other pairs (and unknown units)
+        keep their own scale.
+        """
+
+        units = _normalized(units)
+        conversions = np.empty((len(units), len(self.reference_units)))
+        for row, unit in enumerate(units.tolist()):
+            unit_reference, factor = UNIT_CONVERSIONS.get(unit, (None, 1.0))
+            conversions[row] = [
+                factor * REFERENCE_CONVERSIONS.get((unit_reference, reference), 1.0)
+                for reference in self.reference_units
+            ]
+        return conversions
+
+    def align(self, flow_keys: List[tuple]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Factor column and (units x reference units) conversions of each (flow name, compartment, unit) key
+
+        The exact compartment wins over its top-level compartment (e.g. "air" for
+        "air/urban"), which wins over the any-compartment factor.
+        """
+
+        if not flow_keys:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, len(self.reference_units)))
+        names, compartments, units = (list(values) for values in zip(*flow_keys))
+        names = _normalized(names)
+        compartments = _normalized(compartments)
+        top_level = compartments.str.split(r'[/:,]', n=1, regex=True).str[0].str.strip()
+
+        columns = np.full(len(names), len(self.keys), dtype=np.int64)
+        for compartment in (pd.Series(ANY_COMPARTMENT, index=names.index), top_level, compartments):
+            found = self.keys.get_indexer(pd.MultiIndex.from_arrays([names, compartment]))
+            columns = np.where(found >= 0, found, columns)
+
+        return columns, self.unit_conversions(units)
+
+    def compile(self, flow_keys: List[tuple]) -> np.ndarray:
+        """Dense (method categories + zero row) x flows factor matrix aligned to the given flows"""
+
+        columns, conversions = self.align(flow_keys)
+        flows = np.arange(len(columns))
+        return self.factors[:, columns] * conversions[flows, self.reference_codes[:, columns]]
+
+    def category_rows(self, categories: List[str]) -> np.ndarray:
+        """Rows of the given categories in a compiled matrix (unknown categories map to the zero row)"""
+
+        missing = len(self.categories)
+        return np.array([self.category_index.get(category, missing) for category in categories], dtype=np.int64)
+
+
+_tables_lock = threading.Lock()
+_factor_tables: Dict[str, FactorTable] = {}
+
+
+def get_factor_table(version: str = DEFAULT_METHOD_VERSION) -> FactorTable:
+    """Factor table of a method version, loaded once per process"""
+
+    table = _factor_tables.get(version)
+    if table is None:
+        with _tables_lock:
+            table = _factor_tables.get(version)
+            if table is None:
+                table = _factor_tables[version] = FactorTable.load(version)
+    return table
+
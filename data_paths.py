@@ -0,0 +1,22 @@
+"""
+Data directory helpers for Sustain 4.0 BioEngine
+Every persisted file lives under ./data; this module has no Streamlit dependency
+"""
+
+from pathlib import Path
+
+
+def ensure_data_dir():
+    """Ensures that the data directory exists and returns its resolved path."""
+    data_dir = Path("./data").resolve()
+    data_dir.mkdir(parents=True, exist_ok=True)
+    return data_dir
+
+
+def ensure_path_within_data(path: Path):
+    """Validates that a path resolves inside ./data."""
+    data_dir = ensure_data_dir()
+    resolved = path.resolve()
+    if resolved != data_dir and data_dir not in resolved.parents:
+        raise ValueError("Path traversal attempt blocked")
+    return resolved
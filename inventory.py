@@ -0,0 +1,537 @@
+"""
+Columnar LCI inventory for Sustain 4.0 BioEngine
+Stores exchanges as typed columns and exposes dict-like row views for existing code
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from collections.abc import Mapping, MutableMapping, Sequence
+from pathlib import Path
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# pyarrow is optional; without it inventories are only persisted as SQLite rows
+try:
+    import pyarrow as pa  # type: ignore
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+
+EXCHANGE_FIELDS = ('activity_code', 'type', 'flow_name', 'amount', 'unit', 'category', 'uncertainty')
+CATEGORICAL_FIELDS = ('activity_code', 'type', 'flow_name', 'unit', 'category')
+NUMERIC_FIELDS = ('amount', 'uncertainty')
+
+
+def _as_categorical(values) -> pd.Categorical:
+    """Categorical column with sorted, used-only categories (missing values get code -1)"""
+
+    if not isinstance(values, pd.Categorical):
+        return pd.Categorical(pd.Series(values, dtype=object))
+    values = values.remove_unused_categories()
+    ordered = sorted(values.categories.tolist())
+    if ordered != values.categories.tolist():
+        values = values.reorder_categories(ordered)
+    return values
+
+
+class LCIInventory:
+    """
+    Activities plus a columnar exchange table
+
+    String fields are pandas Categoricals (integer codes into a small label table),
+    amount and uncertainty are float64 arrays (NaN uncertainty means "not given").
+    Instances are treated as immutable so their content hash can be cached.
+    """
+
+    def __init__(self, activities: List[dict], columns: Dict[str, Iterable]):
+        self.activities = list(activities)
+        self.columns = {}
+        for field in CATEGORICAL_FIELDS:
+            self.columns[field] = _as_categorical(columns[field])
+        for field in NUMERIC_FIELDS:
+            self.columns[field] = np.ascontiguousarray(columns[field], dtype=np.float64)
+        lengths = {len(column) for column in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Exchange columns have different lengths: {sorted(lengths)}")
+        self._labels = {field: self.columns[field].categories.tolist() for field in CATEGORICAL_FIELDS}
+        self._exchanges = None
+        self._content_hash = None
+        self._exchange_index = None
+        self._activity_name_index = None
+        self._product_name_index = None
+        self._supplier_index = None
+
+    @classmethod
+    def from_records(cls, activities: List[dict], exchanges: Iterable[Mapping]) -> 'LCIInventory':
+        """Build an inventory from exchange dicts (e.g. legacy JSON)"""
+
+        exchanges = list(exchanges)
+        columns = {field: [exc.get(field) for exc in exchanges] for field in CATEGORICAL_FIELDS}
+        columns['amount'] = np.array([exc['amount'] for exc in exchanges], dtype=np.float64)
+        uncertainties = (exc.get('uncertainty') for exc in exchanges)
+        columns['uncertainty'] = np.array(
+            [np.nan if value is None else value for value in uncertainties], dtype=np.float64
+        )
+        return cls(activities, columns)
+
+    def __len__(self) -> int:
+        return len(self.columns['amount'])
+
+    @property
+    def nbytes(self) -> int:
+        total = 0
+        for field in CATEGORICAL_FIELDS:
+            total += self.columns[field].codes.nbytes
+        for field in NUMERIC_FIELDS:
+            total += self.columns[field].nbytes
+        return total
+
+    def codes(self, field: str) -> np.ndarray:
+        """Integer codes of a categorical field (-1 for missing)"""
+        return self.columns[field].codes
+
+    def labels(self, field: str) -> list:
+        """Label table of a categorical field, indexed by its codes"""
+        return self._labels[field]
+
+    def code_of(self, field: str, label: str) -> int:
+        """Code of a label in a categorical field, or -1 if it does not occur"""
+        return self.columns[field].categories.get_indexer([label])[0]
+
+    def isin(self, field: str, labels: Iterable[str]) -> np.ndarray:
+        """Boolean mask of exchanges whose field is one of the given labels"""
+        wanted = [self.code_of(field, label) for label in labels]
+        return np.isin(self.columns[field].codes, [code for code in wanted if code >= 0])
+
+    @property
+    def exchange_index(self) -> Dict[str, np.ndarray]:
+        """Activity code -> positions of its exchanges (in file order), grouped once
+
+        Exchanges without an activity code belong to no activity; see unassigned_exchanges.
+        """
+
+        if self._exchange_index is None:
+            code_ids = self.codes('activity_code').astype(np.int64)
+            labels = self.labels('activity_code')
+            order = np.argsort(code_ids, kind='stable')
+            order = order[code_ids[order] >= 0]
+            counts = np.bincount(code_ids[code_ids >= 0], minlength=len(labels))
+            self._exchange_index = dict(zip(labels, np.split(order, np.cumsum(counts)[:-1])))
+        return self._exchange_index
+
+    @property
+    def unassigned_exchanges(self) -> np.ndarray:
+        """Positions of exchanges without an activity code"""
+        return np.flatnonzero(self.codes('activity_code') < 0)
+
+    @property
+    def activity_name_index(self) -> Dict[str, str]:
+        """Activity name -> code, the first activity winning like a linear search would"""
+
+        if self._activity_name_index is None:
+            index = {}
+            for act in self.activities:
+                index.setdefault(act['name'], act['code'])
+            self._activity_name_index = index
+        return self._activity_name_index
+
+    @property
+    def product_name_index(self) -> Dict[str, str]:
+        """Production flow name -> code of the first activity producing it"""
+
+        if self._product_name_index is None:
+            production = np.flatnonzero(self.isin('type', ['production']))
+            flow_labels, code_labels = self.labels('flow_name'), self.labels('activity_code')
+            index = {}
+            for flow_id, code_id in zip(self.codes('flow_name')[production].tolist(),
+                                        self.codes('activity_code')[production].tolist()):
+                if flow_id >= 0 and code_id >= 0:
+                    index.setdefault(flow_labels[flow_id], code_labels[code_id])
+            self._product_name_index = index
+        return self._product_name_index
+
+    @property
+    def supplier_index(self) -> Dict[str, str]:
+        """Input flow name -> code of the supplying activity
+
+        The one linking rule shared by the LCA engine, the Brightway export and the
+        network diagram: activity names take precedence over production flow names.
+        """
+
+        if self._supplier_index is None:
+            index = dict(self.product_name_index)
+            index.update(self.activity_name_index)
+            self._supplier_index = index
+        return self._supplier_index
+
+    @property
+    def exchanges(self) -> 'ExchangeRecords':
+        """Sequence of dict-like exchange views"""
+        if self._exchanges is None:
+            self._exchanges = ExchangeRecords(self)
+        return self._exchanges
+
+    def value(self, field: str, position: int):
+        """Python value of one exchange field, as it would appear in an exchange dict"""
+
+        if field in NUMERIC_FIELDS:
+            value = float(self.columns[field][position])
+            if field == 'uncertainty' and value != value:
+                return None
+            return value
+        code = self.columns[field].codes[position]
+        return self._labels[field][code] if code >= 0 else None
+
+    def exchange_frame(self) -> pd.DataFrame:
+        """Exchanges as a DataFrame (categoricals stay categorical)"""
+
+        frame = pd.DataFrame({field: self.columns[field] for field in EXCHANGE_FIELDS})
+        if frame['uncertainty'].isna().all():
+            frame = frame.drop(columns='uncertainty')
+        return frame
+
+    def iter_rows(self) -> Iterator[tuple]:
+        """Exchange tuples in EXCHANGE_FIELDS order (missing uncertainty as None)"""
+
+        decoded = []
+        for field in EXCHANGE_FIELDS:
+            if field in NUMERIC_FIELDS:
+                decoded.append(self.columns[field].tolist())
+            else:
+                labels = self._labels[field] + [None]
+                decoded.append([labels[code] for code in self.columns[field].codes.tolist()])
+        for row in zip(*decoded):
+            uncertainty = row[-1]
+            if uncertainty != uncertainty:
+                row = row[:-1] + (None,)
+            yield row
+
+    def to_records(self) -> List[dict]:
+        """Exchanges as plain dicts (the uncertainty key only where one is given)"""
+
+        records = []
+        for row in self.iter_rows():
+            exc = dict(zip(EXCHANGE_FIELDS[:-1], row[:-1]))
+            if row[-1] is not None:
+                exc['uncertainty'] = row[-1]
+            records.append(exc)
+        return records
+
+    def exchange_hashes(self) -> np.ndarray:
+        """64-bit hash of every exchange row, comparable across inventories"""
+
+        frame = pd.DataFrame({field: self.columns[field] for field in EXCHANGE_FIELDS})
+        return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+    def content_hash(self) -> str:
+        """Stable digest of activities and exchange columns"""
+
+        if self._content_hash is None:
+            hasher = hashlib.sha1(
+                json.dumps(self.activities, default=str, sort_keys=True, ensure_ascii=False).encode('utf-8')
+            )
+            for field in CATEGORICAL_FIELDS:
+                hasher.update(json.dumps(self._labels[field], ensure_ascii=False).encode('utf-8'))
+                hasher.update(self.columns[field].codes.astype(np.int64).tobytes())
+            for field in NUMERIC_FIELDS:
+                hasher.update(self.columns[field].tobytes())
+            self._content_hash = hasher.hexdigest()
+        return self._content_hash
+
+
+class ExchangeRecord(Mapping):
+    """Read-only dict-like view of one exchange row"""
+
+    __slots__ = ('_inventory', '_position')
+
+    def __init__(self, inventory: LCIInventory, position: int):
+        self._inventory = inventory
+        self._position = position
+
+    def __getitem__(self, key):
+        if key not in EXCHANGE_FIELDS:
+            raise KeyError(key)
+        value = self._inventory.value(key, self._position)
+        if key == 'uncertainty' and value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        for field in EXCHANGE_FIELDS[:-1]:
+            yield field
+        if self._inventory.value('uncertainty', self._position) is not None:
+            yield 'uncertainty'
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class ExchangeRecords(Sequence):
+    """List-like view of an inventory's exchanges"""
+
+    def __init__(self, inventory: LCIInventory):
+        self.inventory = inventory
+
+    def __len__(self) -> int:
+        return len(self.inventory)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [ExchangeRecord(self.inventory, i) for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError('exchange index out of range')
+        return ExchangeRecord(self.inventory, position)
+
+    def __iter__(self) -> Iterator[ExchangeRecord]:
+        inventory = self.inventory
+        for position in range(len(inventory)):
+            yield ExchangeRecord(inventory, position)
+
+    def __repr__(self) -> str:
+        return f"<ExchangeRecords: {len(self)} exchanges>"
+
+
+def as_inventory(lci_data: dict) -> LCIInventory:
+    """Return the columnar inventory behind lci_data, building one from dicts if needed"""
+
+    activities = lci_data.get('activities', [])
+    exchanges = lci_data.get('exchanges', [])
+    if isinstance(exchanges, ExchangeRecords) and exchanges.inventory.activities == list(activities):
+        return exchanges.inventory
+    return LCIInventory.from_records(activities, exchanges)
+
+
+def exchanges_frame(exchanges) -> pd.DataFrame:
+    """DataFrame of an exchange sequence (columnar views or plain dicts)"""
+
+    if isinstance(exchanges, ExchangeRecords):
+        return exchanges.inventory.exchange_frame()
+    return pd.DataFrame(list(exchanges))
+
+
+def iter_exchange_rows(exchanges) -> Iterator[tuple]:
+    """Exchange tuples in EXCHANGE_FIELDS order for columnar views or plain dicts"""
+
+    if isinstance(exchanges, ExchangeRecords):
+        return exchanges.inventory.iter_rows()
+    return (tuple(exc.get(field) for field in EXCHANGE_FIELDS) for exc in exchanges)
+
+
+def count_exchange_types(exchanges, types: Tuple[str, ...]) -> int:
+    """Number of exchanges whose type is one of the given types"""
+
+    if isinstance(exchanges, ExchangeRecords):
+        return int(exchanges.inventory.isin('type', types).sum())
+    return sum(1 for exc in exchanges if exc.get('type') in types)
+
+
+class InventoryDiff:
+    """Activity-level difference between a stored inventory and a re-uploaded one"""
+
+    def __init__(self, added: List[str], removed: List[str], changed: List[str], unchanged: List[str],
+                 exchanges_added: int, exchanges_removed: int):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+        self.unchanged = unchanged
+        self.exchanges_added = exchanges_added
+        self.exchanges_removed = exchanges_removed
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+    @property
+    def touched(self) -> List[str]:
+        """Codes of every activity that was added, removed or changed"""
+        return self.added + self.removed + self.changed
+
+    def __repr__(self) -> str:
+        return (f"InventoryDiff(+{len(self.added)} -{len(self.removed)} ~{len(self.changed)} activities, "
+                f"+{self.exchanges_added} -{self.exchanges_removed} exchanges)")
+
+
+def _activity_signatures(inventory: LCIInventory) -> Tuple[Dict[str, bytes], Dict[str, np.ndarray]]:
+    """Per activity: digest of its attributes and exchanges, and its sorted exchange hashes"""
+
+    row_hashes = inventory.exchange_hashes()
+    no_exchanges = np.zeros(0, dtype=np.int64)
+    activities = {activity['code']: activity for activity in inventory.activities}
+    signatures, exchange_hashes = {}, {}
+    # Exchanges of unknown activity codes are compared too, under their code
+    for code in list(activities) + [code for code in inventory.exchange_index if code not in activities]:
+        hashes = np.sort(row_hashes[inventory.exchange_index.get(code, no_exchanges)])
+        hasher = hashlib.sha1(
+            json.dumps(activities.get(code), default=str, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        )
+        hasher.update(hashes.tobytes())
+        signatures[code] = hasher.digest()
+        exchange_hashes[code] = hashes
+    return signatures, exchange_hashes
+
+
+def _multiset_excess(left: np.ndarray, right: np.ndarray) -> int:
+    """Number of elements of left not matched by an element of right (multiset difference)"""
+
+    values, counts = np.unique(left, return_counts=True)
+    right_values, right_counts = np.unique(right, return_counts=True)
+    matched = np.zeros(len(values), dtype=np.int64)
+    if len(right_values):
+        position = np.minimum(np.searchsorted(right_values, values), len(right_values) - 1)
+        found = right_values[position] == values
+        matched[found] = right_counts[position[found]]
+    return int(np.maximum(counts - matched, 0).sum())
+
+
+def diff_inventories(old: LCIInventory, new: LCIInventory) -> InventoryDiff:
+    """Compare two inventories activity by activity (exchange order within an activity is ignored)"""
+
+    old_signatures, old_hashes = _activity_signatures(old)
+    new_signatures, new_hashes = _activity_signatures(new)
+    empty = np.zeros(0, dtype=np.uint64)
+
+    added = [code for code in new_signatures if code not in old_signatures]
+    removed = [code for code in old_signatures if code not in new_signatures]
+    changed, unchanged = [], []
+    for code, signature in new_signatures.items():
+        if code in old_signatures:
+            (unchanged if old_signatures[code] == signature else changed).append(code)
+
+    exchanges_added = exchanges_removed = 0
+    for code in added + removed + changed:
+        before, after = old_hashes.get(code, empty), new_hashes.get(code, empty)
+        exchanges_added += _multiset_excess(after, before)
+        exchanges_removed += _multiset_excess(before, after)
+
+    return InventoryDiff(added, removed, changed, unchanged, exchanges_added, exchanges_removed)
+
+
+class LazyLCIData(MutableMapping):
+    """
+    lci_data mapping whose activities and exchanges are loaded on first access
+
+    Metadata and flow mapping are available immediately; the inventory itself is only
+    read (memory-mapped from disk or queried from SQLite) once a caller touches it.
+    """
+
+    LAZY_KEYS = ('activities', 'exchanges')
+
+    def __init__(self, metadata: dict, flow_mapping: dict, loader: Callable[[], LCIInventory],
+                 inventory_hash: Optional[str] = None):
+        self._data = {'metadata': metadata, 'flow_mapping': flow_mapping}
+        self._loader = loader
+        self._inventory_hash = inventory_hash
+
+    @property
+    def loaded(self) -> bool:
+        return self._loader is None
+
+    @property
+    def inventory_hash(self) -> Optional[str]:
+        """Content hash of the not-yet-loaded inventory (None once loaded, as it may change)"""
+        return None if self.loaded else self._inventory_hash
+
+    def _load(self):
+        if self._loader is not None:
+            inventory = self._loader()
+            self._data['activities'] = inventory.activities
+            self._data['exchanges'] = inventory.exchanges
+            self._loader = None
+
+    def __getitem__(self, key):
+        if key in self.LAZY_KEYS:
+            self._load()
+        return self._data[key]
+
+    def __setitem__(self, key, value):
+        self._load()
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        self._load()
+        del self._data[key]
+
+    def __iter__(self):
+        if not self.loaded:
+            return iter((*self._data, *self.LAZY_KEYS))
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data) + (0 if self.loaded else len(self.LAZY_KEYS))
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self.loaded else 'not loaded'
+        return f"<LazyLCIData ({state}): {sorted(self)}>"
+
+
+def write_inventory_file(inventory: LCIInventory, path: Path):
+    """
+    Write an inventory as an uncompressed Arrow IPC file
+
+    Categorical fields become dictionary arrays; activities are kept as JSON in the
+    schema metadata. The file is written to a temporary name and moved into place.
+    """
+
+    arrays = []
+    for field in EXCHANGE_FIELDS:
+        column = inventory.columns[field]
+        if field in CATEGORICAL_FIELDS:
+            codes = column.codes.astype(np.int32)
+            indices = pa.array(codes, mask=codes < 0)
+            dictionary = pa.array(inventory.labels(field), type=pa.string())
+            arrays.append(pa.DictionaryArray.from_arrays(indices, dictionary))
+        else:
+            arrays.append(pa.array(column, type=pa.float64()))
+    table = pa.Table.from_arrays(arrays, names=list(EXCHANGE_FIELDS)).replace_schema_metadata({
+        'activities': json.dumps(inventory.activities, default=str, ensure_ascii=False),
+    })
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    os.close(fd)
+    try:
+        with pa.OSFile(tmp_name, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_name, path)
+    except Exception:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+
+
+def _single_chunk(column):
+    """Arrow array of a table column without copying when it has a single chunk"""
+
+    if column.num_chunks == 1:
+        return column.chunk(0)
+    if column.num_chunks == 0:
+        return pa.array([], type=column.type)
+    return pa.concat_arrays(column.chunks)
+
+
+def read_inventory_file(path: Path) -> LCIInventory:
+    """Memory-map an inventory written by write_inventory_file (numeric columns are zero-copy)"""
+
+    table = pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+    activities = json.loads(table.schema.metadata[b'activities'])
+    columns = {}
+    for field in EXCHANGE_FIELDS:
+        array = _single_chunk(table.column(field))
+        if field in CATEGORICAL_FIELDS:
+            indices = array.indices.fill_null(-1) if array.null_count else array.indices
+            columns[field] = pd.Categorical.from_codes(
+                indices.to_numpy(), categories=array.dictionary.to_pylist(), validate=False
+            )
+        else:
+            columns[field] = array.to_numpy(zero_copy_only=False)
+    return LCIInventory(activities, columns)
@@ -0,0 +1,867 @@
+"""
+LCA Calculation Engine for Sustain 4.0 BioEngine
+Builds technosphere/biosphere matrices from parsed LCI data and solves them offline
+"""
+
+import hashlib
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+import scipy.sparse as sp  # type: ignore
+from scipy.sparse.csgraph import breadth_first_order  # type: ignore
+from scipy.sparse.linalg import splu  # type: ignore
+from typing import Callable, Dict, List, Optional, Tuple
+from inventory import InventoryDiff, LCIInventory, as_inventory
+from characterization import DEFAULT_METHOD_VERSION, get_factor_table
+
+
+IMPACT_CATEGORIES = {
+    'GWP': {'unit': 'kg CO₂-eq', 'icon': '🌡️'},
+    'Water Use': {'unit': 'm³', 'icon': '💧'},
+    'Land Use': {'unit': 'm²·year', 'icon': '🌾'},
+    'CED': {'unit': 'MJ', 'icon': '⚡'},
+    'Acidification': {'unit': 'kg SO₂-eq', 'icon': '🧪'},
+    'Eutrophication': {'unit': 'kg PO₄-eq', 'icon': '🌊'},
+}
+
+BIOSPHERE_TYPES = ('emission', 'resource')
+CUTOFF_COMPARTMENT = 'technosphere'
+
+# Factorizations are reused across recalculations of an unchanged inventory
+FACTORIZATION_CACHE_MAX_BYTES = 256 * 1024 * 1024
+FACTORIZATION_CACHE_MAX_ENTRIES = 64
+MATRICES_CACHE_MAX_ENTRIES = 64
+
+# Monte Carlo defaults; inventories up to DENSE_BATCH_MAX_ACTIVITIES are solved as stacked dense systems
+MONTE_CARLO_DEFAULT_ITERATIONS = 1000
+MONTE_CARLO_BATCH_SIZE = 250
+MONTE_CARLO_CHUNK_SIZE = 1000
+# Worker processes take seconds to spawn; below this many sampled entries (iterations x matrix nonzeros)
+# the run stays in the calling thread
+MONTE_CARLO_PROCESS_MIN_WORK = 20_000_000
+# Stacked dense solves beat per-sample sparse LU only on small systems (crossover near 150 activities)
+DENSE_BATCH_MAX_ACTIVITIES = 100
+DENSE_BATCH_MAX_BYTES = 32 * 1024 * 1024
+
+# Contribution tables keep the largest contributors above this share of the category total
+CONTRIBUTION_DEFAULT_TOP_N = 10
+CONTRIBUTION_DEFAULT_CUTOFF = 0.01
+
+# Flow (Sankey) views drop links below this share of the largest comparable flow
+FLOW_DEFAULT_CUTOFF = 0.01
+FLOW_MAX_LINKS = 100
+
+SCENARIO_COLUMNS = [
+    'Inventory', 'Scenario', 'Reference Activity', 'Functional Unit Amount', 'Impact Category', 'Value', 'Unit'
+]
+
+
+class InventoryMatrices:
+    """
+    Sparse matrix form of an inventory
+
+    Columns of A and B are activities. Rows of A are the activities' products;
+    rows of B are biosphere flows plus unlinked (cut-off) technosphere inputs.
+    Matrix entries are kept as coordinate triplets so they can be resampled.
+    """
+
+    def __init__(self, activity_codes, flow_keys, a_rows, a_cols, a_values, a_scales,
+                 b_rows, b_cols, b_values, b_scales):
+        self.activity_codes = list(activity_codes)
+        self.activity_index = {code: idx for idx, code in enumerate(self.activity_codes)}
+        self.flow_keys = list(flow_keys)
+        self.a_rows, self.a_cols = a_rows, a_cols
+        self.a_values, self.a_scales = a_values, a_scales
+        self.b_rows, self.b_cols = b_rows, b_cols
+        self.b_values, self.b_scales = b_values, b_scales
+        self.characterization = {}  # method version -> factors compiled for flow_keys
+
+    @property
+    def n_activities(self) -> int:
+        return len(self.activity_codes)
+
+    @property
+    def n_flows(self) -> int:
+        return len(self.flow_keys)
+
+    def technosphere(self, values=None) -> sp.csr_matrix:
+        """Technosphere matrix A as CSR (duplicate entries are summed)"""
+        values = self.a_values if values is None else values
+        shape = (self.n_activities, self.n_activities)
+        return sp.csr_matrix((values, (self.a_rows, self.a_cols)), shape=shape)
+
+    def biosphere(self, values=None) -> sp.csr_matrix:
+        """Biosphere matrix B as CSR (duplicate entries are summed)"""
+        values = self.b_values if values is None else values
+        shape = (self.n_flows, self.n_activities)
+        return sp.csr_matrix((values, (self.b_rows, self.b_cols)), shape=shape)
+
+
+def _link_flows(inventory: LCIInventory, activity_index: Dict[str, int]) -> np.ndarray:
+    """Map each flow-name label to the column of the activity producing it (-1 if unlinked)"""
+
+    supplier_index = inventory.supplier_index
+    return np.array(
+        [activity_index.get(supplier_index.get(label), -1) for label in inventory.labels('flow_name')],
+        dtype=np.int64
+    )
+
+
+def build_inventory_matrices(inventory: LCIInventory) -> InventoryMatrices:
+    """Build technosphere (A) and biosphere (B) matrices from a columnar inventory"""
+
+    activities = inventory.activities
+    activity_codes = [act['code'] for act in activities]
+    activity_index = {code: idx for idx, code in enumerate(activity_codes)}
+
+    # Column of every exchange's owning activity (-1 for orphans and missing codes, which are skipped)
+    code_to_col = np.array(
+        [activity_index.get(code, -1) for code in inventory.labels('activity_code')] + [-1], dtype=np.int64
+    )
+    cols = code_to_col[inventory.codes('activity_code')]
+    valid = cols >= 0
+    amounts = inventory.columns['amount']
+    scales = np.nan_to_num(inventory.columns['uncertainty'], nan=0.0)
+
+    is_production = valid & inventory.isin('type', ['production'])
+    is_input = valid & inventory.isin('type', ['input'])
+    is_biosphere = valid & inventory.isin('type', BIOSPHERE_TYPES)
+
+    flow_ids = inventory.codes('flow_name').astype(np.int64)
+    linked_cols = _link_flows(inventory, activity_index)[flow_ids]
+    is_linked = is_input & (linked_cols >= 0)
+
+    # A: production on the diagonal, linked inputs as negative off-diagonal entries (exchange order)
+    in_a = is_production | is_linked
+    a_rows = np.where(is_production, cols, linked_cols)[in_a]
+    a_cols = cols[in_a]
+    a_values = np.where(is_production, amounts, -amounts)[in_a]
+    a_scales = scales[in_a]
+
+    # B: biosphere flows keyed by (name, compartment, unit); unlinked inputs are cut-off flows
+    in_b = is_biosphere | (is_input & ~is_linked)
+    compartments = {}
+    category_compartment = np.array(
+        [compartments.setdefault(label or '', len(compartments)) for label in inventory.labels('category')]
+        + [compartments.setdefault('', len(compartments))],
+        dtype=np.int64
+    )
+    cutoff_compartment = compartments.setdefault(CUTOFF_COMPARTMENT, len(compartments))
+    compartment_ids = np.where(
+        is_input, cutoff_compartment, category_compartment[inventory.codes('category').astype(np.int64)]
+    )[in_b]
+    b_flow_ids = flow_ids[in_b]
+    b_unit_ids = inventory.codes('unit').astype(np.int64)[in_b]
+    keys = np.stack([b_flow_ids, compartment_ids, b_unit_ids], axis=1)
+    unique_keys, first_seen, b_rows = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    # Number flows in order of first appearance
+    appearance = np.argsort(first_seen, kind='stable')
+    renumber = np.empty_like(appearance)
+    renumber[appearance] = np.arange(len(appearance))
+    b_rows = renumber[b_rows.reshape(-1)]
+    compartment_labels = list(compartments)
+    flow_labels, unit_labels = inventory.labels('flow_name'), inventory.labels('unit')
+    flow_keys = [
+        (flow_labels[flow_id], compartment_labels[compartment_id], unit_labels[unit_id])
+        for flow_id, compartment_id, unit_id in unique_keys[appearance].tolist()
+    ]
+
+    # Activities without a production exchange fall back to their reference production
+    produced = np.zeros(len(activities), dtype=bool)
+    produced[cols[is_production]] = True
+    fallback = np.flatnonzero(~produced)
+    fallback_values = np.array(
+        [float(activities[col].get('reference_production') or 1.0) for col in fallback.tolist()],
+        dtype=np.float64
+    )
+
+    return InventoryMatrices(
+        activity_codes,
+        flow_keys,
+        np.concatenate([a_rows, fallback]).astype(np.int64),
+        np.concatenate([a_cols, fallback]).astype(np.int64),
+        np.concatenate([a_values, fallback_values]).astype(np.float64),
+        np.concatenate([a_scales, np.zeros(len(fallback))]).astype(np.float64),
+        b_rows.astype(np.int64), cols[in_b].astype(np.int64),
+        amounts[in_b].astype(np.float64), scales[in_b].astype(np.float64),
+    )
+
+
+def characterization_matrix(matrices: InventoryMatrices, categories: List[str],
+                            method_version: str = DEFAULT_METHOD_VERSION) -> np.ndarray:
+    """Dense characterization matrix C (categories x flows) for the inventory's flows"""
+
+    table = get_factor_table(method_version)
+    compiled = matrices.characterization.get(method_version)
+    if compiled is None:
+        compiled = matrices.characterization[method_version] = table.compile(matrices.flow_keys)
+    return compiled[table.category_rows(categories)]
+
+
+def default_reference_activity(matrices: InventoryMatrices) -> str:
+    """Pick the activity whose product is not consumed by any other activity"""
+
+    consumed = set(matrices.a_rows[matrices.a_rows != matrices.a_cols].tolist())
+    candidates = [code for idx, code in enumerate(matrices.activity_codes) if idx not in consumed]
+    return (candidates or matrices.activity_codes)[-1]
+
+
+def demand_vector(matrices: InventoryMatrices, fu_amount: float,
+                  reference_activity: Optional[str] = None) -> np.ndarray:
+    """Final demand vector f for the functional unit amount"""
+
+    if reference_activity is None:
+        reference_activity = default_reference_activity(matrices)
+    if reference_activity not in matrices.activity_index:
+        raise ValueError(f"Unknown reference activity: {reference_activity}")
+    f = np.zeros(matrices.n_activities)
+    f[matrices.activity_index[reference_activity]] = fu_amount
+    return f
+
+
+def technosphere_hash(matrices: InventoryMatrices) -> str:
+    """Content hash of the technosphere matrix only (biosphere edits keep the factorization)"""
+
+    hasher = hashlib.sha1(str(matrices.n_activities).encode('ascii'))
+    for array in (matrices.a_rows, matrices.a_cols, matrices.a_values):
+        hasher.update(np.ascontiguousarray(array).tobytes())
+    return hasher.hexdigest()
+
+
+class CachedFactorization:
+    """Sparse LU factorization of A with a lock, since SuperLU solves are not thread-safe"""
+
+    def __init__(self, lu):
+        self.lu = lu
+        self.nbytes = (lu.L.nnz + lu.U.nnz) * 12 + (lu.perm_r.nbytes + lu.perm_c.nbytes)
+        self._lock = threading.Lock()
+
+    def solve(self, rhs: np.ndarray, trans: str = 'N') -> np.ndarray:
+        with self._lock:
+            return self.lu.solve(rhs, trans=trans)
+
+
+_cache_lock = threading.Lock()
+_factorization_cache = OrderedDict()  # technosphere hash -> CachedFactorization
+_matrices_cache = OrderedDict()  # inventory hash -> InventoryMatrices
+
+
+def _evict_factorizations():
+    """Drop least recently used factorizations until the cache is within its limits"""
+
+    total = sum(entry.nbytes for entry in _factorization_cache.values())
+    while _factorization_cache and (
+        total > FACTORIZATION_CACHE_MAX_BYTES or len(_factorization_cache) > FACTORIZATION_CACHE_MAX_ENTRIES
+    ):
+        _key, entry = _factorization_cache.popitem(last=False)
+        total -= entry.nbytes
+
+
+def get_factorization(matrices: InventoryMatrices) -> CachedFactorization:
+    """Return the cached LU factorization of A, computing it on first use"""
+
+    key = technosphere_hash(matrices)
+    with _cache_lock:
+        entry = _factorization_cache.get(key)
+        if entry is not None:
+            _factorization_cache.move_to_end(key)
+            return entry
+
+    try:
+        entry = CachedFactorization(splu(matrices.technosphere().tocsc()))
+    except RuntimeError as e:
+        raise ValueError(f"Technosphere matrix is singular: {e}") from e
+
+    with _cache_lock:
+        _factorization_cache[key] = entry
+        _factorization_cache.move_to_end(key)
+        _evict_factorizations()
+    return entry
+
+
+def get_inventory_matrices(lci_data: dict) -> InventoryMatrices:
+    """Return the cached matrices for an inventory, building them on first use"""
+
+    inventory = as_inventory(lci_data)
+    key = inventory.content_hash()
+    with _cache_lock:
+        matrices = _matrices_cache.get(key)
+        if matrices is not None:
+            _matrices_cache.move_to_end(key)
+            return matrices
+
+    matrices = build_inventory_matrices(inventory)
+    with _cache_lock:
+        _matrices_cache[key] = matrices
+        while len(_matrices_cache) > MATRICES_CACHE_MAX_ENTRIES:
+            _matrices_cache.popitem(last=False)
+    return matrices
+
+
+def clear_calculation_cache():
+    """Forget all cached matrices and factorizations"""
+
+    with _cache_lock:
+        _factorization_cache.clear()
+        _matrices_cache.clear()
+
+
+def supply_chain(matrices: InventoryMatrices, reference_activity: Optional[str] = None) -> set:
+    """Codes of the activities the reference activity draws on, directly or indirectly (itself included)"""
+
+    if reference_activity is None:
+        reference_activity = default_reference_activity(matrices)
+    n = matrices.n_activities
+    # Edges run from each consuming activity (column of A) to its suppliers (rows of A)
+    graph = sp.csr_matrix((np.ones(len(matrices.a_rows)), (matrices.a_cols, matrices.a_rows)), shape=(n, n))
+    reached = breadth_first_order(graph, matrices.activity_index[reference_activity], return_predecessors=False)
+    return {matrices.activity_codes[idx] for idx in reached.tolist()}
+
+
+def update_inventory_cache(old_lci_data: dict, new_lci_data: dict, diff: InventoryDiff,
+                           reference_activity: Optional[str] = None) -> Dict[str, bool]:
+    """
+    Carry cached calculation state over from a stored inventory to its re-uploaded version
+
+    The stale matrices are dropped. The LU factorization is only dropped when the
+    technosphere changed and compiled characterization factors are kept when the
+    biosphere flows are the same. Saved results stay valid when no added, removed
+    or changed activity lies in the old or new supply chain of the reference activity.
+
+    Returns:
+        dict: {'factorization_reused': bool, 'characterization_reused': bool, 'results_valid': bool}
+    """
+
+    old_key = as_inventory(old_lci_data).content_hash()
+    new_key = as_inventory(new_lci_data).content_hash()
+    if old_key == new_key:
+        return {'factorization_reused': True, 'characterization_reused': True, 'results_valid': True}
+
+    with _cache_lock:
+        old_matrices = _matrices_cache.pop(old_key, None)
+    if old_matrices is None:
+        old_matrices = build_inventory_matrices(as_inventory(old_lci_data))
+    new_matrices = get_inventory_matrices(new_lci_data)
+
+    factorization_reused = technosphere_hash(old_matrices) == technosphere_hash(new_matrices)
+    if not factorization_reused:
+        with _cache_lock:
+            _factorization_cache.pop(technosphere_hash(old_matrices), None)
+
+    characterization_reused = old_matrices.flow_keys == new_matrices.flow_keys
+    if characterization_reused:
+        for method_version, compiled in old_matrices.characterization.items():
+            new_matrices.characterization.setdefault(method_version, compiled)
+
+    results_valid = bool(old_matrices.n_activities and new_matrices.n_activities)
+    if results_valid:
+        old_reference = reference_activity or default_reference_activity(old_matrices)
+        new_reference = reference_activity or default_reference_activity(new_matrices)
+        results_valid = (
+            old_reference == new_reference
+            and old_reference in old_matrices.activity_index
+            and new_reference in new_matrices.activity_index
+        )
+    if results_valid:
+        touched = set(diff.touched)
+        results_valid = not (
+            touched & supply_chain(old_matrices, old_reference)
+            or touched & supply_chain(new_matrices, new_reference)
+        )
+
+    return {
+        'factorization_reused': factorization_reused,
+        'characterization_reused': characterization_reused,
+        'results_valid': results_valid,
+    }
+
+
+def solve_scaling_vector(matrices: InventoryMatrices, demand: np.ndarray) -> np.ndarray:
+    """Solve A s = f by back-substitution on the cached sparse LU factorization"""
+
+    return get_factorization(matrices).solve(demand)
+
+
+def calculate_impacts(lci_data: dict, fu_amount: float, categories: List[str],
+                      reference_activity: Optional[str] = None) -> Dict[str, dict]:
+    """
+    Calculate impact scores for the selected categories
+
+    Returns:
+        dict: {category: {'value': float, 'unit': str, 'icon': str}}
+    """
+
+    activities = lci_data.get('activities', [])
+    if not activities:
+        raise ValueError("Inventory has no activities")
+
+    matrices = get_inventory_matrices(lci_data)
+    demand = demand_vector(matrices, fu_amount, reference_activity)
+    scaling = solve_scaling_vector(matrices, demand)
+    inventory = matrices.biosphere() @ scaling
+    scores = characterization_matrix(matrices, categories) @ inventory
+
+    return {
+        category: {
+            'value': float(score),
+            'unit': IMPACT_CATEGORIES[category]['unit'],
+            'icon': IMPACT_CATEGORIES[category]['icon'],
+        }
+        for category, score in zip(categories, scores)
+    }
+
+
+def solve_demands(matrices: InventoryMatrices, demands: np.ndarray) -> np.ndarray:
+    """Solve A S = F for a matrix of demand vectors (activities x scenarios) in one multi-RHS solve"""
+
+    demands = np.asarray(demands, dtype=np.float64)
+    if demands.ndim == 1:
+        demands = demands[:, None]
+    return get_factorization(matrices).solve(demands)
+
+
+def calculate_scenarios(lci_data: dict, scenarios: List[dict], categories: List[str],
+                        inventory_label: str = '') -> pd.DataFrame:
+    """
+    Calculate many functional-unit scenarios against one factorization
+
+    Args:
+        scenarios: [{'name': str, 'fu_amount': float, 'reference_activity': code or None}, ...]
+        inventory_label: Label for the Inventory column (to compare alternative inventories)
+
+    Returns:
+        Tidy DataFrame with one row per scenario and impact category
+    """
+
+    if not lci_data.get('activities'):
+        raise ValueError("Inventory has no activities")
+    if not scenarios:
+        return pd.DataFrame(columns=SCENARIO_COLUMNS)
+
+    matrices = get_inventory_matrices(lci_data)
+    demands = np.column_stack([
+        demand_vector(matrices, float(scenario['fu_amount']), scenario.get('reference_activity'))
+        for scenario in scenarios
+    ])
+    scaling = solve_demands(matrices, demands)
+    scores = characterization_matrix(matrices, categories) @ (matrices.biosphere() @ scaling)
+
+    n_scenarios, n_categories = len(scenarios), len(categories)
+    reference_codes = [
+        scenario.get('reference_activity') or default_reference_activity(matrices) for scenario in scenarios
+    ]
+    return pd.DataFrame({
+        'Inventory': inventory_label,
+        'Scenario': np.repeat([scenario.get('name') or f"Scenario {idx + 1}"
+                               for idx, scenario in enumerate(scenarios)], n_categories),
+        'Reference Activity': np.repeat(reference_codes, n_categories),
+        'Functional Unit Amount': np.repeat([float(scenario['fu_amount']) for scenario in scenarios], n_categories),
+        'Impact Category': np.tile(categories, n_scenarios),
+        'Value': scores.T.ravel(),
+        'Unit': np.tile([IMPACT_CATEGORIES[category]['unit'] for category in categories], n_scenarios),
+    }, columns=SCENARIO_COLUMNS)
+
+
+def _top_contributions(scores: np.ndarray, labels: List[str], categories: List[str],
+                       top_n: int, cutoff: float) -> List[dict]:
+    """Top-N contributors per category above a share cutoff, with the remainder as 'Other'"""
+
+    totals = scores.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shares = np.where(totals[:, None] != 0, scores / totals[:, None], 0.0)
+    order = np.argsort(-np.abs(scores), axis=1)[:, :top_n]
+
+    records = []
+    for row, category in enumerate(categories):
+        kept = [idx for idx in order[row] if abs(shares[row, idx]) >= cutoff and scores[row, idx] != 0]
+        for idx in kept:
+            records.append({
+                'Impact Category': category,
+                'Contributor': labels[idx],
+                'Score': float(scores[row, idx]),
+                'Share': float(shares[row, idx]),
+            })
+        other = totals[row] - scores[row, kept].sum()
+        if kept and not np.isclose(other, 0.0):
+            records.append({
+                'Impact Category': category,
+                'Contributor': 'Other',
+                'Score': float(other),
+                'Share': float(other / totals[row]) if totals[row] else 0.0,
+            })
+    return records
+
+
+def contribution_analysis(lci_data: dict, fu_amount: float, categories: List[str],
+                          reference_activity: Optional[str] = None,
+                          top_n: int = CONTRIBUTION_DEFAULT_TOP_N,
+                          cutoff: float = CONTRIBUTION_DEFAULT_CUTOFF) -> dict:
+    """
+    Contribution of each activity and each biosphere flow to every impact category
+
+    Activity scores are diag(s)·Bᵀ·Cᵀ and flow scores are C·diag(B s), both computed
+    in one pass over the sparse matrices.
+
+    Returns:
+        dict: {'activities': [records], 'flows': [records], 'top_n': int, 'cutoff': float}
+              where each record has 'Impact Category', 'Contributor', 'Score' and 'Share'
+    """
+
+    matrices = get_inventory_matrices(lci_data)
+    demand = demand_vector(matrices, fu_amount, reference_activity)
+    scaling = solve_scaling_vector(matrices, demand)
+    B = matrices.biosphere()
+    C = characterization_matrix(matrices, categories)
+
+    activity_scores = np.asarray(B.T @ C.T).T * scaling  # categories x activities
+    flow_scores = C * (B @ scaling)  # categories x flows
+
+    names = {act['code']: act['name'] for act in lci_data.get('activities', [])}
+    activity_labels = [f"{names.get(code, code)} ({code})" for code in matrices.activity_codes]
+    flow_labels = [
+        f"{name} ({compartment})" if compartment else str(name)
+        for name, compartment, _unit in matrices.flow_keys
+    ]
+
+    return {
+        'activities': _top_contributions(activity_scores, activity_labels, categories, top_n, cutoff),
+        'flows': _top_contributions(flow_scores, flow_labels, categories, top_n, cutoff),
+        'top_n': top_n,
+        'cutoff': cutoff,
+    }
+
+
+def _kept_links(values: np.ndarray, reference: np.ndarray, cutoff: float, max_links: int) -> np.ndarray:
+    """Indices of the largest links whose |value| reaches cutoff x |reference| (largest first)"""
+
+    magnitude = np.abs(values)
+    kept = np.flatnonzero((magnitude > 0) & (magnitude >= cutoff * np.abs(reference)))
+    return kept[np.argsort(-magnitude[kept], kind='stable')][:max_links]
+
+
+def flow_analysis(lci_data: dict, fu_amount: float, categories: List[str],
+                  reference_activity: Optional[str] = None,
+                  cutoff: float = FLOW_DEFAULT_CUTOFF, max_links: int = FLOW_MAX_LINKS) -> dict:
+    """
+    Inter-activity material and impact flows scaled to the functional unit
+
+    Material flows are -A·diag(s): the product of each supplier consumed by each
+    consumer for the functional unit. Impact flows carry the cumulative score
+    embodied in those products, M·(-A)·diag(s) with M = C·B·A⁻¹ from one
+    transposed solve on the cached factorization. Links below cutoff of the
+    largest flow in the same unit (materials) or of the category total (impacts)
+    are dropped, keeping at most max_links per unit or category.
+
+    Returns:
+        dict: {'nodes': [activity labels], 'materials': [records], 'impacts': [records],
+               'cutoff': float, 'fu_amount': float}
+              where material records have 'Source', 'Target' (node indices), 'Amount' and 'Unit'
+              and impact records have 'Impact Category', 'Source', 'Target' and 'Score'
+    """
+
+    matrices = get_inventory_matrices(lci_data)
+    demand = demand_vector(matrices, fu_amount, reference_activity)
+    factorization = get_factorization(matrices)
+    scaling = factorization.solve(demand)
+    B = matrices.biosphere()
+    C = characterization_matrix(matrices, categories)
+
+    # Supplier (row) -> consumer (column) links with parallel inputs summed
+    off_diagonal = matrices.a_rows != matrices.a_cols
+    links = sp.coo_matrix(
+        (-matrices.a_values[off_diagonal], (matrices.a_rows[off_diagonal], matrices.a_cols[off_diagonal])),
+        shape=(matrices.n_activities, matrices.n_activities)
+    ).tocsr().tocoo()
+    sources, targets = links.row.astype(np.int64), links.col.astype(np.int64)
+    amounts = links.data * scaling[targets]
+
+    activities = {act['code']: act for act in lci_data.get('activities', [])}
+    units = np.array([str(activities.get(code, {}).get('unit') or '') for code in matrices.activity_codes],
+                     dtype=object)
+    link_units = units[sources]
+
+    kept = []
+    for unit in pd.unique(link_units):
+        in_unit = np.flatnonzero(link_units == unit)
+        largest = np.abs(amounts[in_unit]).max(initial=0.0)
+        kept.append(in_unit[_kept_links(amounts[in_unit], largest, cutoff, max_links)])
+    material_links = np.concatenate(kept) if kept else np.zeros(0, dtype=np.int64)
+
+    # Cumulative score per unit of each product: M = C·B·A⁻¹, i.e. Aᵀ Mᵀ = (C·B)ᵀ
+    direct = np.asarray(B.T @ C.T)  # activities x categories
+    cumulative = factorization.solve(direct, trans='T').T
+    embodied = cumulative[:, sources] * amounts  # categories x links
+    totals = direct.T @ scaling
+    impact_links = [_kept_links(embodied[row], totals[row], cutoff, max_links) for row in range(len(categories))]
+
+    # Nodes are the activities touched by any kept link, in activity order
+    used = np.unique(np.concatenate(
+        [sources[material_links], targets[material_links]]
+        + [np.concatenate([sources[kept], targets[kept]]) for kept in impact_links]
+    ).astype(np.int64))
+    node_of = np.full(matrices.n_activities, -1, dtype=np.int64)
+    node_of[used] = np.arange(len(used))
+    nodes = [
+        f"{activities.get(code, {}).get('name', code)} ({code})"
+        for code in (matrices.activity_codes[idx] for idx in used.tolist())
+    ]
+
+    materials = [
+        {'Source': int(source), 'Target': int(target), 'Amount': float(amount), 'Unit': unit}
+        for source, target, amount, unit in zip(
+            node_of[sources[material_links]].tolist(), node_of[targets[material_links]].tolist(),
+            amounts[material_links].tolist(), link_units[material_links].tolist()
+        )
+    ]
+    impacts = [
+        {'Impact Category': category, 'Source': int(source), 'Target': int(target), 'Score': float(score)}
+        for row, category in enumerate(categories)
+        for source, target, score in zip(
+            node_of[sources[impact_links[row]]].tolist(), node_of[targets[impact_links[row]]].tolist(),
+            embodied[row, impact_links[row]].tolist()
+        )
+    ]
+
+    return {
+        'nodes': nodes,
+        'materials': materials,
+        'impacts': impacts,
+        'cutoff': cutoff,
+        'fu_amount': float(fu_amount),
+    }
+
+
+def _sample_values(values: np.ndarray, scales: np.ndarray, rng, size: int) -> np.ndarray:
+    """Sample (size x nnz) matrix entries from normal distributions (loc=value, scale=± uncertainty)"""
+
+    samples = np.broadcast_to(values, (size, values.size)).copy()
+    uncertain = np.flatnonzero(scales > 0)
+    if uncertain.size:
+        samples[:, uncertain] += rng.standard_normal((size, uncertain.size)) * scales[uncertain]
+    return samples
+
+
+def _solve_batch(matrices: InventoryMatrices, a_samples: np.ndarray, demand: np.ndarray) -> np.ndarray:
+    """Solve A_k s_k = f for every sampled technosphere matrix; singular samples give NaN"""
+
+    size, n = a_samples.shape[0], matrices.n_activities
+    scaling = np.full((size, n), np.nan)
+
+    if n <= DENSE_BATCH_MAX_ACTIVITIES:
+        # Scatter sampled triplets into stacked dense matrices, at most DENSE_BATCH_MAX_BYTES at a time
+        flat_index = matrices.a_rows * n + matrices.a_cols
+        scatter = sp.csr_matrix(
+            (np.ones(flat_index.size), (flat_index, np.arange(flat_index.size))), shape=(n * n, flat_index.size)
+        )
+        step = max(1, DENSE_BATCH_MAX_BYTES // (n * n * 8))
+        for start in range(0, size, step):
+            stop = min(start + step, size)
+            dense = np.asarray((scatter @ a_samples[start:stop].T).T).reshape(stop - start, n, n)
+            rhs = np.broadcast_to(demand, (stop - start, n))[..., None]
+            try:
+                scaling[start:stop] = np.linalg.solve(dense, rhs)[..., 0]
+            except np.linalg.LinAlgError:
+                for k in range(stop - start):
+                    try:
+                        scaling[start + k] = np.linalg.solve(dense[k], demand)
+                    except np.linalg.LinAlgError:
+                        pass
+        return scaling
+
+    for k in range(size):
+        try:
+            scaling[k] = splu(matrices.technosphere(a_samples[k]).tocsc()).solve(demand)
+        except RuntimeError:
+            pass
+    return scaling
+
+
+def _monte_carlo_scores(matrices: InventoryMatrices, demand: np.ndarray, C: np.ndarray,
+                        iterations: int, rng, batch_size: int = MONTE_CARLO_BATCH_SIZE) -> np.ndarray:
+    """Impact scores (iterations x categories) for sampled A and B matrices"""
+
+    # Sums each B triplet into its flow row: g = R @ (b_k * s_k[cols])
+    aggregate = sp.csr_matrix(
+        (np.ones(matrices.b_rows.size), (matrices.b_rows, np.arange(matrices.b_rows.size))),
+        shape=(matrices.n_flows, matrices.b_rows.size),
+    )
+    scores = np.empty((iterations, C.shape[0]))
+    for start in range(0, iterations, batch_size):
+        size = min(batch_size, iterations - start)
+        a_samples = _sample_values(matrices.a_values, matrices.a_scales, rng, size)
+        b_samples = _sample_values(matrices.b_values, matrices.b_scales, rng, size)
+        scaling = _solve_batch(matrices, a_samples, demand)
+        inventory = np.asarray((aggregate @ (b_samples * scaling[:, matrices.b_cols]).T).T)
+        scores[start:start + size] = inventory @ C.T
+    return scores
+
+
+def summarize_samples(samples: np.ndarray, categories: List[str],
+                      percentiles: Tuple[float, float] = (2.5, 97.5)) -> Dict[str, dict]:
+    """Mean, median, standard deviation and percentile band per category"""
+
+    valid = ~np.isnan(samples).any(axis=1)
+    samples = samples[valid]
+    if len(samples):
+        mean, median, std = samples.mean(axis=0), np.median(samples, axis=0), samples.std(axis=0)
+        low, high = np.percentile(samples, percentiles, axis=0)
+    else:
+        mean = median = std = low = high = np.full(len(categories), np.nan)
+    return {
+        category: {
+            'mean': float(mean[idx]),
+            'median': float(median[idx]),
+            'std': float(std[idx]),
+            'p_low': float(low[idx]),
+            'p_high': float(high[idx]),
+            'percentiles': list(percentiles),
+            'valid_iterations': int(valid.sum()),
+            'unit': IMPACT_CATEGORIES[category]['unit'],
+            'icon': IMPACT_CATEGORIES[category]['icon'],
+        }
+        for idx, category in enumerate(categories)
+    }
+
+
+_SHARED_ARRAY_FIELDS = ('a_rows', 'a_cols', 'a_values', 'a_scales', 'b_rows', 'b_cols', 'b_values', 'b_scales')
+
+# Worker-process state, populated once per worker by _attach_shared_inventory
+_worker_shared = {}
+
+
+def _share_inventory(matrices: InventoryMatrices, demand: np.ndarray, C: np.ndarray):
+    """Copy the matrix structure into one shared memory block; returns (block, descriptor)"""
+
+    arrays = {field: getattr(matrices, field) for field in _SHARED_ARRAY_FIELDS}
+    arrays['demand'] = np.ascontiguousarray(demand, dtype=np.float64)
+    arrays['C'] = np.ascontiguousarray(C, dtype=np.float64)
+
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        offset = -(-offset // 8) * 8  # keep every array 8-byte aligned
+        layout[name] = (offset, array.dtype.str, array.shape)
+        offset += array.nbytes
+    block = shared_memory.SharedMemory(create=True, size=max(offset, 8))
+    for name, array in arrays.items():
+        start, dtype, shape = layout[name]
+        np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=start)[...] = array
+
+    descriptor = {
+        'name': block.name,
+        'layout': layout,
+        'n_activities': matrices.n_activities,
+        'n_flows': matrices.n_flows,
+    }
+    return block, descriptor
+
+
+def _attach_shared_inventory(descriptor: dict):
+    """Pool initializer: map the shared inventory arrays without copying them"""
+
+    block = shared_memory.SharedMemory(name=descriptor['name'])
+    arrays = {
+        name: np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=start)
+        for name, (start, dtype, shape) in descriptor['layout'].items()
+    }
+    _worker_shared['block'] = block  # keep the mapping alive for the worker's lifetime
+    _worker_shared['matrices'] = InventoryMatrices(
+        range(descriptor['n_activities']), range(descriptor['n_flows']),
+        *(arrays[field] for field in _SHARED_ARRAY_FIELDS)
+    )
+    _worker_shared['demand'] = arrays['demand']
+    _worker_shared['C'] = arrays['C']
+
+
+def _monte_carlo_chunk(size: int, seed_sequence) -> np.ndarray:
+    """Pool task: scores for one chunk, drawn from the chunk's own seed sequence"""
+
+    return _monte_carlo_scores(
+        _worker_shared['matrices'], _worker_shared['demand'], _worker_shared['C'],
+        size, np.random.default_rng(seed_sequence)
+    )
+
+
+def _chunk_plan(iterations: int, seed: Optional[int], chunk_size: int):
+    """Fixed chunk sizes and per-chunk seed sequences; independent of the worker count"""
+
+    sizes = [min(chunk_size, iterations - start) for start in range(0, iterations, chunk_size)]
+    root = np.random.SeedSequence(seed)
+    return sizes, root.spawn(len(sizes)), root.entropy
+
+
+def run_monte_carlo(lci_data: dict, fu_amount: float, categories: List[str],
+                    iterations: int = MONTE_CARLO_DEFAULT_ITERATIONS, seed: Optional[int] = None,
+                    reference_activity: Optional[str] = None, workers: int = 1,
+                    chunk_size: int = MONTE_CARLO_CHUNK_SIZE,
+                    progress_callback: Optional[Callable[[int, int], None]] = None) -> dict:
+    """
+    Propagate the ± exchange uncertainties (normal distributions) to the impact scores
+
+    Iterations are split into fixed-size chunks, each with its own child of
+    SeedSequence(seed), and chunks are reassembled in order. Results are
+    therefore bitwise identical for any number of workers.
+
+    Args:
+        workers: Number of worker processes (1, or runs smaller than
+            MONTE_CARLO_PROCESS_MIN_WORK, run in the calling thread)
+        progress_callback: Called as progress_callback(done_iterations, iterations)
+
+    Returns:
+        dict: {'samples': ndarray (iterations x categories), 'statistics': {category: {...}},
+               'iterations': int, 'seed': int}
+    """
+
+    if not lci_data.get('activities'):
+        raise ValueError("Inventory has no activities")
+    if iterations < 1:
+        raise ValueError("Monte Carlo needs at least one iteration")
+
+    matrices = get_inventory_matrices(lci_data)
+    demand = demand_vector(matrices, fu_amount, reference_activity)
+    C = characterization_matrix(matrices, categories)
+    sizes, seed_sequences, entropy = _chunk_plan(iterations, seed, chunk_size)
+    chunks = [None] * len(sizes)
+    done = 0
+    work = iterations * (len(matrices.a_values) + len(matrices.b_values))
+
+    if workers <= 1 or len(sizes) == 1 or work < MONTE_CARLO_PROCESS_MIN_WORK:
+        for idx, (size, seed_sequence) in enumerate(zip(sizes, seed_sequences)):
+            chunks[idx] = _monte_carlo_scores(matrices, demand, C, size, np.random.default_rng(seed_sequence))
+            done += size
+            if progress_callback:
+                progress_callback(done, iterations)
+    else:
+        block, descriptor = _share_inventory(matrices, demand, C)
+        try:
+            # spawn avoids forking the multi-threaded Streamlit server process
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(sizes)),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_attach_shared_inventory,
+                initargs=(descriptor,),
+            ) as pool:
+                futures = {
+                    pool.submit(_monte_carlo_chunk, size, seed_sequence): idx
+                    for idx, (size, seed_sequence) in enumerate(zip(sizes, seed_sequences))
+                }
+                for future in as_completed(futures):
+                    idx = futures[future]
+                    chunks[idx] = future.result()
+                    done += sizes[idx]
+                    if progress_callback:
+                        progress_callback(done, iterations)
+        finally:
+            block.close()
+            block.unlink()
+
+    samples = np.vstack(chunks)
+    return {
+        'samples': samples,
+        'statistics': summarize_samples(samples, categories),
+        'iterations': iterations,
+        'seed': seed if seed is not None else entropy,
+    }
@@ -0,0 +1,278 @@
+"""
+Process network layout for Sustain 4.0 BioEngine
+Builds the activity graph of an inventory and lays it out in layers, once per inventory and node cap
+"""
+
+import threading
+from collections import OrderedDict
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+import scipy.sparse as sp  # type: ignore
+from scipy.sparse.csgraph import connected_components  # type: ignore
+from typing import List, Optional, Tuple
+from inventory import LCIInventory
+
+
+LAYOUT_CACHE_MAX_ENTRIES = 32
+MIXED_UNITS = -2
+CODE_SEPARATORS = r'[-_./: ]'
+
+
+class ProcessNetwork:
+    """
+    Activity graph with layered positions
+
+    Nodes are activities (or groups of activities sharing a code prefix);
+    edges run from the supplying activity (see LCIInventory.supplier_index) to the consuming
+    one, with parallel flows aggregated. Suppliers sit in columns left of
+    their consumers, so x grows along the supply chain.
+    """
+
+    def __init__(self, codes: List[str], labels: List[str], sizes: np.ndarray, sources: np.ndarray,
+                 targets: np.ndarray, amounts: np.ndarray, counts: np.ndarray, unit_codes: np.ndarray,
+                 unit_labels: List[str], n_activities: Optional[int] = None):
+        self.codes = codes
+        self.labels = labels
+        self.sizes = sizes
+        self.sources, self.targets = sources, targets
+        self.amounts, self.counts = amounts, counts
+        self.unit_codes, self.unit_labels = unit_codes, unit_labels
+        self.n_activities = len(codes) if n_activities is None else n_activities
+        self.x, self.y = layered_layout(len(codes), sources, targets)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.codes)
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.sources)
+
+    @property
+    def grouped(self) -> bool:
+        return self.n_nodes < self.n_activities
+
+    def degrees(self) -> np.ndarray:
+        """Number of edges touching each node"""
+        return np.bincount(np.concatenate([self.sources, self.targets]), minlength=self.n_nodes)
+
+    def edge_labels(self, edges: Optional[np.ndarray] = None) -> List[str]:
+        """Amount labels of the given edges (all by default)"""
+
+        edges = np.arange(self.n_edges) if edges is None else edges
+        labels = []
+        for amount, count, unit in zip(self.amounts[edges].tolist(), self.counts[edges].tolist(),
+                                       self.unit_codes[edges].tolist()):
+            if unit == MIXED_UNITS:
+                labels.append(f"{count} flows")
+            else:
+                label = f"{amount:.2f} {self.unit_labels[unit]}"
+                labels.append(label if count == 1 else f"{label} ({count} flows)")
+        return labels
+
+
+def _aggregate_edges(sources: np.ndarray, targets: np.ndarray, amounts: np.ndarray, counts: np.ndarray,
+                     unit_codes: np.ndarray, n_nodes: int):
+    """Merge parallel edges: amounts and counts are summed, differing units become MIXED_UNITS"""
+
+    pair = sources * max(n_nodes, 1) + targets
+    pairs, inverse = np.unique(pair, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    lowest = np.full(len(pairs), np.iinfo(np.int64).max)
+    highest = np.full(len(pairs), np.iinfo(np.int64).min)
+    np.minimum.at(lowest, inverse, unit_codes)
+    np.maximum.at(highest, inverse, unit_codes)
+    return (
+        pairs // max(n_nodes, 1), pairs % max(n_nodes, 1),
+        np.bincount(inverse, weights=amounts, minlength=len(pairs)),
+        np.bincount(inverse, weights=counts, minlength=len(pairs)).astype(np.int64),
+        np.where(lowest == highest, lowest, MIXED_UNITS),
+    )
+
+
+def build_process_network(inventory: LCIInventory) -> ProcessNetwork:
+    """Activity graph of an inventory's internal input links (parallel exchanges aggregated)"""
+
+    node_index, labels = {}, []
+    for activity in inventory.activities:
+        idx = node_index.setdefault(activity['code'], len(node_index))
+        if idx == len(labels):
+            labels.append(activity['name'])
+        else:
+            labels[idx] = activity['name']
+
+    # Node of each flow-name label (via inventory.supplier_index) and of each activity-code label; -1 if none
+    supplier_index = inventory.supplier_index
+    supplier_of = np.array(
+        [node_index.get(supplier_index.get(name) or None, -1) for name in inventory.labels('flow_name')] + [-1],
+        dtype=np.int64
+    )
+    consumer_of = np.array(
+        [node_index.get(code, -1) for code in inventory.labels('activity_code')] + [-1], dtype=np.int64
+    )
+
+    inputs = np.flatnonzero(inventory.isin('type', ['input']))
+    sources = supplier_of[inventory.codes('flow_name')[inputs]]
+    targets = consumer_of[inventory.codes('activity_code')[inputs]]
+    keep = (sources >= 0) & (targets >= 0) & (sources != targets)
+    inputs, sources, targets = inputs[keep], sources[keep], targets[keep]
+
+    # Missing units get the last label slot, printed as "None"
+    unit_labels = inventory.labels('unit') + ['None']
+    unit_codes = inventory.codes('unit')[inputs].astype(np.int64)
+    unit_codes[unit_codes < 0] = len(unit_labels) - 1
+
+    edges = _aggregate_edges(
+        sources, targets, inventory.columns['amount'][inputs], np.ones(len(inputs), dtype=np.int64),
+        unit_codes, len(labels)
+    )
+    return ProcessNetwork(list(node_index), labels, np.ones(len(labels), dtype=np.int64), *edges, unit_labels)
+
+
+def prefix_groups(codes: List[str], max_groups: int) -> np.ndarray:
+    """
+    Group activity codes by their longest shared prefix that gives at most max_groups groups
+
+    Prefixes end at a separator (e.g. "FARM-" in "FARM-01") where possible and
+    fall back to plain leading characters otherwise.
+
+    Returns:
+        Group id of every code, numbered in order of first appearance
+    """
+
+    codes = pd.Series(codes, dtype=object).astype(str)
+    candidates = []
+    segments = codes.str.split(CODE_SEPARATORS, regex=True)
+    for depth in range(1, int(segments.str.len().max())):
+        candidates.append(codes.where(segments.str.len() <= depth, segments.str[:depth].str.join('-') + '-'))
+    for length in range(1, int(codes.str.len().max()) + 1):
+        candidates.append(codes.str[:length])
+
+    best = None
+    for prefixes in candidates:
+        n_groups = prefixes.nunique()
+        if n_groups <= max_groups and (best is None or n_groups > best.nunique()):
+            best = prefixes
+    if best is None:
+        best = pd.Series('', index=codes.index)
+    return pd.factorize(best)[0]
+
+
+def collapse_network(network: ProcessNetwork, max_nodes: int) -> ProcessNetwork:
+    """Collapse a network to at most max_nodes nodes by grouping activities on code prefixes"""
+
+    if network.n_nodes <= max_nodes:
+        return network
+
+    group = prefix_groups(network.codes, max_nodes)
+    n_groups = int(group.max()) + 1
+    sizes = np.bincount(group, weights=network.sizes, minlength=n_groups).astype(np.int64)
+    first = np.full(n_groups, network.n_nodes)
+    np.minimum.at(first, group, np.arange(network.n_nodes))
+
+    codes, labels = [], []
+    members = pd.Series(network.codes).groupby(group)
+    for idx, (size, member) in enumerate(zip(sizes.tolist(), first.tolist())):
+        if size == 1:
+            codes.append(network.codes[member])
+            labels.append(network.labels[member])
+        else:
+            shared = _common_prefix(members.get_group(idx).tolist())
+            codes.append(f"{shared}*")
+            labels.append(f"{shared}* ({size} activities)")
+
+    sources, targets = group[network.sources], group[network.targets]
+    between = sources != targets
+    edges = _aggregate_edges(
+        sources[between], targets[between], network.amounts[between], network.counts[between],
+        network.unit_codes[between], n_groups
+    )
+    return ProcessNetwork(codes, labels, sizes, *edges, network.unit_labels, n_activities=network.n_activities)
+
+
+def _common_prefix(codes: List[str]) -> str:
+    shortest, longest = min(codes), max(codes)
+    for idx, char in enumerate(shortest):
+        if char != longest[idx]:
+            return shortest[:idx]
+    return shortest
+
+
+def layered_layout(n_nodes: int, sources: np.ndarray, targets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Layered (Sugiyama-style) positions for a directed graph
+
+    Cycles are condensed into strongly connected components, which share a
+    layer. Layers come from the longest supply path into each node and nodes
+    are ordered within their layer by the barycenter of their suppliers.
+    """
+
+    if n_nodes == 0:
+        return np.zeros(0), np.zeros(0)
+
+    graph = sp.csr_matrix((np.ones(len(sources)), (sources, targets)), shape=(n_nodes, n_nodes))
+    n_components, component = connected_components(graph, directed=True, connection='strong')
+    comp_sources, comp_targets = component[sources], component[targets]
+    between = comp_sources != comp_targets
+    comp_sources, comp_targets = comp_sources[between], comp_targets[between]
+
+    # Longest-path layering of the condensed DAG by vectorized relaxation
+    comp_layer = np.zeros(n_components, dtype=np.int64)
+    for _ in range(n_components):
+        relaxed = comp_layer.copy()
+        np.maximum.at(relaxed, comp_targets, comp_layer[comp_sources] + 1)
+        if np.array_equal(relaxed, comp_layer):
+            break
+        comp_layer = relaxed
+    layer = comp_layer[component]
+    n_layers = int(layer.max()) + 1
+
+    # Barycenter ordering, one forward sweep over the layers
+    node_order = np.argsort(layer, kind='stable')
+    node_bounds = np.searchsorted(layer[node_order], np.arange(n_layers + 1))
+    edge_order = np.argsort(layer[targets], kind='stable')
+    edge_sources, edge_targets = sources[edge_order], targets[edge_order]
+    edge_bounds = np.searchsorted(layer[edge_targets], np.arange(n_layers + 1))
+    local = np.zeros(n_nodes, dtype=np.int64)
+    y = np.zeros(n_nodes)
+
+    for current in range(n_layers):
+        nodes = node_order[node_bounds[current]:node_bounds[current + 1]]
+        local[nodes] = np.arange(len(nodes))
+        slots = np.arange(len(nodes), dtype=np.float64) - (len(nodes) - 1) / 2
+        edge_slice = slice(edge_bounds[current], edge_bounds[current + 1])
+        upstream = layer[edge_sources[edge_slice]] < current
+        if current and upstream.any():
+            fed = local[edge_targets[edge_slice][upstream]]
+            totals = np.bincount(fed, weights=y[edge_sources[edge_slice][upstream]], minlength=len(nodes))
+            counts = np.bincount(fed, minlength=len(nodes))
+            keys = np.where(counts > 0, totals / np.maximum(counts, 1), slots)
+            nodes = nodes[np.argsort(keys, kind='stable')]
+        y[nodes] = slots
+
+    return layer.astype(np.float64), y
+
+
+_layout_lock = threading.Lock()
+_layout_cache = OrderedDict()  # (inventory hash, node cap) -> ProcessNetwork
+
+
+def get_process_network(inventory: LCIInventory, max_nodes: Optional[int] = None) -> ProcessNetwork:
+    """Return the cached laid-out network of an inventory (collapsed to max_nodes), building it on first use"""
+
+    key = (inventory.content_hash(), max_nodes)
+    with _layout_lock:
+        network = _layout_cache.get(key)
+        if network is not None:
+            _layout_cache.move_to_end(key)
+            return network
+
+    if max_nodes is None:
+        network = build_process_network(inventory)
+    else:
+        network = collapse_network(get_process_network(inventory), max_nodes)
+    with _layout_lock:
+        _layout_cache[key] = network
+        while len(_layout_cache) > LAYOUT_CACHE_MAX_ENTRIES:
+            _layout_cache.popitem(last=False)
+    return network
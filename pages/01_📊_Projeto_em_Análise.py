@@ -59,12 +59,34 @@ st.markdown(page_bg__img, unsafe_allow_html=True)
 
 # Import functions from utilities module
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils import check_authentication, generate_project_pdf, init_session_state, save_user_data  # type: ignore
+from utils import (  # type: ignore
+    check_authentication,
+    flush_user_data,
+    init_session_state,
+    mark_project_dirty,
+    open_blob,
+    project_report_state,
+    request_project_pdf,
+    store_blob,
+)
 from brightway_integration import (  # type: ignore
-    SustainExcelImporter, 
+    BRIGHTWAY_AVAILABLE,
+    IMPORTER_FILE_TYPES,
+    get_importer,
     generate_excel_template, 
     get_example_lci_file,
-    generate_process_network_diagram
+    generate_process_network_diagram,
+    NETWORK_MAX_NODES
+)
+from inventory import as_inventory, count_exchange_types, diff_inventories, exchanges_frame  # type: ignore
+from lca_engine import (  # type: ignore
+    MONTE_CARLO_DEFAULT_ITERATIONS,
+    calculate_impacts,
+    calculate_scenarios,
+    contribution_analysis,
+    flow_analysis,
+    run_monte_carlo,
+    update_inventory_cache,
 )
 
 # Initialize session states
@@ -76,9 +98,20 @@ if 'show_level_3_interface' not in st.session_state:
     st.session_state.show_level_3_interface = False
 if 'show_impact_assessment' not in st.session_state:
     st.session_state.show_impact_assessment = False
+if 'lci_update_project' not in st.session_state:
+    st.session_state.lci_update_project = None
 
 init_session_state()
 
+
+@st.fragment(run_every=1)
+def wait_for_pdf_report(pdf_job):
+    """Polls a background PDF build without blocking the page, rerunning it once the report is ready"""
+    if pdf_job.done():
+        st.rerun()
+    st.info("⏳ Generating PDF report in the background...")
+
+
 # Authentication verification
 if not check_authentication():
     st.info("🔐 Please login on the main page.")
@@ -155,36 +188,42 @@ if st.session_state.get('show_export') and st.session_state.get('current_project
     selected_project = st.session_state.current_project
     selected_project_name = selected_project['name']
     
-    # Generate PDF
-    try:
-        pdf_buffer = generate_project_pdf(selected_project, selected_project_name)
-        
-        # Create download button
-        st.success("✅ PDF report generated successfully!")
-        
-        # Filename with timestamp
-        timestamp = pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"Project_Report_{selected_project_name.replace(' ', '_')}_{timestamp}.pdf"
-        
-        # Download button
-        st.download_button(
-            label="⬇️ Download PDF Report",
-            data=pdf_buffer.getvalue(),
-            file_name=filename,
-            mime="application/pdf",
-            use_container_width=True
-        )
-        
-        # Reset export state after showing download
-        if st.button("✅ Done", use_container_width=True):
-            st.session_state.show_export = False
-            st.rerun()
+    # Render the PDF in the background; unchanged projects are served from the report cache
+    lci_initiated, user_level = project_report_state(selected_project)
+    pdf_job = request_project_pdf(selected_project, selected_project_name, lci_initiated, user_level)
+    
+    if not pdf_job.done():
+        wait_for_pdf_report(pdf_job)
+    else:
+        try:
+            pdf_bytes = pdf_job.result()
             
-    except Exception as e:
-        st.error(f"❌ Error generating PDF: {str(e)}")
-        if st.button("🔄 Try Again", use_container_width=True):
-            st.session_state.show_export = False
-            st.rerun()
+            # Create download button
+            st.success("✅ PDF report generated successfully!")
+            
+            # Filename with timestamp
+            timestamp = pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"Project_Report_{selected_project_name.replace(' ', '_')}_{timestamp}.pdf"
+            
+            # Download button
+            st.download_button(
+                label="⬇️ Download PDF Report",
+                data=pdf_bytes,
+                file_name=filename,
+                mime="application/pdf",
+                use_container_width=True
+            )
+            
+            # Reset export state after showing download
+            if st.button("✅ Done", use_container_width=True):
+                st.session_state.show_export = False
+                st.rerun()
+                
+        except Exception as e:
+            st.error(f"❌ Error generating PDF: {str(e)}")
+            if st.button("🔄 Try Again", use_container_width=True):
+                st.session_state.show_export = False
+                st.rerun()
     
     # Add some spacing
     st.markdown("---")
@@ -321,8 +360,14 @@ if selected_project:
             
             current_level = st.session_state.user_lci_level[project_key]
             
+            # A re-upload ("Redo LCI Data") keeps the stored inventory to diff against
+            updating_lci = bool(
+                selected_project.get('lci_complete')
+                and st.session_state.get('lci_update_project') == selected_project.get('key_code')
+            )
+            
             # Check if LCI data already exists (user completed Level 3)
-            if selected_project.get('lci_complete'):
+            if selected_project.get('lci_complete') and not updating_lci:
                 st.success("✅ **LCI Data Available** - Your inventory is ready for impact assessment!")
                 
                 lci_data = selected_project.get('lci_data', {})
@@ -341,8 +386,7 @@ if selected_project:
                     st.metric("🔄 Exchanges", exchanges_count)
                 
                 with col_m3:
-                    biosphere_count = sum(1 for e in lci_data.get('exchanges', []) 
-                                         if e.get('type') in ['emission', 'resource'])
+                    biosphere_count = count_exchange_types(lci_data.get('exchanges', []), ('emission', 'resource'))
                     st.metric("🌍 Biosphere Flows", biosphere_count)
                 
                 with col_m4:
@@ -403,8 +447,8 @@ if selected_project:
                     with tab_exchanges:
                         st.markdown("#### All Exchanges (Inputs & Outputs)")
                         exchanges = lci_data.get('exchanges', [])
-                        if exchanges:
-                            exchanges_df = pd.DataFrame(exchanges)
+                        if len(exchanges):
+                            exchanges_df = exchanges_frame(exchanges)
                             
                             # Filter options
                             col_filter1, col_filter2 = st.columns(2)
@@ -443,54 +487,32 @@ if selected_project:
                 col_action1, col_action2, col_action3 = st.columns([1, 1, 1])
                 
                 with col_action1:
-                    # Download original Excel file
-                    if selected_project.get('lci_excel_file'):
-                        import base64
-                        excel_data = base64.b64decode(selected_project['lci_excel_file'])
-                        original_filename = selected_project.get('lci_excel_filename', 'lci_data.xlsx')
+                    # Download original Excel file (streamed from the blob store)
+                    excel_blob = open_blob(selected_project['lci_excel_hash']) if selected_project.get('lci_excel_hash') else None
+                    if excel_blob:
+                        original_filename = selected_project.get('lci_excel_filename') or 'lci_data.xlsx'
+                        is_bundle = original_filename.lower().endswith('.zip')
                         
-                        st.download_button(
-                            label="📥 Download Excel",
-                            data=excel_data,
-                            file_name=original_filename,
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                            use_container_width=True,
-                            help="Download the original Excel file you uploaded"
-                        )
+                        with excel_blob:
+                            st.download_button(
+                                label="📥 Download Bundle" if is_bundle else "📥 Download Excel",
+                                data=excel_blob,
+                                file_name=original_filename,
+                                mime="application/zip" if is_bundle else "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                                use_container_width=True,
+                                help="Download the original file you uploaded"
+                            )
                     else:
                         st.button("📥 Download Excel", use_container_width=True, disabled=True,
                                  help="Original file not available")
                 
                 with col_action2:
-                    if st.button("🔄 Redo LCI Data", use_container_width=True, type="secondary"):
-                        # Clear LCI data and restart
-                        selected_project['lci_complete'] = False
-                        selected_project['lci_data'] = None
-                        selected_project['lci_database_name'] = None
-                        selected_project['lci_upload_date'] = None
-                        selected_project['lci_excel_file'] = None  # Clear Excel file
-                        selected_project['lci_excel_filename'] = None
-                        
-                        # Update in user_projects
-                        for idx, proj in enumerate(st.session_state.user_projects[current_user_id]):
-                            if proj.get('key_code') == selected_project.get('key_code'):
-                                st.session_state.user_projects[current_user_id][idx] = selected_project
-                                break
-                        
-                        # Save to file
-                        user_data = {
-                            'projects': st.session_state.user_projects[current_user_id],
-                            'preferences': {
-                                'theme': st.session_state.get('theme', 'light'),
-                                'notifications': st.session_state.get('notifications', True)
-                            },
-                            'last_update': pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
-                        }
-                        save_user_data(current_user_id, user_data)
-                        
-                        st.success("🔄 LCI data cleared! You can now upload new data.")
-                        import time
-                        time.sleep(1)
+                    if st.button("🔄 Redo LCI Data", use_container_width=True, type="secondary",
+                                 help="Upload a revised file; only the changes are applied"):
+                        # Keep the stored data: the new upload is diffed against it
+                        st.session_state.lci_update_project = selected_project.get('key_code')
+                        st.session_state.show_level_3_interface = True
+                        st.session_state.show_impact_assessment = False
                         st.rerun()
                 
                 with col_action3:
@@ -582,6 +604,49 @@ if selected_project:
                             help="Quantity for impact calculation"
                         )
                     
+                    # Uncertainty analysis options
+                    st.markdown("---")
+                    st.markdown("#### 🎲 Uncertainty Analysis")
+                    
+                    run_uncertainty = st.checkbox(
+                        "Run Monte Carlo uncertainty analysis",
+                        value=False,
+                        help="Samples exchange amounts from the ± uncertainty column (normal distribution)"
+                    )
+                    
+                    col_mc1, col_mc2, col_mc3 = st.columns(3)
+                    
+                    with col_mc1:
+                        mc_iterations = st.number_input(
+                            "Iterations",
+                            min_value=100,
+                            max_value=100000,
+                            value=MONTE_CARLO_DEFAULT_ITERATIONS,
+                            step=100,
+                            disabled=not run_uncertainty
+                        )
+                    
+                    with col_mc2:
+                        mc_seed = st.number_input(
+                            "Random Seed",
+                            min_value=0,
+                            value=42,
+                            step=1,
+                            disabled=not run_uncertainty,
+                            help="Same seed and iterations give identical results"
+                        )
+                    
+                    with col_mc3:
+                        mc_workers = st.number_input(
+                            "Worker Processes",
+                            min_value=1,
+                            max_value=os.cpu_count() or 1,
+                            value=min(4, os.cpu_count() or 1),
+                            step=1,
+                            disabled=not run_uncertainty,
+                            help="Short runs stay in a single process; results are identical for any number of workers"
+                        )
+                    
                     # Calculate button
                     st.markdown("---")
                     
@@ -594,70 +659,44 @@ if selected_project:
                         else:
                             with st.spinner("🔄 Calculating environmental impacts..."):
                                 try:
-                                    # Simulate calculation (placeholder for Brightway integration)
-                                    import time
-                                    import random
-                                    time.sleep(2)
+                                    # Solve the inventory matrices and characterize the selected categories
+                                    selected_categories = [
+                                        category for category, selected in (
+                                            ('GWP', calc_gwp),
+                                            ('Water Use', calc_water),
+                                            ('Land Use', calc_land),
+                                            ('CED', calc_energy),
+                                            ('Acidification', calc_acid),
+                                            ('Eutrophication', calc_eutr),
+                                        ) if selected
+                                    ]
+                                    impact_results = calculate_impacts(lci_data, fu_amount, selected_categories)
+                                    impact_contributions = contribution_analysis(lci_data, fu_amount, selected_categories)
+                                    impact_flows = flow_analysis(lci_data, fu_amount, selected_categories)
                                     
-                                    # Store results in session state
-                                    impact_results = {}
-                                    
-                                    if calc_gwp:
-                                        # Placeholder calculation based on activities count
-                                        activities_count = len(lci_data.get('activities', []))
-                                        exchanges_count = len(lci_data.get('exchanges', []))
-                                        base_gwp = (activities_count * 2.5 + exchanges_count * 0.3) * fu_amount
-                                        impact_results['GWP'] = {
-                                            'value': round(base_gwp * random.uniform(0.8, 1.2), 2),
-                                            'unit': 'kg CO₂-eq',
-                                            'icon': '🌡️'
-                                        }
-                                    
-                                    if calc_water:
-                                        base_water = (activities_count * 0.5 + exchanges_count * 0.05) * fu_amount
-                                        impact_results['Water Use'] = {
-                                            'value': round(base_water * random.uniform(0.8, 1.2), 2),
-                                            'unit': 'm³',
-                                            'icon': '💧'
-                                        }
-                                    
-                                    if calc_land:
-                                        base_land = (activities_count * 1.2 + exchanges_count * 0.1) * fu_amount
-                                        impact_results['Land Use'] = {
-                                            'value': round(base_land * random.uniform(0.8, 1.2), 2),
-                                            'unit': 'm²·year',
-                                            'icon': '🌾'
-                                        }
-                                    
-                                    if calc_energy:
-                                        base_energy = (activities_count * 15 + exchanges_count * 2) * fu_amount
-                                        impact_results['CED'] = {
-                                            'value': round(base_energy * random.uniform(0.8, 1.2), 2),
-                                            'unit': 'MJ',
-                                            'icon': '⚡'
-                                        }
-                                    
-                                    if calc_acid:
-                                        base_acid = (activities_count * 0.08 + exchanges_count * 0.01) * fu_amount
-                                        impact_results['Acidification'] = {
-                                            'value': round(base_acid * random.uniform(0.8, 1.2), 3),
-                                            'unit': 'kg SO₂-eq',
-                                            'icon': '🧪'
-                                        }
-                                    
-                                    if calc_eutr:
-                                        base_eutr = (activities_count * 0.05 + exchanges_count * 0.008) * fu_amount
-                                        impact_results['Eutrophication'] = {
-                                            'value': round(base_eutr * random.uniform(0.8, 1.2), 3),
-                                            'unit': 'kg PO₄-eq',
-                                            'icon': '🌊'
-                                        }
+                                    impact_uncertainty = None
+                                    if run_uncertainty:
+                                        mc_progress = st.progress(0.0, text="🎲 Running Monte Carlo iterations...")
+                                        impact_uncertainty = run_monte_carlo(
+                                            lci_data, fu_amount, selected_categories,
+                                            iterations=int(mc_iterations), seed=int(mc_seed),
+                                            workers=int(mc_workers),
+                                            progress_callback=lambda done, total: mc_progress.progress(
+                                                done / total, text=f"🎲 Monte Carlo: {done:,} / {total:,} iterations"
+                                            )
+                                        )['statistics']
                                     
                                     st.session_state.impact_results = impact_results
+                                    st.session_state.impact_uncertainty = impact_uncertainty
+                                    st.session_state.impact_contributions = impact_contributions
+                                    st.session_state.impact_flows = impact_flows
                                     st.session_state.impact_calculated = True
                                     
                                     # Save impact results to project
                                     selected_project['impact_results'] = impact_results
+                                    selected_project['impact_uncertainty'] = impact_uncertainty
+                                    selected_project['impact_contributions'] = impact_contributions
+                                    selected_project['impact_flows'] = impact_flows
                                     selected_project['impact_assessment_date'] = pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
                                     selected_project['functional_unit_amount'] = fu_amount
                                     
@@ -668,23 +707,15 @@ if selected_project:
                                             break
                                     
                                     # Save to file
-                                    user_data = {
-                                        'projects': st.session_state.user_projects[current_user_id],
-                                        'preferences': {
-                                            'theme': st.session_state.get('theme', 'light'),
-                                            'notifications': st.session_state.get('notifications', True)
-                                        },
-                                        'last_update': pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
-                                    }
-                                    save_user_data(current_user_id, user_data)
+                                    mark_project_dirty(selected_project)
+                                    flush_user_data(current_user_id)
                                     
                                     st.success("✅ Impact assessment completed successfully!")
-                                    time.sleep(0.5)
                                     st.rerun()
                                     
                                 except Exception as e:
                                     st.error(f"❌ Error during calculation: {str(e)}")
-                                    st.info("💡 **Note:** Full Brightway integration is in development. Currently showing estimated values based on inventory complexity.")
+                                    st.info("💡 **Note:** Check that every activity has a production exchange and that linked inputs do not form a singular system.")
                     
                     # Display results if available
                     if st.session_state.get('impact_calculated') and st.session_state.get('impact_results'):
@@ -759,6 +790,204 @@ if selected_project:
                                 )
                                 
                                 st.plotly_chart(fig, use_container_width=True)
+                            
+                            # Contribution analysis
+                            contributions = st.session_state.get('impact_contributions')
+                            if contributions:
+                                st.markdown("#### Contribution Analysis")
+                                st.caption(
+                                    f"Top {contributions['top_n']} contributors per category "
+                                    f"(cutoff {contributions['cutoff']:.0%} of the category total)"
+                                )
+                                
+                                tab_contrib_act, tab_contrib_flow = st.tabs(["🏭 By Activity", "🌍 By Elementary Flow"])
+                                
+                                for tab, records_key in ((tab_contrib_act, 'activities'), (tab_contrib_flow, 'flows')):
+                                    with tab:
+                                        df_contrib = pd.DataFrame(contributions[records_key])
+                                        if df_contrib.empty:
+                                            st.info("No contributions above the cutoff")
+                                            continue
+                                        
+                                        fig_contrib = go.Figure()
+                                        for contributor, df_part in df_contrib.groupby('Contributor', sort=False):
+                                            fig_contrib.add_trace(go.Bar(
+                                                x=df_part['Impact Category'],
+                                                y=df_part['Share'] * 100,
+                                                name=contributor
+                                            ))
+                                        fig_contrib.update_layout(
+                                            barmode='relative',
+                                            xaxis_title="Impact Category",
+                                            yaxis_title="Share of Total (%)",
+                                            height=400
+                                        )
+                                        st.plotly_chart(fig_contrib, use_container_width=True)
+                                        
+                                        df_contrib['Share'] = (df_contrib['Share'] * 100).round(2)
+                                        st.dataframe(
+                                            df_contrib.rename(columns={'Share': 'Share (%)'}),
+                                            use_container_width=True,
+                                            hide_index=True
+                                        )
+                            
+                            # Flow analysis (Sankey of scaled inter-activity flows)
+                            flows = st.session_state.get('impact_flows')
+                            if flows and (flows['materials'] or flows['impacts']):
+                                st.markdown("#### Flow Analysis")
+                                st.caption(
+                                    f"Flows between activities for {flows['fu_amount']:g} functional unit(s), "
+                                    f"without links below {flows['cutoff']:.0%} of the largest comparable flow"
+                                )
+                                
+                                impact_categories = list(dict.fromkeys(
+                                    record['Impact Category'] for record in flows['impacts']
+                                ))
+                                flow_view = st.selectbox(
+                                    "Flows to display",
+                                    ["Material flows"] + impact_categories,
+                                    key="flow_view"
+                                )
+                                
+                                if flow_view == "Material flows":
+                                    df_flows = pd.DataFrame(flows['materials'], columns=['Source', 'Target', 'Amount', 'Unit'])
+                                    df_flows['Value'] = df_flows['Amount']
+                                    df_flows['Label'] = df_flows['Amount'].map(lambda x: f"{x:.3g}") + ' ' + df_flows['Unit']
+                                else:
+                                    df_flows = pd.DataFrame(
+                                        [record for record in flows['impacts'] if record['Impact Category'] == flow_view],
+                                        columns=['Impact Category', 'Source', 'Target', 'Score']
+                                    )
+                                    df_flows['Value'] = df_flows['Score']
+                                    df_flows['Label'] = df_flows['Score'].map(lambda x: f"{x:.3g}") + ' ' + results[flow_view]['unit']
+                                
+                                if df_flows.empty:
+                                    st.info("No flows above the cutoff")
+                                else:
+                                    fig_flows = go.Figure(go.Sankey(
+                                        node=dict(label=flows['nodes'], pad=15, thickness=15, color='#4472C4'),
+                                        link=dict(
+                                            source=df_flows['Source'],
+                                            target=df_flows['Target'],
+                                            value=df_flows['Value'].abs(),
+                                            customdata=df_flows['Label'],
+                                            hovertemplate='%{source.label} → %{target.label}<br>%{customdata}<extra></extra>',
+                                            # Credits (negative flows) in green
+                                            color=np.where(df_flows['Value'] < 0, 'rgba(44,160,44,0.4)', 'rgba(136,136,136,0.4)')
+                                        )
+                                    ))
+                                    fig_flows.update_layout(height=500)
+                                    st.plotly_chart(fig_flows, use_container_width=True)
+                                    if flow_view == "Material flows" and df_flows['Unit'].nunique() > 1:
+                                        st.caption("⚠️ Link widths mix units; compare flows of the same unit only")
+                        
+                        # Monte Carlo results
+                        uncertainty = st.session_state.get('impact_uncertainty')
+                        if uncertainty:
+                            with st.expander("🎲 **Uncertainty Analysis (Monte Carlo)**", expanded=False):
+                                first_stats = next(iter(uncertainty.values()))
+                                low_col = f"P{first_stats['percentiles'][0]:g}"
+                                high_col = f"P{first_stats['percentiles'][1]:g}"
+                                df_uncertainty = pd.DataFrame([
+                                    {
+                                        'Impact Category': category,
+                                        'Mean': stats['mean'],
+                                        'Median': stats['median'],
+                                        'Std. Dev.': stats['std'],
+                                        low_col: stats['p_low'],
+                                        high_col: stats['p_high'],
+                                        'Unit': stats['unit'],
+                                    }
+                                    for category, stats in uncertainty.items()
+                                ])
+                                st.dataframe(df_uncertainty, use_container_width=True, hide_index=True)
+                                
+                                fig_mc = go.Figure(data=[
+                                    go.Bar(
+                                        x=df_uncertainty['Impact Category'],
+                                        y=df_uncertainty['Median'],
+                                        error_y=dict(
+                                            type='data',
+                                            symmetric=False,
+                                            array=df_uncertainty[high_col] - df_uncertainty['Median'],
+                                            arrayminus=df_uncertainty['Median'] - df_uncertainty[low_col]
+                                        ),
+                                        marker_color='lightgreen'
+                                    )
+                                ])
+                                fig_mc.update_layout(
+                                    title=f"Median with {low_col}–{high_col} Interval",
+                                    xaxis_title="Impact Category",
+                                    yaxis_title="Impact (category units)",
+                                    showlegend=False,
+                                    height=400
+                                )
+                                st.plotly_chart(fig_mc, use_container_width=True)
+                                
+                                st.caption(f"Based on {first_stats['valid_iterations']} valid iterations")
+                        
+                        # Batch scenario calculation
+                        with st.expander("🧮 **Scenario Batch (multiple functional units)**", expanded=False):
+                            st.caption("All scenarios are solved together against one factorization of the inventory.")
+                            
+                            col_sc1, col_sc2 = st.columns(2)
+                            
+                            with col_sc1:
+                                scenario_amounts_text = st.text_input(
+                                    "Functional Unit Amounts",
+                                    value="0.5, 1, 2, 5, 10",
+                                    help="Comma-separated amounts; each is combined with every reference activity"
+                                )
+                            
+                            with col_sc2:
+                                reference_options = [act['code'] for act in lci_data.get('activities', [])]
+                                scenario_references = st.multiselect(
+                                    "Reference Activities",
+                                    reference_options,
+                                    help="Leave empty to use the final activity of the process chain"
+                                )
+                            
+                            if st.button("▶️ Run Scenarios", use_container_width=True):
+                                try:
+                                    scenario_amounts = [
+                                        float(value) for value in scenario_amounts_text.replace(';', ',').split(',')
+                                        if value.strip()
+                                    ]
+                                    scenarios = [
+                                        {
+                                            'name': f"{amount:g} × {reference or 'default'}",
+                                            'fu_amount': amount,
+                                            'reference_activity': reference,
+                                        }
+                                        for reference in (scenario_references or [None])
+                                        for amount in scenario_amounts
+                                    ]
+                                    st.session_state.impact_scenarios = calculate_scenarios(
+                                        lci_data, scenarios, list(results.keys()),
+                                        inventory_label=selected_project.get('lci_database_name') or ''
+                                    )
+                                except ValueError as e:
+                                    st.error(f"❌ Invalid scenarios: {str(e)}")
+                            
+                            df_scenarios = st.session_state.get('impact_scenarios')
+                            if df_scenarios is not None and not df_scenarios.empty:
+                                st.dataframe(
+                                    df_scenarios.pivot_table(
+                                        index=['Scenario', 'Reference Activity', 'Functional Unit Amount'],
+                                        columns='Impact Category',
+                                        values='Value',
+                                        sort=False
+                                    ).reset_index(),
+                                    use_container_width=True,
+                                    hide_index=True
+                                )
+                                st.download_button(
+                                    label="📥 Export Scenarios (CSV)",
+                                    data=df_scenarios.to_csv(index=False).encode('utf-8'),
+                                    file_name=f"impact_scenarios_{selected_project['key_code']}.csv",
+                                    mime="text/csv",
+                                    use_container_width=True
+                                )
                         
                         # Interpretation guidance
                         st.markdown("---")
@@ -776,7 +1005,7 @@ if selected_project:
                         - Results are based on your LCI data quality and completeness
                         - Consider uncertainty in input data when interpreting results
                         - Compare with industry benchmarks for context
-                        - Full Brightway integration will provide more accurate calculations
+                        - Characterization factors are screening-level defaults; flows without a factor contribute zero
                         """)
                         
                         # Action buttons
@@ -818,15 +1047,28 @@ if selected_project:
                                 st.rerun()
             
             # Check if Level 3 interface should be shown
-            elif st.session_state.get('show_level_3_interface'):
+            elif st.session_state.get('show_level_3_interface') or updating_lci:
                 # Show Level 3 interface (replaces level selection)
-                st.markdown("#### ➕ Add Your Complete LCI Data")
+                if updating_lci:
+                    st.markdown("#### 🔄 Update Your LCI Data")
+                else:
+                    st.markdown("#### ➕ Add Your Complete LCI Data")
                 
                 # Back button
-                if st.button("⬅️ Back to Level Selection"):
+                if st.button("⬅️ Back to LCI Overview" if updating_lci else "⬅️ Back to Level Selection"):
                     st.session_state.show_level_3_interface = False
+                    st.session_state.lci_update_project = None
                     st.rerun()
                 
+                if updating_lci:
+                    st.info("""
+                    🔄 **Updating existing LCI data.** Upload the revised file below.
+                    
+                    It is compared with the stored inventory and only added, removed or changed
+                    activities are applied. Saved impact results are kept when the changes do not
+                    touch the supply chain of your reference activity.
+                    """)
+                
                 st.info("""
                 📋 **You have all your LCI data?** Great! Upload it here.
                 
@@ -874,24 +1116,21 @@ if selected_project:
                 st.markdown("### 📤 Step 2: Upload Your Data")
                 
                 uploaded_file = st.file_uploader(
-                    "Upload your filled Excel file",
-                    type=['xlsx', 'xls'],
-                    help="Use the template above and fill with your LCI data",
+                    "Upload your filled Excel file or a CSV/Parquet bundle",
+                    type=IMPORTER_FILE_TYPES,
+                    help="Use the template above and fill with your LCI data. Pipelines can instead upload "
+                         "a .zip with one CSV or Parquet file per sheet, named after the sheet "
+                         "(e.g. exchanges.csv, process_activities.parquet).",
                     key="lci_file_uploader"
                 )
                 
                 if uploaded_file:
                     
-                    # Save temporarily
-                    import tempfile
-                    with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-                        tmp.write(uploaded_file.getvalue())
-                        tmp_path = tmp.name
-                    
-                    # Parse and validate
+                    # Parse and validate straight from the upload buffer
+                    # (.xlsx is streamed read-only; .xls and zip bundles go through pandas)
                     with st.spinner("🔍 Validating your data..."):
-                        importer = SustainExcelImporter(tmp_path)
-                        is_valid = importer.parse_excel()
+                        importer = get_importer(uploaded_file, uploaded_file.name)
+                        is_valid = importer.parse()
                     
                     # Show validation results
                     if importer.validation_errors:
@@ -910,6 +1149,36 @@ if selected_project:
                         
                         st.success("✅ File validated successfully!")
                         
+                        if updating_lci:
+                            # Compare the upload with the stored inventory
+                            previous_lci_data = selected_project.get('lci_data') or {}
+                            lci_diff = diff_inventories(as_inventory(previous_lci_data), importer.inventory)
+                            
+                            st.markdown("---")
+                            st.markdown("### 🔍 Changes Since Last Upload")
+                            
+                            col_d1, col_d2, col_d3, col_d4 = st.columns(4)
+                            with col_d1:
+                                st.metric("➕ Added Activities", len(lci_diff.added))
+                            with col_d2:
+                                st.metric("✏️ Changed Activities", len(lci_diff.changed))
+                            with col_d3:
+                                st.metric("➖ Removed Activities", len(lci_diff.removed))
+                            with col_d4:
+                                st.metric("🔄 Exchanges", f"+{lci_diff.exchanges_added} / -{lci_diff.exchanges_removed}")
+                            
+                            if lci_diff.is_empty:
+                                st.info("ℹ️ No activity or exchange changed; applying only refreshes the stored file.")
+                            else:
+                                with st.expander("📋 Affected activity codes", expanded=False):
+                                    for label, codes in (
+                                        ("Added", lci_diff.added),
+                                        ("Changed", lci_diff.changed),
+                                        ("Removed", lci_diff.removed),
+                                    ):
+                                        if codes:
+                                            st.markdown(f"**{label}:** " + ", ".join(f"`{code}`" for code in codes))
+                        
                         # Step 3: Preview data
                         st.markdown("---")
                         st.markdown("### 👁️ Step 3: Preview Your Data")
@@ -936,7 +1205,7 @@ if selected_project:
                         
                         with tab_exchanges:
                             st.markdown("#### All Exchanges")
-                            exchanges_df = pd.DataFrame(importer.exchanges)
+                            exchanges_df = importer.inventory.exchange_frame()
                             
                             # Add color coding by type
                             st.dataframe(
@@ -949,10 +1218,10 @@ if selected_project:
                             with col_m1:
                                 st.metric("Total Exchanges", len(importer.exchanges))
                             with col_m2:
-                                inputs = sum(1 for e in importer.exchanges if e['type'] == 'input')
+                                inputs = int((exchanges_df['type'] == 'input').sum())
                                 st.metric("Inputs", inputs)
                             with col_m3:
-                                emissions = sum(1 for e in importer.exchanges if e['type'] == 'emission')
+                                emissions = int((exchanges_df['type'] == 'emission').sum())
                                 st.metric("Emissions", emissions)
                         
                         with tab_network:
@@ -999,45 +1268,60 @@ if selected_project:
                             else:
                                 # Generate automatically
                                 if len(importer.activities) > 0:
+                                    max_nodes = NETWORK_MAX_NODES
+                                    if len(importer.activities) > NETWORK_MAX_NODES:
+                                        max_nodes = st.slider(
+                                            "Maximum nodes",
+                                            min_value=50,
+                                            max_value=1000,
+                                            value=NETWORK_MAX_NODES,
+                                            step=50,
+                                            help="Larger inventories are shown as groups of activities sharing a code prefix",
+                                            key="network_max_nodes"
+                                        )
                                     try:
                                         fig = generate_process_network_diagram(
                                             importer.activities,
-                                            importer.exchanges
+                                            importer.exchanges,
+                                            max_nodes=max_nodes
                                         )
-                                        if fig:
-                                            st.plotly_chart(fig, use_container_width=True)
-                                        else:
-                                            st.info("""
-                                            📦 **Network diagram requires networkx package**
-                                            
-                                            Install with: `pip install networkx`
-                                            
-                                            The diagram will show process connections and flows between activities.
-                                            """)
+                                        st.plotly_chart(fig, use_container_width=True)
                                     except Exception as e:
                                         st.warning(f"⚠️ Could not generate network diagram.\n\nDetails: {str(e)}")
-                                        st.info("Install networkx package to enable this feature: `pip install networkx`")
                                 else:
                                     st.info("No activities to display")
                         
-                        # Step 4: Create database
+                        # Step 4: Create database (or apply the changes to the existing one)
                         st.markdown("---")
-                        st.markdown("### 💾 Step 4: Create LCA Database")
-                        
-                        st.info("""
-                        ✨ **Almost there!** Click below to create your Brightway database.
-                        
-                        This will:
-                        - Convert your data to Brightway format
-                        - Link emissions to biosphere flows
-                        - Validate all connections
-                        - Make it ready for LCA calculations
-                        """)
+                        if updating_lci:
+                            st.markdown("### 💾 Step 4: Apply Changes")
+                            
+                            st.info("""
+                            ✨ **Ready to update!** Click below to apply the changes.
+                            
+                            This will:
+                            - Replace the stored inventory with the new upload
+                            - Update only the changed activities in the Brightway database
+                            - Keep cached calculations that the changes do not affect
+                            """)
+                        else:
+                            st.markdown("### 💾 Step 4: Create LCA Database")
+                            
+                            st.info("""
+                            ✨ **Almost there!** Click below to create your Brightway database.
+                            
+                            This will:
+                            - Convert your data to Brightway format
+                            - Link emissions to biosphere flows
+                            - Validate all connections
+                            - Make it ready for LCA calculations
+                            """)
                         
                         db_name = st.text_input(
                             "Database Name",
-                            value=f"lci_{selected_project['key_code']}",
-                            help="Name for your Brightway database (no spaces)"
+                            value=selected_project.get('lci_database_name') or f"lci_{selected_project['key_code']}",
+                            help="Name for your Brightway database (no spaces)",
+                            disabled=updating_lci
                         )
                         
                         # Replace spaces with underscores
@@ -1048,19 +1332,43 @@ if selected_project:
                         with col_cancel:
                             if st.button("❌ Cancel", use_container_width=True, key="cancel_db_creation"):
                                 st.session_state.show_level_3_interface = False
+                                st.session_state.lci_update_project = None
                                 st.rerun()
                         
                         with col_create:
-                            if st.button("🚀 Create Database & Run LCA", type="primary", use_container_width=True):
+                            create_label = "🔄 Apply Changes" if updating_lci else "🚀 Create Database & Run LCA"
+                            if st.button(create_label, type="primary", use_container_width=True):
                                 
-                                with st.spinner("Creating Brightway database..."):
+                                with st.spinner("Updating LCI data..." if updating_lci else "Creating Brightway database..."):
                                     try:
                                         # Note: Brightway integration requires setup
                                         # For now, we'll save the data structure
                                         
-                                        # Save the original Excel file in base64 for later download
-                                        import base64
-                                        excel_file_b64 = base64.b64encode(uploaded_file.getvalue()).decode()
+                                        if updating_lci:
+                                            # Move cached calculations over and keep results the changes cannot affect
+                                            cache_update = update_inventory_cache(
+                                                previous_lci_data,
+                                                {'activities': importer.activities, 'exchanges': importer.exchanges},
+                                                lci_diff
+                                            )
+                                            
+                                            if BRIGHTWAY_AVAILABLE:
+                                                try:
+                                                    importer.update_brightway_database(db_name, previous_lci_data)
+                                                except Exception as e:
+                                                    st.warning(f"⚠️ Brightway database not updated: {str(e)}")
+                                            
+                                            if not cache_update['results_valid']:
+                                                selected_project['impact_results'] = None
+                                                selected_project['impact_uncertainty'] = None
+                                                selected_project['impact_contributions'] = None
+                                                selected_project['impact_flows'] = None
+                                                selected_project['impact_assessment_date'] = None
+                                                st.session_state.impact_calculated = False
+                                                st.session_state.impact_results = {}
+                                        
+                                        # Store the original Excel file once in the blob store for later download
+                                        excel_file_hash = store_blob(uploaded_file)
                                         
                                         # Save parsed data to project
                                         selected_project['lci_database_name'] = db_name
@@ -1070,7 +1378,7 @@ if selected_project:
                                             'exchanges': importer.exchanges,
                                             'flow_mapping': importer.flow_mapping
                                         }
-                                        selected_project['lci_excel_file'] = excel_file_b64  # Save Excel file
+                                        selected_project['lci_excel_hash'] = excel_file_hash  # Save Excel file reference
                                         selected_project['lci_excel_filename'] = uploaded_file.name  # Save original filename
                                         selected_project['lci_data_source'] = 'user_upload'
                                         selected_project['lci_complete'] = True
@@ -1083,17 +1391,22 @@ if selected_project:
                                                 break
                                         
                                         # Save to file
-                                        user_data = {
-                                            'projects': st.session_state.user_projects[current_user_id],
-                                            'preferences': {
-                                                'theme': st.session_state.get('theme', 'light'),
-                                                'notifications': st.session_state.get('notifications', True)
-                                            },
-                                            'last_update': pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
-                                        }
-                                        save_user_data(current_user_id, user_data)
+                                        mark_project_dirty(selected_project)
+                                        flush_user_data(current_user_id)
+                                        
+                                        st.session_state.lci_update_project = None
                                         
-                                        st.success(f"✅ LCI data saved successfully!")
+                                        if updating_lci:
+                                            st.success(
+                                                f"✅ Changes applied: {len(lci_diff.added)} added, {len(lci_diff.changed)} changed "
+                                                f"and {len(lci_diff.removed)} removed activities."
+                                            )
+                                            if cache_update['results_valid']:
+                                                st.info("♻️ Saved impact results were kept: the changes do not affect your reference activity.")
+                                            else:
+                                                st.info("🔄 Saved impact results were cleared because the changes affect them. Please recalculate.")
+                                        else:
+                                            st.success(f"✅ LCI data saved successfully!")
                                         
                                         # Show database info
                                         col_m1, col_m2, col_m3 = st.columns(3)
@@ -1103,26 +1416,27 @@ if selected_project:
                                         with col_m2:
                                             st.metric("🔄 Exchanges", len(importer.exchanges))
                                         with col_m3:
-                                            biosphere_count = sum(1 for e in importer.exchanges if e['type'] in ['emission', 'resource'])
+                                            biosphere_count = count_exchange_types(importer.exchanges, ('emission', 'resource'))
                                             st.metric("🌍 Biosphere Flows", biosphere_count)
                                         
-                                        st.balloons()
+                                        if not updating_lci:
+                                            st.balloons()
                                         
-                                        # Info about next steps
-                                        st.markdown("---")
-                                        st.info("""
-                                        ✨ **Your LCI data is ready!**
+                                            # Info about next steps
+                                            st.markdown("---")
+                                            st.info("""
+                                            ✨ **Your LCI data is ready!**
                                         
-                                        **Next Steps:**
-                                        1. Your data has been saved to the project
-                                        2. When Brightway is fully configured, you'll be able to:
-                                           - Calculate environmental impacts (GWP, water use, etc.)
-                                           - Run uncertainty analysis
-                                           - Compare scenarios
-                                           - Generate detailed reports
+                                            **Next Steps:**
+                                            1. Your data has been saved to the project
+                                            2. When Brightway is fully configured, you'll be able to:
+                                               - Calculate environmental impacts (GWP, water use, etc.)
+                                               - Run uncertainty analysis
+                                               - Compare scenarios
+                                               - Generate detailed reports
                                         
-                                        **Current Status:** ✅ Data validated and stored
-                                        """)
+                                            **Current Status:** ✅ Data validated and stored
+                                            """)
                                         
                                         if st.button("✅ Done - Back to Project", use_container_width=True, type="primary"):
                                             st.session_state.show_level_3_interface = False
@@ -1397,15 +1711,8 @@ if st.session_state.get('show_edit_form') and selected_project:
             st.session_state.current_project = st.session_state.user_projects[current_user_id][project_index]
             
             # Save data
-            user_data = {
-                'projects': st.session_state.user_projects[current_user_id],
-                'preferences': {
-                    'theme': st.session_state.theme,
-                    'notifications': st.session_state.notifications
-                },
-                'last_update': pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
-            save_user_data(current_user_id, user_data)
+            mark_project_dirty(selected_project)
+            flush_user_data(current_user_id)
             
             st.success("✅ Project updated successfully!")
             st.session_state.show_edit_form = False
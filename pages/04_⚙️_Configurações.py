@@ -9,7 +9,6 @@ st.set_page_config(
 )
 
 # Import other libraries after page configuration
-import pandas as pd  # type: ignore
 import os
 import sys
 
@@ -37,7 +36,7 @@ st.markdown(page_bg__img, unsafe_allow_html=True)
 
 # Add parent directory to path to import functions
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils import check_authentication, init_session_state, load_config, save_config, save_user_data  # type: ignore
+from utils import check_authentication, flush_user_data, init_session_state, load_config, save_config  # type: ignore
 
 init_session_state()
 
@@ -213,22 +212,20 @@ if st.button("Save all settings", type="primary"):
         
     # Save user preferences to their own file
     if current_user_id:
-        # Build user data object
-        user_data = {
-            'projects': user_projects,
-            'preferences': {
-                'theme': selected_theme,
-                'notifications': notifications_enabled,
-                'default_chart_type': default_chart,
-                'color_palette': default_palette,
-                'data_density': data_density,
-                'units': units_system
-            },
-            'last_update': pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
+        # Build preferences object (projects are saved by their own pages)
+        preferences = {
+            'theme': selected_theme,
+            'notifications': notifications_enabled,
+            'default_chart_type': default_chart,
+            'color_palette': default_palette,
+            'data_density': data_density,
+            'units': units_system
         }
+        st.session_state.theme = selected_theme
+        st.session_state.notifications = notifications_enabled
         
         try:
-            save_user_data(current_user_id, user_data)
+            flush_user_data(current_user_id, preferences=preferences)
             st.success("Personal settings saved successfully!")
         except Exception as e:
             st.error(f"Error saving personal settings: {e}")
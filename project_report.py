@@ -0,0 +1,361 @@
+"""
+Project PDF reports for Sustain 4.0 BioEngine
+Builds report bytes from project data alone, so reports can render off the Streamlit script thread
+"""
+
+import io
+import pandas as pd  # type: ignore
+from reportlab.lib.pagesizes import A4  # type: ignore
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle  # type: ignore
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle  # type: ignore
+from reportlab.lib.units import inch  # type: ignore
+from reportlab.lib import colors  # type: ignore
+from reportlab.lib.enums import TA_CENTER  # type: ignore
+from inventory import count_exchange_types
+
+
+# Report styles, built once and shared by every report (ReportLab styles are read-only during builds)
+_report_sample_styles = getSampleStyleSheet()
+REPORT_TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_report_sample_styles['Heading1'],
+    fontSize=20,
+    spaceAfter=30,
+    alignment=TA_CENTER,
+    textColor=colors.darkblue
+)
+REPORT_HEADING_STYLE = ParagraphStyle(
+    'CustomHeading',
+    parent=_report_sample_styles['Heading2'],
+    fontSize=14,
+    spaceAfter=12,
+    spaceBefore=15,
+    textColor=colors.darkgreen
+)
+REPORT_NORMAL_STYLE = ParagraphStyle(
+    'ReportNormal',
+    parent=_report_sample_styles['Normal'],
+    fontSize=10,
+    spaceAfter=6
+)
+REPORT_FOOTER_STYLE = ParagraphStyle(
+    'Footer',
+    parent=REPORT_NORMAL_STYLE,
+    fontSize=8,
+    alignment=TA_CENTER,
+    textColor=colors.grey
+)
+REPORT_INFO_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 1), (-1, -1), 9),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+])
+REPORT_ACTIVITIES_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.darkgreen),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.lightgreen),
+    ('FONTSIZE', (0, 1), (-1, -1), 7),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+])
+REPORT_IMPACT_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('ALIGN', (1, 1), (1, -1), 'RIGHT'),  # Right align values
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.lightblue),
+    ('FONTSIZE', (0, 1), (-1, -1), 9),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+])
+REPORT_CONTRIBUTION_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('ALIGN', (2, 1), (3, -1), 'RIGHT'),  # Right align values
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 9),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.lightblue),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+])
+
+REPORT_LEVEL_DESCRIPTIONS = {
+    0: "Level 0 - Process identification needed",
+    1: "Level 1 - Data collection needed",
+    2: "Level 2 - Partial data available",
+    3: "Level 3 - Ready for data input"
+}
+
+
+def build_project_pdf(project_data, project_name, lci_initiated=False, user_level=0):
+    """Builds the PDF report of a project and returns its bytes (no Streamlit state is read)."""
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+    
+    # Container for the 'Flowable' objects
+    story = []
+    title_style = REPORT_TITLE_STYLE
+    heading_style = REPORT_HEADING_STYLE
+    normal_style = REPORT_NORMAL_STYLE
+    
+    # Title
+    story.append(Paragraph(f"Project Report: {project_name}", title_style))
+    story.append(Spacer(1, 12))
+    
+    # Generated timestamp
+    generated_time = pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
+    story.append(Paragraph(f"<i>Generated on: {generated_time}</i>", normal_style))
+    story.append(Spacer(1, 20))
+    
+    # Project Information Section
+    story.append(Paragraph("Project Information", heading_style))
+    
+    # Create data for basic information table
+    basic_info = [
+        ['Project Code', project_data.get('key_code', 'N/A')],
+        ['Goal Statement', project_data.get('goal_statement', project_data.get('description', 'N/A'))],
+        ['Intended Application', project_data.get('intended_application', 'N/A')],
+        ['Type of LCA Study', project_data.get('type_of_lca', project_data.get('type', 'N/A'))],
+        ['Methodology', project_data.get('methodology', 'N/A')],
+        ['Scale', project_data.get('scale', 'N/A')],
+        ['Level of Detail', project_data.get('level_of_detail', 'N/A')],
+        ['Product/System', project_data.get('product_system', 'N/A')],
+        ['System Boundaries', project_data.get('system_boundaries', 'N/A')],
+        ['Region', project_data.get('region', 'N/A')]
+    ]
+    
+    # Format Reference Flow
+    ref_flow = project_data.get('reference_flow', 'N/A')
+    ref_unit = project_data.get('reference_flow_unit', '')
+    ref_time = project_data.get('reference_flow_time_unit') or project_data.get('reference_flow_description', '')
+    if ref_flow != 'N/A' and ref_unit and ref_time:
+        reference_flow_display = f"{ref_flow} {ref_unit}/{ref_time}"
+    else:
+        reference_flow_display = str(ref_flow)
+    basic_info.append(['Reference Flow', reference_flow_display])
+    
+    # Format Functional Unit
+    functional_unit_unit = project_data.get('functional_unit_unit')
+    functional_unit_object = project_data.get('functional_unit_object')
+    if functional_unit_unit and functional_unit_object:
+        functional_unit_display = f"{functional_unit_unit} of {functional_unit_object}"
+    else:
+        functional_unit_display = project_data.get('functional_unit', 'N/A')
+    basic_info.append(['Functional Unit', functional_unit_display])
+    
+    # Create table for basic information
+    basic_table = Table(basic_info, colWidths=[2*inch, 4*inch])
+    basic_table.setStyle(REPORT_INFO_TABLE_STYLE)
+    
+    story.append(basic_table)
+    story.append(Spacer(1, 20))
+    
+    # Absolute Sustainability Section (if applicable)
+    if project_data.get('sharing_principle') and project_data.get('reason_sharing_principle'):
+        story.append(Paragraph("Absolute Sustainability Study", heading_style))
+        
+        abs_sustainability_info = [
+            ['Absolute Sustainability Study', 'Yes'],
+            ['Sharing Principle', project_data.get('sharing_principle', 'N/A')],
+            ['Reason for Sharing Principle', project_data.get('reason_sharing_principle', 'N/A')]
+        ]
+        
+        abs_table = Table(abs_sustainability_info, colWidths=[2*inch, 4*inch])
+        abs_table.setStyle(REPORT_INFO_TABLE_STYLE)
+        
+        story.append(abs_table)
+        story.append(Spacer(1, 20))
+    
+    # LCI Status Section
+    story.append(Paragraph("Life Cycle Inventory (LCI) Status", heading_style))
+    
+    has_lci_data = project_data.get('lci_data') is not None
+    
+    lci_status = "Not Started"
+    if has_lci_data:
+        lci_status = "Completed - Data Available"
+    elif lci_initiated:
+        lci_status = f"In Progress - {REPORT_LEVEL_DESCRIPTIONS.get(user_level, 'Unknown level')}"
+    
+    story.append(Paragraph(f"<b>Current LCI Status:</b> {lci_status}", normal_style))
+    story.append(Spacer(1, 12))
+    
+    # If LCI data is complete, add detailed information
+    if has_lci_data:
+        lci_data = project_data.get('lci_data', {})
+        db_name = project_data.get('lci_database_name', 'N/A')
+        upload_date = project_data.get('lci_upload_date', 'N/A')
+        
+        story.append(Paragraph("LCI Database Details", heading_style))
+        
+        # LCI summary metrics
+        activities_count = len(lci_data.get('activities', []))
+        exchanges_count = len(lci_data.get('exchanges', []))
+        biosphere_count = count_exchange_types(lci_data.get('exchanges', []), ('emission', 'resource'))
+        technosphere_count = count_exchange_types(lci_data.get('exchanges', []), ('input',))
+        
+        lci_summary = [
+            ['Database Name', db_name],
+            ['Upload Date', upload_date],
+            ['Total Activities', str(activities_count)],
+            ['Total Exchanges', str(exchanges_count)],
+            ['Biosphere Flows', str(biosphere_count)],
+            ['Technosphere Inputs', str(technosphere_count)],
+            ['Data Source', project_data.get('lci_data_source', 'User upload')]
+        ]
+        
+        # Add metadata if available
+        metadata = lci_data.get('metadata', {})
+        if metadata.get('location'):
+            lci_summary.append(['Location', metadata.get('location')])
+        if metadata.get('time_period'):
+            lci_summary.append(['Time Period', metadata.get('time_period')])
+        
+        lci_table = Table(lci_summary, colWidths=[2*inch, 4*inch])
+        lci_table.setStyle(REPORT_INFO_TABLE_STYLE)
+        
+        story.append(lci_table)
+        story.append(Spacer(1, 15))
+        
+        # Activities summary (top 10)
+        activities = lci_data.get('activities', [])
+        if activities:
+            story.append(Paragraph("Main Process Activities (Top 10)", heading_style))
+            
+            activities_data = [['Code', 'Name', 'Location', 'Unit']]
+            for i, activity in enumerate(activities[:10]):  # Limit to top 10
+                activities_data.append([
+                    str(activity.get('code', 'N/A'))[:20],  # type: ignore  # Limit length
+                    str(activity.get('name', 'N/A'))[:40],  # type: ignore
+                    str(activity.get('location', 'N/A'))[:15],  # type: ignore
+                    str(activity.get('unit', 'N/A'))[:10]  # type: ignore
+                ])
+            
+            activities_table = Table(activities_data, colWidths=[1.2*inch, 2.5*inch, 1.2*inch, 0.9*inch])
+            activities_table.setStyle(REPORT_ACTIVITIES_TABLE_STYLE)
+            
+            story.append(activities_table)
+            
+            if len(activities) > 10:
+                story.append(Paragraph(f"<i>... and {len(activities) - 10} more activities</i>", normal_style))
+            
+            story.append(Spacer(1, 15))
+    
+    # Impact Assessment Results Section
+    story.append(Paragraph("Environmental Impact Assessment Results", heading_style))
+    
+    # Check if impact assessment was performed
+    if project_data.get('impact_results'):
+        impact_results = project_data.get('impact_results', {})
+        
+        story.append(Paragraph("<b>Impact Assessment Status:</b> Completed", normal_style))
+        story.append(Spacer(1, 10))
+        
+        # Create table for impact results
+        impact_data = [['Impact Category', 'Value', 'Unit']]
+        
+        for category, data in impact_results.items():
+            impact_data.append([
+                f"{data.get('icon', '')} {category}",
+                f"{data.get('value', 0):,.3f}",
+                data.get('unit', 'N/A')
+            ])
+        
+        impact_table = Table(impact_data, colWidths=[2.5*inch, 2*inch, 1.5*inch])
+        impact_table.setStyle(REPORT_IMPACT_TABLE_STYLE)
+        
+        story.append(impact_table)
+        story.append(Spacer(1, 15))
+        
+        # Contribution analysis (top contributors per category)
+        contributions = project_data.get('impact_contributions') or {}
+        for records_key, section_title in (('activities', 'Contribution Analysis by Activity'),
+                                           ('flows', 'Contribution Analysis by Elementary Flow')):
+            records = contributions.get(records_key) or []
+            if not records:
+                continue
+            
+            story.append(Paragraph(section_title, heading_style))
+            contribution_data = [['Impact Category', 'Contributor', 'Score', 'Share']]
+            for record in records:
+                contribution_data.append([
+                    record.get('Impact Category', 'N/A'),
+                    str(record.get('Contributor', 'N/A'))[:45],
+                    f"{record.get('Score', 0):,.3f}",
+                    f"{record.get('Share', 0):.1%}"
+                ])
+            
+            contribution_table = Table(contribution_data, colWidths=[1.4*inch, 2.8*inch, 1.1*inch, 0.8*inch])
+            contribution_table.setStyle(REPORT_CONTRIBUTION_TABLE_STYLE)
+            
+            story.append(contribution_table)
+            story.append(Paragraph(
+                f"<i>Top {contributions.get('top_n', 'N/A')} contributors per category above "
+                f"{contributions.get('cutoff', 0):.0%} of the category total; the remainder is grouped as 'Other'.</i>",
+                normal_style
+            ))
+            story.append(Spacer(1, 15))
+        
+        # Interpretation guidance
+        story.append(Paragraph("Impact Interpretation Guide", heading_style))
+        
+        interpretation_text = """
+        <b>How to Interpret Results:</b><br/>
+        • <b>Climate Change (GWP):</b> Lower values indicate less contribution to global warming<br/>
+        • <b>Water Use:</b> Represents total water consumed throughout the lifecycle<br/>
+        • <b>Land Use:</b> Total land area occupied over time<br/>
+        • <b>Energy Demand:</b> Cumulative energy required (renewable + non-renewable)<br/>
+        • <b>Acidification:</b> Contribution to acid rain and soil acidification<br/>
+        • <b>Eutrophication:</b> Contribution to algal blooms and oxygen depletion in water bodies<br/>
+        <br/>
+        <b>Important Notes:</b><br/>
+        • Results are based on LCI data quality and completeness<br/>
+        • Consider uncertainty in input data when interpreting results<br/>
+        • Compare with industry benchmarks for context<br/>
+        """
+        
+        story.append(Paragraph(interpretation_text, normal_style))
+        story.append(Spacer(1, 15))
+        
+    else:
+        story.append(Paragraph("<b>Impact Assessment Status:</b> Not Performed", normal_style))
+        story.append(Paragraph("<i>Run impact assessment to calculate environmental impacts</i>", normal_style))
+        story.append(Spacer(1, 12))
+    
+    # Timestamps
+    story.append(Paragraph("Project Timeline", heading_style))
+    timeline_info = [
+        ['Created', project_data.get('created_at', 'N/A')],
+        ['Last Updated', project_data.get('updated_at', 'N/A')]
+    ]
+    
+    timeline_table = Table(timeline_info, colWidths=[2*inch, 4*inch])
+    timeline_table.setStyle(REPORT_INFO_TABLE_STYLE)
+    
+    story.append(timeline_table)
+    story.append(Spacer(1, 30))
+    
+    # Footer
+    story.append(Paragraph("Generated by Sustain 4.0 BioEngine", REPORT_FOOTER_STYLE))
+    
+    # Build PDF
+    doc.build(story)
+    return buffer.getvalue()
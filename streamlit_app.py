@@ -1,5 +1,6 @@
 import streamlit as st  # type: ignore
 import pandas as pd  # type: ignore
+import io
 from pathlib import Path
 
 # Page configuration - MUST be the first Streamlit command
@@ -55,11 +56,16 @@ st.markdown(page_bg__img, unsafe_allow_html=True)
 from utils import (  # type: ignore
     ensure_data_dir,
     ensure_path_within_data,
-    save_user_data,
+    flush_user_data,
+    mark_project_deleted,
+    mark_project_dirty,
+    mark_user_state_dirty,
     check_authentication,
     init_session_state,
     auto_save_user_data,
     clear_app_session_state,
+    export_portfolio,
+    project_report_state,
 )
 
 # Inicializar session state
@@ -231,26 +237,10 @@ with colt2:
 with colt3:
     # Logout button
     if st.button("Logout", use_container_width=True):
-        # Save user data before logging out
+        # Save pending changes before logging out
         current_user_id = st.session_state.get('user_id')
-        
-        # Retrieve existing projects
-        user_projects = st.session_state.user_projects.get(current_user_id, [])
-        
-        # Save user data before logging out
-        user_data = {
-            'projects': user_projects,
-            'preferences': {
-                'theme': st.session_state.theme,
-                'notifications': st.session_state.notifications
-            },
-            'last_update': pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S"),
-            'logout_time': pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        
-        # Save data
         if current_user_id:
-            save_user_data(current_user_id, user_data)
+            flush_user_data(current_user_id)
 
         st.logout()
         clear_app_session_state()
@@ -449,15 +439,8 @@ if st.session_state.show_project_form:
                 st.session_state.user_projects[current_user_id].append(new_project)
                 
                 # Save user data
-                user_data = {
-                    'projects': st.session_state.user_projects[current_user_id],
-                    'preferences': {
-                        'theme': st.session_state.theme,
-                        'notifications': st.session_state.notifications
-                    },
-                    'last_update': pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
-                }
-                save_user_data(current_user_id, user_data)
+                mark_project_dirty(new_project)
+                flush_user_data(current_user_id)
                 
                 st.success(f"Project '{project_name}' created successfully! Code: {key_code}")
                 st.session_state.show_project_form = False  # Close form after saving
@@ -575,6 +558,39 @@ if not st.session_state.show_project_form:
         </style>
         """, unsafe_allow_html=True)
         
+        # Bulk export of every project's report and impact results
+        if user_projects:
+            with st.expander("📦 Export All Reports"):
+                st.caption("PDF report and impact results (CSV) of every project, in one ZIP file")
+                if st.button("📄 Generate Portfolio Export", use_container_width=True, key="generate_portfolio_export"):
+                    export_progress = st.progress(0.0, text="📄 Rendering project reports...")
+                    portfolio_buffer = io.BytesIO()
+                    try:
+                        export_portfolio(
+                            user_projects,
+                            portfolio_buffer,
+                            report_states=[project_report_state(project) for project in user_projects],
+                            progress_callback=lambda done, total: export_progress.progress(
+                                done / total, text=f"📄 Reports: {done} / {total} projects"
+                            )
+                        )
+                        st.session_state.portfolio_export = {
+                            'data': portfolio_buffer.getvalue(),
+                            'file_name': f"Project_Reports_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.zip",
+                        }
+                    except Exception as e:
+                        st.error(f"❌ Error generating reports: {str(e)}")
+                
+                portfolio_export = st.session_state.get('portfolio_export')
+                if portfolio_export:
+                    st.download_button(
+                        label="⬇️ Download All Reports (ZIP)",
+                        data=portfolio_export['data'],
+                        file_name=portfolio_export['file_name'],
+                        mime="application/zip",
+                        use_container_width=True
+                    )
+        
         # Display projects in enhanced clickable cards
         for idx, project in enumerate(user_projects):
             with st.container():
@@ -600,17 +616,9 @@ if not st.session_state.show_project_form:
                         st.session_state.selected_project = idx
                         st.session_state.current_project = user_projects[idx]
                         
-                        # Save user data before navigating
-                        user_data = {
-                            'projects': st.session_state.user_projects[current_user_id],
-                            'preferences': {
-                                'theme': st.session_state.theme,
-                                'notifications': st.session_state.notifications
-                            },
-                            'selected_project_index': idx,
-                            'last_update': pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
-                        }
-                        save_user_data(current_user_id, user_data)
+                        # Save selection before navigating (projects themselves are unchanged)
+                        mark_user_state_dirty()
+                        flush_user_data(current_user_id)
                         
                         # Redirect to analysis page
                         st.switch_page("pages/01_📊_Projeto_em_Análise.py")
@@ -633,7 +641,8 @@ if not st.session_state.show_project_form:
                     with confirm_col1:
                         if st.button("🗑️ Yes, Delete", type="primary", use_container_width=True, key=f"confirm_delete_{idx}"):
                             # Remove project
-                            st.session_state.user_projects[current_user_id].pop(idx)
+                            removed_project = st.session_state.user_projects[current_user_id].pop(idx)
+                            mark_project_deleted(removed_project)
                             
                             # Adjust selected project index if necessary
                             if st.session_state.selected_project == idx:
@@ -642,15 +651,8 @@ if not st.session_state.show_project_form:
                                 st.session_state.selected_project -= 1
                             
                             # Save data
-                            user_data = {
-                                'projects': st.session_state.user_projects[current_user_id],
-                                'preferences': {
-                                    'theme': st.session_state.theme,
-                                    'notifications': st.session_state.notifications
-                                },
-                                'last_update': pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
-                            }
-                            save_user_data(current_user_id, user_data)
+                            mark_user_state_dirty()
+                            flush_user_data(current_user_id)
                             
                             st.success("Project deleted successfully!")
                             st.session_state.show_delete_confirm = False
@@ -710,14 +712,6 @@ if not st.session_state.show_project_form:
                 if st.button("🔄️ Resume Project", use_container_width=True, key="analysis_active", type="secondary"):
                     # Open project on analysis page
                     st.session_state.current_project = selected_project
-                    user_data = {
-                        'projects': st.session_state.user_projects[current_user_id],
-                        'preferences': {
-                            'theme': st.session_state.theme,
-                            'notifications': st.session_state.notifications
-                        },
-                        'selected_project_index': selected_idx,
-                        'last_update': pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
-                    }
-                    save_user_data(current_user_id, user_data)
+                    mark_user_state_dirty()
+                    flush_user_data(current_user_id)
                     st.switch_page("pages/01_📊_Projeto_em_Análise.py")
\ No newline at end of file
@@ -0,0 +1,36 @@
+"""
+Shared test setup for Sustain 4.0 BioEngine
+The app modules live at the repository root, so it is put on sys.path here
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def make_exchange(activity_code, exchange_type, flow_name, amount, unit='kg', category=None, uncertainty=None):
+    """Exchange dict as the importers produce it"""
+    return {
+        'activity_code': activity_code, 'type': exchange_type, 'flow_name': flow_name,
+        'amount': amount, 'unit': unit, 'category': category, 'uncertainty': uncertainty,
+    }
+
+
+def make_activity(code, name):
+    """Activity dict with a unit reference production"""
+    return {'code': code, 'name': name, 'unit': 'kg', 'location': 'BR', 'reference_production': 1.0}
+
+
+def two_process_inventory():
+    """P1 makes steam and emits 2 kg CO2; P2 uses 0.5 steam per unit of pellets and emits 1 kg CO2"""
+    return {
+        'activities': [make_activity('P1', 'Steam'), make_activity('P2', 'Pellets')],
+        'exchanges': [
+            make_exchange('P1', 'production', 'Steam', 1.0),
+            make_exchange('P1', 'emission', 'carbon dioxide', 2.0, category='air'),
+            make_exchange('P2', 'production', 'Pellets', 1.0),
+            make_exchange('P2', 'input', 'Steam', 0.5),
+            make_exchange('P2', 'emission', 'carbon dioxide', 1.0, category='air'),
+        ],
+    }
@@ -0,0 +1,92 @@
+"""
+Tests for the persistent biosphere3 flow index
+"""
+
+import pytest  # type: ignore
+from biosphere_index import BiosphereIndex, is_ambiguous
+
+
+def _flow(code, name, categories, unit='kg'):
+    return {'code': code, 'name': name, 'categories': categories, 'unit': unit}
+
+
+BIOSPHERE = [
+    _flow('co2-air', 'Carbon dioxide, fossil', ('air',)),
+    _flow('co2-urban', 'Carbon dioxide, fossil', ('air', 'urban air close to ground')),
+    _flow('co2-water', 'Carbon dioxide, fossil', ('water',)),
+    _flow('co2-soil', 'Carbon dioxide, from soil or biomass stock', ('air',)),
+    _flow('ch4-air', 'Methane, fossil', ('air',)),
+    _flow('water-river', 'Water, river', ('natural resource', 'in water'), unit='m3'),
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = BiosphereIndex(tmp_path / 'biosphere_index.db')
+    assert index.sync(BIOSPHERE, 'biosphere-v1')
+    return index
+
+
+def _codes(candidates):
+    return [candidate['code'] for candidate in candidates]
+
+
+def test_exact_names_rank_first_then_coverage_and_compartment(index):
+    results = index.resolve([
+        ('Methane, fossil', 'air'),
+        ('carbon dioxide fossil', 'water'),
+        ('carbon dioxide fossil', 'air'),
+    ])
+
+    methane = results[('Methane, fossil', 'air')]
+    assert methane[0]['code'] == 'ch4-air' and methane[0]['exact']
+    # Other fossil flows match on 'fossil' only
+    assert all(not candidate['exact'] and candidate['coverage'] == 0.5 for candidate in methane[1:])
+    # Full token coverage beats partial coverage; the exact compartment beats a sub-compartment
+    assert _codes(results[('carbon dioxide fossil', 'water')])[:3] == ['co2-water', 'co2-air', 'co2-urban']
+    assert _codes(results[('carbon dioxide fossil', 'air')])[:3] == ['co2-air', 'co2-urban', 'co2-water']
+    assert _codes(results[('carbon dioxide fossil', 'air')])[3] == 'co2-soil'
+    assert not is_ambiguous(results[('carbon dioxide fossil', 'air')], 'air')
+
+
+def test_terms_without_tokens_have_no_candidates(index):
+    results = index.resolve([('---', 'air'), ('', ''), ('methane', 'air')])
+
+    assert results[('---', 'air')] == []
+    assert results[('', '')] == []
+    assert _codes(results[('methane', 'air')]) == ['ch4-air']
+
+
+def test_resolutions_and_misses_are_remembered(index, monkeypatch):
+    first = index.resolve([('methane', 'air'), ('unobtainium', 'air')])
+    assert first[('unobtainium', 'air')] == []
+    index.remember_project_links('project-1', {'Methane': ('methane', 'ch4-air'), 'Dust': ('dust', None)})
+
+    # A fresh process reads stored resolutions back without searching again
+    reopened = BiosphereIndex(index.db_path)
+    monkeypatch.setattr(reopened, '_search', lambda queries: pytest.fail(f"searched {queries}"))
+    assert reopened.resolve([('methane', 'air'), ('unobtainium', 'air')]) == first
+    assert reopened.project_links('project-1') == {'Methane': ('methane', 'ch4-air'), 'Dust': ('dust', None)}
+
+
+def test_sync_with_same_fingerprint_is_a_no_op(index, monkeypatch):
+    index.resolve([('methane', 'air')])
+    index.remember_project_links('project-1', {'Methane': ('methane', 'ch4-air')})
+
+    assert index.sync(iter(()), 'biosphere-v1') is False
+    assert index.fingerprint == 'biosphere-v1'
+    monkeypatch.setattr(index, '_search', lambda queries: pytest.fail(f"searched {queries}"))
+    assert _codes(index.resolve([('methane', 'air')])[('methane', 'air')]) == ['ch4-air']
+    assert index.project_links('project-1') == {'Methane': ('methane', 'ch4-air')}
+
+
+def test_changed_fingerprint_reindexes_and_forgets_resolutions(index):
+    assert _codes(index.resolve([('methane', 'air')])[('methane', 'air')]) == ['ch4-air']
+    index.remember_project_links('project-1', {'Methane': ('methane', 'ch4-air')})
+
+    assert index.sync([_flow('ch4-new', 'Methane, non-fossil', ('air',))], 'biosphere-v2')
+
+    assert index.fingerprint == 'biosphere-v2'
+    assert _codes(index.resolve([('methane', 'air')])[('methane', 'air')]) == ['ch4-new']
+    assert index.resolve([('carbon dioxide', 'air')])[('carbon dioxide', 'air')] == []
+    assert index.project_links('project-1') == {}
@@ -0,0 +1,45 @@
+"""
+Tests for the characterization factor store
+"""
+
+import numpy as np  # type: ignore
+import pytest  # type: ignore
+from characterization import DEFAULT_METHOD_VERSION, available_method_versions, get_factor_table
+
+
+@pytest.fixture(scope='module')
+def table():
+    return get_factor_table(DEFAULT_METHOD_VERSION)
+
+
+def _score(table, category, flow_key):
+    return table.compile([flow_key])[table.category_rows([category])][0, 0]
+
+
+def test_default_version_is_bundled():
+    assert DEFAULT_METHOD_VERSION in available_method_versions()
+
+
+def test_water_volume_and_mass_agree(table):
+    one_m3 = _score(table, 'Water Use', ('water', '', 'm3'))
+    assert one_m3 == pytest.approx(1.0)
+    assert 1000 * _score(table, 'Water Use', ('water', '', 'l')) == pytest.approx(one_m3)
+    assert 1000 * _score(table, 'Water Use', ('water', '', 'kg')) == pytest.approx(one_m3)
+
+
+def test_units_convert_within_reference_unit(table):
+    assert _score(table, 'GWP', ('carbon dioxide', 'air', 'g')) == pytest.approx(1e-3)
+    assert _score(table, 'GWP', ('carbon dioxide', 'air', 't')) == pytest.approx(1e3)
+    assert _score(table, 'CED', ('electricity', 'technosphere', 'kWh')) == pytest.approx(3.6)
+
+
+def test_compartment_precedence(table):
+    # "phosphorus" only has a water-specific factor
+    assert _score(table, 'Eutrophication', ('phosphorus', 'water/surface water', 'kg')) == pytest.approx(3.06)
+    assert _score(table, 'Eutrophication', ('phosphorus', 'air', 'kg')) == 0.0
+
+
+def test_unknown_flows_and_categories_score_zero(table):
+    compiled = table.compile([('no such flow', '', 'kg')])
+    assert np.all(compiled == 0.0)
+    assert np.all(compiled[table.category_rows(['No Such Category'])] == 0.0)
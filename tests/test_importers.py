@@ -0,0 +1,167 @@
+"""
+Tests for the LCI template importers
+"""
+
+import zipfile
+from io import BytesIO
+
+import pandas as pd  # type: ignore
+import pytest  # type: ignore
+from openpyxl import Workbook  # type: ignore
+import lca_engine
+from brightway_integration import (
+    CSVBundleImporter,
+    ParquetBundleImporter,
+    SustainExcelImporter,
+    get_example_lci_file,
+    get_importer,
+)
+from conftest import make_activity, make_exchange
+from inventory import as_inventory
+from network_layout import get_process_network
+
+
+def _numeric_code_workbook(path):
+    """Template whose codes and metadata are typed as numbers, with a blank row in each table"""
+
+    workbook = Workbook()
+    metadata = workbook.active
+    metadata.title = 'Project Metadata'
+    metadata.append(['Project Name', 'Numeric codes'])
+    metadata.append(['Year', 2024])
+
+    activities = workbook.create_sheet('Process Activities')
+    activities.append(['Activity Code', 'Activity Name', 'Unit', 'Location', 'Reference Production'])
+    activities.append([101, 'Pelletizing', 'kg', 'BR', 1.0])
+    activities.append([None, None, None, None, None])
+    activities.append([102.0, 'Drying', 'kg', 'BR', 1.0])
+
+    exchanges = workbook.create_sheet('Exchanges')
+    exchanges.append(['Activity Code', 'Exchange Type', 'Flow Name', 'Amount', 'Unit', 'Category', 'Uncertainty'])
+    exchanges.append([101, 'Production', 'Pellets', 1.0, 'kg', None, None])
+    exchanges.append([101, 'Input', 'Dried bagasse', 1.1, 'kg', None, '±0.05'])
+    exchanges.append([None, None, None, None, None, None, None])
+    exchanges.append([102, 'Production', 'Dried bagasse', 1.0, 'kg', None, None])
+    exchanges.append([102, 'Emission', 7440, 0.2, 'kg', 'air', None])
+    workbook.save(path)
+
+
+def test_streamed_and_dataframe_parsers_agree_on_numeric_cells(tmp_path):
+    path = tmp_path / 'numeric_codes.xlsx'
+    _numeric_code_workbook(path)
+
+    streamed = SustainExcelImporter(str(path))
+    assert streamed.parse_excel_streaming(), streamed.validation_errors
+    tabular = SustainExcelImporter(str(path))
+    assert tabular.parse_excel(), tabular.validation_errors
+
+    assert [activity['code'] for activity in streamed.activities] == ['101', '102']
+    assert streamed.metadata == tabular.metadata == {'Project Name': 'Numeric codes', 'Year': '2024'}
+    assert streamed.activities == tabular.activities
+    assert [exchange['activity_code'] for exchange in tabular.exchanges] == ['101', '101', '102', '102']
+    for streamed_exchange, tabular_exchange in zip(streamed.exchanges, tabular.exchanges):
+        assert streamed_exchange == tabular_exchange
+    assert len(streamed.exchanges) == len(tabular.exchanges) == 4
+
+
+def test_validation_reports_exchanges_without_activity_code():
+    importer = SustainExcelImporter('unused.xlsx')
+    importer.activities = [
+        {'code': 'A1', 'name': 'Drying', 'unit': 'kg', 'location': 'BR', 'reference_production': 1.0}
+    ]
+    importer.exchanges = [
+        {'activity_code': 'A1', 'type': 'production', 'flow_name': 'Dried bagasse', 'amount': 1.0,
+         'unit': 'kg', 'category': None, 'uncertainty': None},
+        {'activity_code': None, 'type': 'emission', 'flow_name': 'carbon dioxide', 'amount': -1.0,
+         'unit': 'kg', 'category': 'air', 'uncertainty': None},
+    ]
+
+    importer._validate_data()
+
+    assert importer.validation_errors == ["❌ 1 exchange(s) have no activity code"]
+    assert importer.warnings == []
+    assert set(importer.exchange_index) == {'A1'}
+
+
+def test_engine_export_and_diagram_link_inputs_alike():
+    # 'Fermented mass' is a product name, not an activity name; 'Yeast' has no supplier
+    importer = SustainExcelImporter('unused.xlsx')
+    importer.activities = [make_activity('FERM', 'Fermentation'), make_activity('DIST', 'Distillation')]
+    importer.exchanges = [
+        make_exchange('FERM', 'production', 'Fermented mass', 1.0),
+        make_exchange('FERM', 'input', 'Yeast', 0.01),
+        make_exchange('DIST', 'production', 'Ethanol', 1.0),
+        make_exchange('DIST', 'input', 'Fermented mass', 8.0),
+        make_exchange('DIST', 'input', 'Fermentation', 0.5),
+    ]
+    lci_data = {'activities': importer.activities, 'exchanges': importer.exchanges}
+    inventory = as_inventory(lci_data)
+
+    database = importer._brightway_activities('db', linked_flows={})
+    exported = {
+        (exchange['input'][1], consumer)
+        for (_, consumer), dataset in database.items()
+        for exchange in dataset['exchanges']
+        if exchange['type'] == 'technosphere' and not exchange['input'][1].startswith('generic_')
+    }
+
+    matrices = lca_engine.get_inventory_matrices(lci_data)
+    technosphere = matrices.technosphere().tocoo()
+    codes = matrices.activity_codes
+    engine = {(codes[row], codes[col]) for row, col in zip(technosphere.row, technosphere.col) if row != col}
+
+    network = get_process_network(inventory)
+    diagram = {(network.codes[s], network.codes[t]) for s, t in zip(network.sources, network.targets)}
+
+    assert exported == engine == diagram == {('FERM', 'DIST')}
+    assert matrices.technosphere().toarray()[0, 1] == -8.5
+
+
+def _example_bundle(suffix, skip=()):
+    """The bundled example workbook re-exported as a zip with one member per sheet"""
+
+    sheets = pd.read_excel(get_example_lci_file(), sheet_name=None, header=None, dtype=object)
+    bundle = BytesIO()
+    with zipfile.ZipFile(bundle, 'w') as archive:
+        for sheet_name, df in sheets.items():
+            if sheet_name in skip:
+                continue
+            member = BytesIO()
+            if suffix == '.csv':
+                df.to_csv(member, header=False, index=False)
+            else:
+                # Parquet needs a header; the metadata member is read positionally
+                if sheet_name == 'Project Metadata':
+                    table = df.set_axis(['Key', 'Value'], axis=1)
+                else:
+                    table = df.iloc[1:].set_axis(df.iloc[0].tolist(), axis=1)
+                table.astype(str).where(table.notna(), None).to_parquet(member, index=False)
+            archive.writestr(f"bundle/{sheet_name.lower().replace(' ', '_')}{suffix}", member.getvalue())
+    bundle.seek(0)
+    return bundle
+
+
+@pytest.mark.parametrize('suffix, importer_class', [
+    ('.csv', CSVBundleImporter),
+    ('.parquet', ParquetBundleImporter),
+])
+def test_bundles_import_like_the_workbook(suffix, importer_class):
+    workbook = SustainExcelImporter(get_example_lci_file())
+    assert workbook.parse(), workbook.validation_errors
+
+    importer = get_importer(_example_bundle(suffix), 'example.zip')
+    assert isinstance(importer, importer_class)
+    assert importer.parse(), importer.validation_errors
+
+    assert importer.metadata == workbook.metadata
+    assert importer.activities == workbook.activities
+    assert importer.flow_mapping == workbook.flow_mapping
+    assert importer.inventory.content_hash() == workbook.inventory.content_hash()
+
+
+@pytest.mark.parametrize('suffix', ['.csv', '.parquet'])
+def test_bundle_missing_a_member_fails_validation(suffix):
+    importer = get_importer(_example_bundle(suffix, skip={'Exchanges'}), 'example.zip')
+
+    assert importer.parse() is False
+    assert importer.validation_errors == ["❌ Missing required sheet: Exchanges"]
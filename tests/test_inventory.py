@@ -0,0 +1,178 @@
+"""
+Tests for the columnar inventory store
+"""
+
+from collections import OrderedDict
+
+import numpy as np  # type: ignore
+import pytest  # type: ignore
+from scipy.sparse.linalg import splu  # type: ignore
+from inventory import as_inventory, diff_inventories
+import lca_engine
+from conftest import make_activity, make_exchange
+
+
+def test_exchanges_without_activity_code_are_left_unassigned():
+    inventory = as_inventory({
+        'activities': [make_activity('A1', 'Drying'), make_activity('A2', 'Pelletizing')],
+        'exchanges': [
+            make_exchange('A1', 'production', 'Dried bagasse', 1.0),
+            make_exchange(None, 'emission', 'carbon dioxide', 5.0, category='air'),
+            make_exchange('A2', 'production', 'Pellets', 1.0),
+            make_exchange('A2', 'input', 'Dried bagasse', 1.1),
+            make_exchange(None, 'production', 'Pellets', 1.0),
+        ],
+    })
+
+    index = inventory.exchange_index
+    assert set(index) == {'A1', 'A2'}
+    assert index['A1'].tolist() == [0]
+    assert index['A2'].tolist() == [2, 3]
+    assert inventory.unassigned_exchanges.tolist() == [1, 4]
+    assert inventory.product_name_index == {'Dried bagasse': 'A1', 'Pellets': 'A2'}
+
+    # The uncoded emission is not attributed to any activity
+    matrices = lca_engine.build_inventory_matrices(inventory)
+    assert len(matrices.b_values) == 0
+    assert np.count_nonzero(matrices.a_values) == 3
+
+
+def _pellet_inventory():
+    return {
+        'activities': [
+            make_activity('A1', 'Drying'), make_activity('A2', 'Pelletizing'), make_activity('A3', 'Transport')
+        ],
+        'exchanges': [
+            make_exchange('A1', 'production', 'Dried bagasse', 1.0),
+            make_exchange('A1', 'emission', 'carbon dioxide', 0.3, category='air'),
+            make_exchange('A2', 'production', 'Pellets', 1.0),
+            make_exchange('A2', 'input', 'Dried bagasse', 1.1),
+            make_exchange('A3', 'production', 'Transported pellets', 1.0),
+            make_exchange('A3', 'input', 'Pellets', 1.0),
+        ],
+    }
+
+
+def test_diff_of_reordered_inventory_is_empty():
+    old = _pellet_inventory()
+    new = _pellet_inventory()
+    new['activities'].reverse()
+    new['exchanges'] = new['exchanges'][2:4][::-1] + new['exchanges'][:2] + new['exchanges'][4:]
+
+    diff = diff_inventories(as_inventory(old), as_inventory(new))
+
+    assert diff.is_empty
+    assert sorted(diff.unchanged) == ['A1', 'A2', 'A3']
+    assert (diff.exchanges_added, diff.exchanges_removed) == (0, 0)
+
+
+def test_diff_reports_added_removed_and_changed_activities():
+    old = _pellet_inventory()
+    new = _pellet_inventory()
+    # A1 changes one amount, A3 is dropped and A4 is new
+    new['exchanges'][1] = make_exchange('A1', 'emission', 'carbon dioxide', 0.4, category='air')
+    new['activities'] = new['activities'][:2] + [make_activity('A4', 'Packaging')]
+    new['exchanges'] = new['exchanges'][:4] + [
+        make_exchange('A4', 'production', 'Packed pellets', 1.0),
+        make_exchange('A4', 'input', 'Pellets', 1.0),
+        make_exchange('A4', 'input', 'Plastic film', 0.01),
+    ]
+
+    diff = diff_inventories(as_inventory(old), as_inventory(new))
+
+    assert diff.added == ['A4']
+    assert diff.removed == ['A3']
+    assert diff.changed == ['A1']
+    assert diff.unchanged == ['A2']
+    assert sorted(diff.touched) == ['A1', 'A3', 'A4']
+    # A1: one exchange replaced; A3: two removed; A4: three added
+    assert (diff.exchanges_added, diff.exchanges_removed) == (4, 3)
+
+
+def test_diff_detects_activity_attribute_changes():
+    old = _pellet_inventory()
+    new = _pellet_inventory()
+    new['activities'][1] = dict(new['activities'][1], location='GLO')
+
+    diff = diff_inventories(as_inventory(old), as_inventory(new))
+
+    assert diff.changed == ['A2']
+    assert (diff.exchanges_added, diff.exchanges_removed) == (0, 0)
+
+
+@pytest.fixture
+def calculation_cache(monkeypatch):
+    """Empty engine caches, with a count of LU factorizations computed"""
+
+    monkeypatch.setattr(lca_engine, '_factorization_cache', OrderedDict())
+    monkeypatch.setattr(lca_engine, '_matrices_cache', OrderedDict())
+    factorizations = []
+
+    def counting_splu(matrix):
+        factorizations.append(matrix.shape)
+        return splu(matrix)
+
+    monkeypatch.setattr(lca_engine, 'splu', counting_splu)
+    return factorizations
+
+
+def _with_amount(lci_data, position, amount):
+    changed = dict(lci_data, exchanges=list(lci_data['exchanges']))
+    changed['exchanges'][position] = dict(changed['exchanges'][position], amount=amount)
+    return changed
+
+
+def test_unchanged_technosphere_reuses_the_cached_factorization(calculation_cache):
+    base = _pellet_inventory()
+    # Position 1 is a CO2 emission: only the biosphere differs
+    emissions_changed = _with_amount(base, 1, 0.4)
+
+    first = lca_engine.get_factorization(lca_engine.get_inventory_matrices(base))
+    second = lca_engine.get_factorization(lca_engine.get_inventory_matrices(emissions_changed))
+
+    assert second is first
+    assert len(calculation_cache) == 1
+
+
+def test_factorization_cache_evicts_least_recently_used(calculation_cache, monkeypatch):
+    monkeypatch.setattr(lca_engine, 'FACTORIZATION_CACHE_MAX_ENTRIES', 2)
+    # Position 3 is the A2 input of dried bagasse: every variant has its own technosphere
+    variants = [lca_engine.get_inventory_matrices(_with_amount(_pellet_inventory(), 3, amount))
+                for amount in (1.1, 1.2, 1.3)]
+    keys = [lca_engine.technosphere_hash(matrices) for matrices in variants]
+
+    lca_engine.get_factorization(variants[0])
+    lca_engine.get_factorization(variants[1])
+    lca_engine.get_factorization(variants[0])  # variants[1] becomes the least recently used
+    lca_engine.get_factorization(variants[2])
+
+    assert list(lca_engine._factorization_cache) == [keys[0], keys[2]]
+    assert len(calculation_cache) == 3
+
+    # The byte budget applies as well; a factorization larger than the budget is not kept
+    monkeypatch.setattr(lca_engine, 'FACTORIZATION_CACHE_MAX_BYTES', 1)
+    lca_engine.get_factorization(variants[1])
+    assert list(lca_engine._factorization_cache) == []
+
+
+def test_update_keeps_factorization_only_for_biosphere_changes(calculation_cache):
+    base = _pellet_inventory()
+    base_matrices = lca_engine.get_inventory_matrices(base)
+    factorization = lca_engine.get_factorization(base_matrices)
+    lca_engine.characterization_matrix(base_matrices, ['GWP'])
+
+    emissions_changed = _with_amount(base, 1, 0.4)
+    diff = diff_inventories(as_inventory(base), as_inventory(emissions_changed))
+    state = lca_engine.update_inventory_cache(base, emissions_changed, diff)
+    assert state['factorization_reused'] and state['characterization_reused']
+    new_matrices = lca_engine.get_inventory_matrices(emissions_changed)
+    assert lca_engine.get_factorization(new_matrices) is factorization
+    assert len(calculation_cache) == 1
+
+    inputs_changed = _with_amount(emissions_changed, 3, 1.3)
+    diff = diff_inventories(as_inventory(emissions_changed), as_inventory(inputs_changed))
+    state = lca_engine.update_inventory_cache(emissions_changed, inputs_changed, diff)
+    assert not state['factorization_reused']
+    assert lca_engine.technosphere_hash(new_matrices) not in lca_engine._factorization_cache
+    assert lca_engine.get_factorization(lca_engine.get_inventory_matrices(inputs_changed)) is not factorization
+    assert len(calculation_cache) == 2
@@ -0,0 +1,130 @@
+"""
+Tests for the sparse LCA calculation engine
+"""
+
+import numpy as np  # type: ignore
+import pytest  # type: ignore
+import lca_engine
+from conftest import make_activity, make_exchange, two_process_inventory
+
+
+def chain_inventory(n_activities, uncertainty=0.02):
+    """Linear supply chain: every activity consumes the next one's product and emits CO2"""
+
+    activities = [make_activity(f'A{k}', f'Product {k}') for k in range(n_activities)]
+    exchanges = []
+    for k in range(n_activities):
+        exchanges.append(make_exchange(f'A{k}', 'production', f'Product {k}', 1.0, uncertainty=uncertainty))
+        if k + 1 < n_activities:
+            exchanges.append(make_exchange(f'A{k}', 'input', f'Product {k + 1}', 0.5, uncertainty=uncertainty))
+        exchanges.append(make_exchange(f'A{k}', 'emission', 'carbon dioxide', 1.0 + k, category='air',
+                                       uncertainty=uncertainty))
+    return {'activities': activities, 'exchanges': exchanges}
+
+
+def test_two_process_system_matches_hand_calculation():
+    # For 2 units of pellets (P2): s = [1, 2], GWP = 2 * 1 + 1 * 2 = 4 kg CO2-eq
+    inventory = two_process_inventory()
+
+    matrices = lca_engine.get_inventory_matrices(inventory)
+    np.testing.assert_allclose(matrices.technosphere().toarray(), [[1.0, -0.5], [0.0, 1.0]])
+    demand = lca_engine.demand_vector(matrices, 2.0)
+    np.testing.assert_allclose(demand, [0.0, 2.0])
+    np.testing.assert_allclose(lca_engine.solve_scaling_vector(matrices, demand), [1.0, 2.0])
+
+    results = lca_engine.calculate_impacts(inventory, 2.0, ['GWP'])
+    assert results['GWP']['value'] == pytest.approx(4.0)
+
+
+@pytest.mark.parametrize('n_activities', [5, 40])
+def test_dense_and_sparse_batch_solves_agree(monkeypatch, n_activities):
+    matrices = lca_engine.get_inventory_matrices(chain_inventory(n_activities))
+    demand = lca_engine.demand_vector(matrices, 1.0, 'A0')
+    a_samples = lca_engine._sample_values(matrices.a_values, matrices.a_scales, np.random.default_rng(0), 20)
+
+    monkeypatch.setattr(lca_engine, 'DENSE_BATCH_MAX_ACTIVITIES', n_activities)
+    dense = lca_engine._solve_batch(matrices, a_samples, demand)
+    # Byte cap smaller than the batch: the stacked solve is split into several chunks
+    monkeypatch.setattr(lca_engine, 'DENSE_BATCH_MAX_BYTES', 3 * n_activities * n_activities * 8)
+    chunked = lca_engine._solve_batch(matrices, a_samples, demand)
+    monkeypatch.setattr(lca_engine, 'DENSE_BATCH_MAX_ACTIVITIES', 0)
+    sparse = lca_engine._solve_batch(matrices, a_samples, demand)
+
+    assert np.array_equal(dense, chunked)
+    np.testing.assert_allclose(dense, sparse, rtol=1e-10)
+
+
+def test_monte_carlo_is_reproducible_across_worker_counts(monkeypatch):
+    inventory = chain_inventory(10)
+    kwargs = dict(iterations=60, seed=42, chunk_size=25)
+
+    in_thread = lca_engine.run_monte_carlo(inventory, 1.0, ['GWP'], workers=1, **kwargs)
+    # Small run: the work threshold keeps it in the calling thread
+    monkeypatch.setattr(lca_engine, 'ProcessPoolExecutor', None)
+    assert np.array_equal(lca_engine.run_monte_carlo(inventory, 1.0, ['GWP'], workers=2, **kwargs)['samples'],
+                          in_thread['samples'])
+    monkeypatch.undo()
+
+    monkeypatch.setattr(lca_engine, 'MONTE_CARLO_PROCESS_MIN_WORK', 0)
+    pooled = lca_engine.run_monte_carlo(inventory, 1.0, ['GWP'], workers=2, **kwargs)
+
+    assert np.array_equal(pooled['samples'], in_thread['samples'])
+    assert pooled['samples'].shape == (60, 1)
+    assert in_thread['seed'] == 42
+
+
+def test_scenarios_match_one_calculation_per_scenario():
+    inventory = chain_inventory(6)
+    scenarios = [
+        {'name': 'Default reference', 'fu_amount': 1.0},
+        {'name': 'Bulk order', 'fu_amount': 250.0, 'reference_activity': None},
+        {'name': 'Intermediate product', 'fu_amount': 3.0, 'reference_activity': 'A2'},
+    ]
+
+    table = lca_engine.calculate_scenarios(inventory, scenarios, ['GWP', 'CED'], inventory_label='Base')
+
+    assert table['Scenario'].tolist() == [name for name in ('Default reference', 'Bulk order', 'Intermediate product')
+                                          for _ in range(2)]
+    assert table['Reference Activity'].tolist() == ['A0', 'A0', 'A0', 'A0', 'A2', 'A2']
+    assert set(table['Inventory']) == {'Base'}
+    for scenario in scenarios:
+        expected = lca_engine.calculate_impacts(inventory, scenario['fu_amount'], ['GWP', 'CED'],
+                                                scenario.get('reference_activity'))
+        rows = table[table['Scenario'] == scenario['name']].set_index('Impact Category')
+        for category, result in expected.items():
+            assert rows.loc[category, 'Value'] == pytest.approx(result['value'], rel=1e-12)
+            assert rows.loc[category, 'Unit'] == result['unit']
+    # The supply chain of A2 is A2..A5 only; A0 and A1 consume its product
+    assert table['Value'].iloc[4] == pytest.approx(3.0 * sum((1.0 + k) * 0.5 ** (k - 2) for k in range(2, 6)))
+
+
+def test_contributions_add_up_to_the_impact_total():
+    inventory = two_process_inventory()
+    total = lca_engine.calculate_impacts(inventory, 2.0, ['GWP'])['GWP']['value']
+
+    contributions = lca_engine.contribution_analysis(inventory, 2.0, ['GWP'])
+
+    by_activity = {record['Contributor']: record['Score'] for record in contributions['activities']}
+    assert by_activity == pytest.approx({'Steam (P1)': 2.0, 'Pellets (P2)': 2.0})
+    assert sum(by_activity.values()) == pytest.approx(total)
+    assert sum(record['Share'] for record in contributions['activities']) == pytest.approx(1.0)
+    assert [(record['Contributor'], record['Score']) for record in contributions['flows']] == [
+        ('carbon dioxide (air)', pytest.approx(total))
+    ]
+
+
+def test_flow_totals_match_the_impact_total():
+    inventory = two_process_inventory()
+    total = lca_engine.calculate_impacts(inventory, 2.0, ['GWP'])['GWP']['value']
+
+    flows = lca_engine.flow_analysis(inventory, 2.0, ['GWP'])
+
+    assert flows['nodes'] == ['Steam (P1)', 'Pellets (P2)']
+    # 2 units of pellets consume 1 kg of steam, which embodies P1's 2 kg CO2
+    assert flows['materials'] == [{'Source': 0, 'Target': 1, 'Amount': pytest.approx(1.0), 'Unit': 'kg'}]
+    [impact] = flows['impacts']
+    assert (impact['Source'], impact['Target']) == (0, 1)
+    # The reference activity's own emissions plus everything flowing into it make up the total
+    direct = lca_engine.contribution_analysis(inventory, 2.0, ['GWP'])['activities']
+    reference_direct = next(record['Score'] for record in direct if record['Contributor'] == 'Pellets (P2)')
+    assert reference_direct + impact['Score'] == pytest.approx(total)
@@ -0,0 +1,84 @@
+"""
+Tests for the process network layout
+"""
+
+import numpy as np  # type: ignore
+import pytest  # type: ignore
+from network_layout import MIXED_UNITS, ProcessNetwork, collapse_network, layered_layout, prefix_groups
+
+
+CODES = ['FARM-01', 'FARM-02', 'MILL-01', 'MILL-02', 'MILL-03', 'PLANT_A']
+
+
+@pytest.mark.parametrize('max_groups', [1, 2, 3, 4, 6, 10])
+def test_prefix_groups_stay_within_max_groups(max_groups):
+    groups = prefix_groups(CODES, max_groups)
+
+    assert len(groups) == len(CODES)
+    assert groups.max() + 1 <= max_groups
+    # Groups are numbered in order of first appearance
+    assert groups[0] == 0 and np.all(np.diff(np.maximum.accumulate(groups)) <= 1)
+
+
+def test_prefix_groups_prefer_separators_and_fall_back_to_characters():
+    assert prefix_groups(CODES, 3).tolist() == [0, 0, 1, 1, 1, 2]
+    assert prefix_groups(['AB1', 'AB2', 'CD1', 'CD2'], 2).tolist() == [0, 0, 1, 1]
+
+
+def _network(codes, edges, unit_labels=('kg', 'MJ')):
+    sources, targets, amounts, units = (np.array(column) for column in zip(*edges))
+    return ProcessNetwork(
+        list(codes), [f"Activity {code}" for code in codes], np.ones(len(codes), dtype=np.int64),
+        sources.astype(np.int64), targets.astype(np.int64), amounts.astype(np.float64),
+        np.ones(len(edges), dtype=np.int64), units.astype(np.int64), list(unit_labels)
+    )
+
+
+def test_collapsed_edges_merge_parallel_flows_and_sum_weights():
+    network = _network(CODES, [
+        (0, 2, 10.0, 0),  # FARM-01 -> MILL-01
+        (1, 2, 5.0, 0),   # FARM-02 -> MILL-01
+        (0, 1, 3.0, 0),   # inside the FARM group: dropped
+        (1, 4, 2.0, 0),   # FARM-02 -> MILL-03
+        (2, 5, 4.0, 0),   # MILL-01 -> PLANT_A
+        (3, 5, 1.0, 1),   # MILL-02 -> PLANT_A, in another unit
+    ])
+
+    collapsed = collapse_network(network, 3)
+
+    assert collapsed.codes == ['FARM-0*', 'MILL-0*', 'PLANT_A']
+    assert collapsed.sizes.tolist() == [2, 3, 1]
+    assert collapsed.n_activities == 6 and collapsed.grouped
+    edges = {
+        (source, target): (amount, count, unit)
+        for source, target, amount, count, unit in zip(collapsed.sources.tolist(), collapsed.targets.tolist(),
+                                                       collapsed.amounts.tolist(), collapsed.counts.tolist(),
+                                                       collapsed.unit_codes.tolist())
+    }
+    assert edges == {(0, 1): (17.0, 3, 0), (1, 2): (5.0, 2, MIXED_UNITS)}
+    assert collapsed.edge_labels() == ['17.00 kg (3 flows)', '2 flows']
+    assert collapse_network(network, 6) is network
+
+
+def test_layers_increase_along_every_edge_of_a_dag():
+    rng = np.random.default_rng(7)
+    n_nodes = 40
+    sources = rng.integers(0, n_nodes - 1, size=120)
+    targets = sources + 1 + rng.integers(0, 8, size=120)
+    keep = targets < n_nodes
+    sources, targets = sources[keep], targets[keep]
+
+    x, y = layered_layout(n_nodes, sources, targets)
+
+    assert np.all(x[sources] < x[targets])
+    # Every node of a layer gets its own slot
+    for layer in np.unique(x):
+        slots = y[x == layer]
+        assert len(np.unique(slots)) == len(slots)
+
+
+def test_cycles_share_a_layer():
+    # 0 -> 1 -> 2 -> 1 (cycle between 1 and 2) -> 3
+    x, _y = layered_layout(4, np.array([0, 1, 2, 2]), np.array([1, 2, 1, 3]))
+
+    assert x.tolist() == [0.0, 1.0, 1.0, 2.0]
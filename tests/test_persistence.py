@@ -0,0 +1,106 @@
+"""
+Tests for the SQLite project store
+"""
+
+import base64
+import json
+import queue
+import sqlite3
+
+import pytest  # type: ignore
+import utils
+
+
+class _SessionState(dict):
+    """Attribute-style dict standing in for st.session_state"""
+
+    __getattr__ = dict.__getitem__
+    __setattr__ = dict.__setitem__
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Runs a test against an empty ./data directory with a fresh connection pool"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(utils, '_db_path', None)
+    monkeypatch.setattr(utils, '_schema_ready', False)
+    monkeypatch.setattr(utils, '_db_pool', queue.LifoQueue(maxsize=utils.DB_POOL_SIZE))
+    monkeypatch.setattr(utils.st, 'session_state', _SessionState())
+    yield tmp_path / 'data'
+    while not utils._db_pool.empty():
+        utils._db_pool.get_nowait().close()
+
+
+def _legacy_database(path, user_projects, project_rows):
+    """Creates a v2 database holding projects_json blobs and already normalized project rows"""
+    path.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path / 'app_data.db')
+    for version in (1, 2):
+        for step in utils.SCHEMA_MIGRATIONS[version]:
+            conn.execute(step)
+    conn.execute("PRAGMA user_version = 2")
+    for user_id, projects in user_projects.items():
+        conn.execute(
+            "INSERT INTO user_state(user_id, projects_json, preferences_json, updated_at) VALUES (?, ?, '{}', '')",
+            (user_id, json.dumps(projects)),
+        )
+    for user_id, project in project_rows:
+        conn.execute(
+            "INSERT INTO projects(user_id, key_code, position, project_json, project_hash, updated_at) "
+            "VALUES (?, ?, 0, ?, '', '')",
+            (user_id, project['key_code'], json.dumps(project)),
+        )
+    conn.commit()
+    conn.close()
+
+
+def test_migration_moves_embedded_workbooks_to_blob_store(data_dir):
+    workbook = b'PK legacy workbook'
+    embedded = base64.b64encode(workbook).decode('ascii')
+    _legacy_database(
+        data_dir,
+        {'alice': [{'key_code': 'P1', 'name': 'Legacy', 'lci_excel_file': embedded}]},
+        [('bob', {'key_code': 'P2', 'name': 'Normalized', 'lci_excel_file': embedded})],
+    )
+
+    for user_id in ('alice', 'bob'):
+        [project] = utils.load_user_data(user_id)['projects']
+        assert 'lci_excel_file' not in project
+        with utils.open_blob(project['lci_excel_hash']) as blob:
+            assert blob.read() == workbook
+
+    with utils.db_connection() as conn:
+        stored = [row[0] for row in conn.execute("SELECT project_json FROM projects")]
+    assert len(stored) == 2
+    assert all('lci_excel_file' not in json.loads(project_json) for project_json in stored)
+
+
+def _stored_projects(user_id):
+    with utils.db_connection() as conn:
+        return {
+            key_code: (json.loads(project_json), updated_at)
+            for key_code, project_json, updated_at in conn.execute(
+                "SELECT key_code, project_json, updated_at FROM projects WHERE user_id = ?", (user_id,)
+            )
+        }
+
+
+def test_flush_writes_only_dirty_projects(data_dir):
+    projects = [{'key_code': 'P1', 'name': 'First'}, {'key_code': 'P2', 'name': 'Second'}]
+    utils.st.session_state.update(user_id='alice', user_projects={'alice': projects})
+    assert utils.flush_user_data(force=True)
+    assert utils.flush_user_data() is False
+
+    with utils.db_connection() as conn, conn:
+        conn.execute("UPDATE projects SET updated_at = 'before'")
+    projects[0]['name'] = 'First, renamed'
+    projects[1]['name'] = 'Second, renamed'
+    utils.mark_project_dirty(projects[0])
+    assert utils.flush_user_data()
+
+    stored = _stored_projects('alice')
+    assert stored['P1'][0]['name'] == 'First, renamed'
+    assert stored['P1'][1] != 'before'
+    # P2 changed in memory but was never marked dirty, so its row is untouched
+    assert stored['P2'] == ({'key_code': 'P2', 'name': 'Second'}, 'before')
+    assert utils.st.session_state._dirty_projects == set()
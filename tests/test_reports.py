@@ -0,0 +1,25 @@
+"""
+Tests for project PDF reports and the portfolio export
+"""
+
+import io
+import zipfile
+from concurrent.futures import Future
+
+import utils
+
+
+def test_portfolio_export_keeps_background_report_jobs(monkeypatch):
+    monkeypatch.setattr(utils, '_report_cache', utils.OrderedDict())
+    monkeypatch.setattr(utils, '_report_jobs', {})
+    project = {'name': 'Bagasse pellets', 'key_code': 'P1', 'description': 'Export test'}
+    key = utils.project_report_key(project, project['name'])
+    in_flight = utils._report_jobs[key] = Future()
+
+    output = io.BytesIO()
+    assert utils.export_portfolio([project], output, workers=1) == 1
+
+    assert utils._report_jobs == {key: in_flight}
+    assert key in utils._report_cache
+    with zipfile.ZipFile(output) as archive:
+        assert archive.read('001_P1_Bagasse_pellets/report.pdf') == utils._report_cache[key]
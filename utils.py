@@ -1,18 +1,35 @@
 import streamlit as st  # type: ignore
 import pandas as pd  # type: ignore
 import json
+import hashlib
+import multiprocessing
+import os
+import re
+import zipfile
+import tempfile
 import yaml  # type: ignore
 from yaml.loader import SafeLoader  # type: ignore
-from pathlib import Path
 import sqlite3
-from reportlab.lib.pagesizes import letter, A4  # type: ignore
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image  # type: ignore
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle  # type: ignore
-from reportlab.lib.units import inch  # type: ignore
-from reportlab.lib import colors  # type: ignore
-from reportlab.lib.enums import TA_CENTER, TA_LEFT  # type: ignore
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from functools import partial
 import base64
 import io
+from inventory import (  # type: ignore
+    EXCHANGE_FIELDS,
+    PYARROW_AVAILABLE,
+    LCIInventory,
+    LazyLCIData,
+    as_inventory,
+    iter_exchange_rows,
+    read_inventory_file,
+    write_inventory_file,
+)
+from project_report import build_project_pdf  # type: ignore
+from data_paths import ensure_data_dir, ensure_path_within_data  # type: ignore
 
 APP_SESSION_KEYS = {
     'authenticated',
@@ -30,140 +47,572 @@ APP_SESSION_KEYS = {
     'login_time',
     'balloons_shown',
     '_loaded_user_id',
+    'user_preferences',
+    '_dirty_projects',
+    '_deleted_projects',
+    '_user_state_dirty',
+    'portfolio_export',
 }
 
 
-def ensure_data_dir():
-    """Ensures that the data directory exists and returns its resolved path."""
-    data_dir = Path("./data").resolve()
-    data_dir.mkdir(parents=True, exist_ok=True)
-    return data_dir
+def get_database_path():
+    """Returns the SQLite database path inside ./data."""
+    return ensure_path_within_data(ensure_data_dir() / "app_data.db")
 
 
-def ensure_path_within_data(path: Path):
-    """Validates that a path resolves inside ./data."""
-    data_dir = ensure_data_dir()
-    resolved = path.resolve()
-    if resolved != data_dir and data_dir not in resolved.parents:
-        raise ValueError("Path traversal attempt blocked")
-    return resolved
+BLOB_CHUNK_SIZE = 1024 * 1024
 
 
-def get_database_path():
-    """Returns the SQLite database path inside ./data."""
-    return ensure_path_within_data(ensure_data_dir() / "app_data.db")
+def get_blob_path(digest):
+    """Returns the on-disk path of a content-addressed blob inside ./data/blobs."""
+    digest = str(digest).lower()
+    if len(digest) != 64 or any(ch not in '0123456789abcdef' for ch in digest):
+        raise ValueError("Invalid blob digest")
+    return ensure_path_within_data(ensure_data_dir() / "blobs" / digest[:2] / digest)
 
 
-def init_persistence():
-    """Creates required SQLite tables for user profiles and projects."""
-    db_path = get_database_path()
-    conn = sqlite3.connect(db_path)
+def store_blob(source):
+    """Stores bytes or a binary file object once, keyed by its SHA-256 digest."""
+    blobs_dir = ensure_path_within_data(ensure_data_dir() / "blobs")
+    blobs_dir.mkdir(parents=True, exist_ok=True)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    elif hasattr(source, 'seek'):
+        source.seek(0)
+
+    hasher = hashlib.sha256()
+    fd, tmp_name = tempfile.mkstemp(dir=blobs_dir, suffix='.tmp')
     try:
+        with os.fdopen(fd, 'wb') as tmp:
+            for chunk in iter(lambda: source.read(BLOB_CHUNK_SIZE), b''):
+                hasher.update(chunk)
+                tmp.write(chunk)
+        blob_path = get_blob_path(hasher.hexdigest())
+        if blob_path.exists():
+            # Identical content is already stored (possibly for another project)
+            os.unlink(tmp_name)
+        else:
+            blob_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_name, blob_path)
+    except Exception:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+    return hasher.hexdigest()
+
+
+def open_blob(digest):
+    """Opens a stored blob for streaming reads; returns None if it is missing."""
+    blob_path = get_blob_path(digest)
+    if not blob_path.exists():
+        return None
+    return open(blob_path, 'rb')
+
+
+def get_inventory_path(digest):
+    """Returns the on-disk path of a parsed inventory file inside ./data/inventories."""
+    digest = str(digest).lower()
+    if len(digest) != 40 or any(ch not in '0123456789abcdef' for ch in digest):
+        raise ValueError("Invalid inventory digest")
+    return ensure_path_within_data(ensure_data_dir() / "inventories" / digest[:2] / f"{digest}.arrow")
+
+
+def store_inventory(inventory):
+    """Writes an inventory's Arrow file once per content hash; returns False without pyarrow."""
+    if not PYARROW_AVAILABLE:
+        return False
+    inventory_path = get_inventory_path(inventory.content_hash())
+    if not inventory_path.exists():
+        write_inventory_file(inventory, inventory_path)
+    return True
+
+
+DB_POOL_SIZE = 8
+
+PROJECT_ROW_EXCLUDED_KEYS = ('lci_data', 'impact_results', 'lci_excel_file')
+ACTIVITY_COLUMNS = ('code', 'name', 'unit', 'location', 'reference_production')
+EXCHANGE_COLUMNS = EXCHANGE_FIELDS
+
+
+def _store_legacy_excel(project):
+    """Moves a workbook embedded as base64 (lci_excel_file) into the blob store."""
+    if project.get('lci_excel_file'):
+        project['lci_excel_hash'] = store_blob(base64.b64decode(project['lci_excel_file']))
+    project.pop('lci_excel_file', None)
+
+
+def _migrate_legacy_projects_json(conn):
+    """Moves projects stored in user_state.projects_json into the normalized tables."""
+    rows = conn.execute(
+        "SELECT user_id, projects_json FROM user_state WHERE projects_json NOT IN ('', '[]')"
+    ).fetchall()
+    for user_id, projects_json in rows:
+        projects = json.loads(projects_json or '[]')
+        for position, project in enumerate(projects):
+            _store_legacy_excel(project)
+            _write_project(conn, user_id, project, position, existing=None)
+        conn.execute("UPDATE user_state SET projects_json = '[]' WHERE user_id = ?", (user_id,))
+
+    # Project rows written before the blob store may still embed their workbook
+    rows = conn.execute(
+        "SELECT user_id, key_code, project_json FROM projects WHERE project_json LIKE '%\"lci_excel_file\"%'"
+    ).fetchall()
+    for user_id, key_code, project_json in rows:
+        project = json.loads(project_json)
+        _store_legacy_excel(project)
+        project_json = _json_text(project)
         conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS user_profiles (
-                user_id TEXT PRIMARY KEY,
-                email TEXT,
-                display_name TEXT,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL
-            )
-            """
+            "UPDATE projects SET project_json = ?, project_hash = ? WHERE user_id = ? AND key_code = ?",
+            (project_json, _content_hash(project_json), user_id, key_code),
         )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS user_state (
-                user_id TEXT PRIMARY KEY,
-                projects_json TEXT NOT NULL,
-                preferences_json TEXT NOT NULL,
-                selected_project_index INTEGER,
-                updated_at TEXT NOT NULL,
-                FOREIGN KEY(user_id) REFERENCES user_profiles(user_id)
-            )
-            """
+
+
+SCHEMA_MIGRATIONS = {
+    1: (
+        """
+        CREATE TABLE IF NOT EXISTS user_profiles (
+            user_id TEXT PRIMARY KEY,
+            email TEXT,
+            display_name TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS user_state (
+            user_id TEXT PRIMARY KEY,
+            projects_json TEXT NOT NULL,
+            preferences_json TEXT NOT NULL,
+            selected_project_index INTEGER,
+            updated_at TEXT NOT NULL,
+            FOREIGN KEY(user_id) REFERENCES user_profiles(user_id)
+        )
+        """,
+    ),
+    # Since v2, user_state.projects_json is kept empty; projects live in the tables below.
+    2: (
+        """
+        CREATE TABLE IF NOT EXISTS projects (
+            user_id TEXT NOT NULL,
+            key_code TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            project_json TEXT NOT NULL,
+            lci_metadata_json TEXT,
+            lci_flow_mapping_json TEXT,
+            project_hash TEXT NOT NULL,
+            lci_hash TEXT,
+            impacts_hash TEXT,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY(user_id, key_code)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS activities (
+            user_id TEXT NOT NULL,
+            key_code TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            code TEXT,
+            name TEXT,
+            unit TEXT,
+            location TEXT,
+            reference_production REAL,
+            PRIMARY KEY(user_id, key_code, position)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS exchanges (
+            user_id TEXT NOT NULL,
+            key_code TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            activity_code TEXT,
+            type TEXT,
+            flow_name TEXT,
+            amount REAL,
+            unit TEXT,
+            category TEXT,
+            uncertainty REAL,
+            PRIMARY KEY(user_id, key_code, position)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS impact_results (
+            user_id TEXT NOT NULL,
+            key_code TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            value REAL,
+            unit TEXT,
+            icon TEXT,
+            PRIMARY KEY(user_id, key_code, category)
         )
-        conn.commit()
+        """,
+    ),
+    # v3 records which Arrow inventory file holds each project's parsed LCI data.
+    # Legacy projects_json blobs are migrated here, once the projects table is complete.
+    3: (
+        "ALTER TABLE projects ADD COLUMN inventory_hash TEXT",
+        _migrate_legacy_projects_json,
+    ),
+}
+SCHEMA_VERSION = max(SCHEMA_MIGRATIONS)
+
+UPSERT_USER_PROFILE_SQL = """
+    INSERT INTO user_profiles(user_id, email, display_name, created_at, updated_at)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+        email=excluded.email,
+        display_name=excluded.display_name,
+        updated_at=excluded.updated_at
+"""
+
+UPSERT_USER_STATE_SQL = """
+    INSERT INTO user_state(user_id, projects_json, preferences_json, selected_project_index, updated_at)
+    VALUES (?, '[]', ?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+        preferences_json=excluded.preferences_json,
+        selected_project_index=excluded.selected_project_index,
+        updated_at=excluded.updated_at
+"""
+
+SELECT_USER_STATE_SQL = """
+    SELECT preferences_json, selected_project_index, updated_at
+    FROM user_state
+    WHERE user_id = ?
+"""
+
+UPSERT_PROJECT_SQL = """
+    INSERT INTO projects(user_id, key_code, position, project_json, lci_metadata_json,
+                         lci_flow_mapping_json, project_hash, lci_hash, inventory_hash,
+                         impacts_hash, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(user_id, key_code) DO UPDATE SET
+        position=excluded.position,
+        project_json=excluded.project_json,
+        lci_metadata_json=excluded.lci_metadata_json,
+        lci_flow_mapping_json=excluded.lci_flow_mapping_json,
+        project_hash=excluded.project_hash,
+        lci_hash=excluded.lci_hash,
+        inventory_hash=excluded.inventory_hash,
+        impacts_hash=excluded.impacts_hash,
+        updated_at=excluded.updated_at
+"""
+
+UPDATE_PROJECT_POSITION_SQL = """
+    UPDATE projects SET position = ? WHERE user_id = ? AND key_code = ? AND position != ?
+"""
+
+SELECT_PROJECT_HASHES_SQL = """
+    SELECT key_code, position, project_hash, lci_hash, impacts_hash
+    FROM projects
+    WHERE user_id = ?
+"""
+
+SELECT_PROJECTS_SQL = """
+    SELECT key_code, project_json, lci_metadata_json, lci_flow_mapping_json, lci_hash, inventory_hash
+    FROM projects
+    WHERE user_id = ?
+    ORDER BY position
+"""
+
+INSERT_ACTIVITY_SQL = """
+    INSERT INTO activities(user_id, key_code, position, code, name, unit, location, reference_production)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_EXCHANGE_SQL = """
+    INSERT INTO exchanges(user_id, key_code, position, activity_code, type, flow_name,
+                          amount, unit, category, uncertainty)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_IMPACT_RESULT_SQL = """
+    INSERT INTO impact_results(user_id, key_code, position, category, value, unit, icon)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+_db_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+_db_path = None
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+
+def _open_connection(db_path):
+    """Opens a SQLite connection tuned for concurrent Streamlit sessions."""
+    # Streamlit runs each rerun on a fresh script thread, so pooled connections
+    # are handed between threads; the pool guarantees one borrower at a time.
+    conn = sqlite3.connect(db_path, check_same_thread=False, cached_statements=64)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
+def _migrate_schema(conn):
+    """Applies pending schema migrations tracked through PRAGMA user_version."""
+    current_version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version in sorted(SCHEMA_MIGRATIONS):
+        if version <= current_version:
+            continue
+        with conn:
+            for step in SCHEMA_MIGRATIONS[version]:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+
+
+@contextmanager
+def db_connection():
+    """Borrows a pooled SQLite connection, returning it to the pool afterwards."""
+    global _db_path
+    if _db_path is None:
+        _db_path = get_database_path()
+    try:
+        conn = _db_pool.get_nowait()
+    except queue.Empty:
+        conn = _open_connection(_db_path)
+    try:
+        yield conn
+    except Exception:
+        conn.rollback()
+        raise
     finally:
-        conn.close()
+        try:
+            _db_pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+def init_persistence():
+    """Creates required SQLite tables once per process."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if _schema_ready:
+            return
+        with db_connection() as conn:
+            _migrate_schema(conn)
+        _schema_ready = True
+
+
+def _json_text(value):
+    """Serializes a value the way every persisted JSON column is written."""
+    return json.dumps(value, default=str, ensure_ascii=False, sort_keys=True)
+
+
+def _content_hash(text):
+    """Returns a short stable digest used to detect unchanged rows."""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _inventory_hash(lci_data):
+    """Returns the inventory content hash, without loading a lazy inventory that is unchanged."""
+    return getattr(lci_data, 'inventory_hash', None) or as_inventory(lci_data).content_hash()
+
+
+def _lci_hash(lci_data, inventory_hash):
+    """Returns the content digest of lci_data without JSON-encoding its exchanges."""
+    header = _json_text([lci_data.get('metadata', {}), lci_data.get('flow_mapping', {})])
+    return _content_hash(header + inventory_hash)
+
+
+def project_storage_key(project):
+    """Returns the per-user key under which a project's rows are stored."""
+    return str(project.get('key_code') or project.get('name', ''))
+
+
+def _delete_project_rows(conn, user_id, key_code, tables=('activities', 'exchanges', 'impact_results')):
+    """Removes a project's child rows from the given tables."""
+    for table in tables:
+        conn.execute(f"DELETE FROM {table} WHERE user_id = ? AND key_code = ?", (user_id, key_code))
+
+
+def _write_project(conn, user_id, project, position, existing):
+    """Upserts one project, rewriting only the parts whose content changed."""
+    key_code = project_storage_key(project)
+    project_row = {k: v for k, v in project.items() if k not in PROJECT_ROW_EXCLUDED_KEYS}
+    project_json = _json_text(project_row)
+    project_hash = _content_hash(project_json)
+
+    lci_data = project.get('lci_data')
+    inventory_hash = _inventory_hash(lci_data) if lci_data is not None else None
+    lci_hash = _lci_hash(lci_data, inventory_hash) if lci_data is not None else None
+    impact_results = project.get('impact_results') or {}
+    impacts_hash = _content_hash(_json_text(impact_results)) if impact_results else None
+
+    if existing is not None:
+        old_position, old_project_hash, old_lci_hash, old_impacts_hash = existing
+        if (old_project_hash, old_lci_hash, old_impacts_hash) == (project_hash, lci_hash, impacts_hash):
+            if old_position != position:
+                conn.execute(UPDATE_PROJECT_POSITION_SQL, (position, user_id, key_code, position))
+            return False
+    else:
+        old_lci_hash = old_impacts_hash = None
+
+    conn.execute(
+        UPSERT_PROJECT_SQL,
+        (
+            user_id,
+            key_code,
+            position,
+            project_json,
+            _json_text(lci_data.get('metadata', {})) if lci_data is not None else None,
+            _json_text(lci_data.get('flow_mapping', {})) if lci_data is not None else None,
+            project_hash,
+            lci_hash,
+            inventory_hash,
+            impacts_hash,
+            pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S"),
+        ),
+    )
+
+    if existing is None or lci_hash != old_lci_hash:
+        _delete_project_rows(conn, user_id, key_code, tables=('activities', 'exchanges'))
+        if lci_data is not None:
+            # Rows stay the source of truth; the Arrow file is a fast, lazily loaded copy
+            store_inventory(as_inventory(lci_data))
+            conn.executemany(
+                INSERT_ACTIVITY_SQL,
+                (
+                    (user_id, key_code, idx, *(act.get(col) for col in ACTIVITY_COLUMNS))
+                    for idx, act in enumerate(lci_data.get('activities', []))
+                ),
+            )
+            conn.executemany(
+                INSERT_EXCHANGE_SQL,
+                (
+                    (user_id, key_code, idx, *row)
+                    for idx, row in enumerate(iter_exchange_rows(lci_data.get('exchanges', [])))
+                ),
+            )
+
+    if existing is None or impacts_hash != old_impacts_hash:
+        _delete_project_rows(conn, user_id, key_code, tables=('impact_results',))
+        conn.executemany(
+            INSERT_IMPACT_RESULT_SQL,
+            (
+                (user_id, key_code, idx, category, data.get('value'), data.get('unit'), data.get('icon'))
+                for idx, (category, data) in enumerate(impact_results.items())
+            ),
+        )
+    return True
+
+
+def _existing_project_hashes(conn, user_id):
+    """Maps each stored project key to its position and content hashes."""
+    return {
+        row[0]: row[1:]
+        for row in conn.execute(SELECT_PROJECT_HASHES_SQL, (user_id,))
+    }
+
+
+def save_project(user_id, project, position):
+    """Upserts a single project's rows without touching the user's other projects."""
+    init_persistence()
+    with db_connection() as conn, conn:
+        existing = _existing_project_hashes(conn, user_id).get(project_storage_key(project))
+        return _write_project(conn, user_id, project, position, existing)
+
+
+def delete_project(user_id, key_code):
+    """Deletes a stored project and all of its inventory and result rows."""
+    init_persistence()
+    with db_connection() as conn, conn:
+        conn.execute("DELETE FROM projects WHERE user_id = ? AND key_code = ?", (user_id, key_code))
+        _delete_project_rows(conn, user_id, key_code)
 
 
 def upsert_user_profile(user_id, email, display_name):
     """Creates or updates the authenticated user's profile metadata."""
     init_persistence()
     now = pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
-    conn = sqlite3.connect(get_database_path())
-    try:
-        conn.execute(
-            """
-            INSERT INTO user_profiles(user_id, email, display_name, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?)
-            ON CONFLICT(user_id) DO UPDATE SET
-                email=excluded.email,
-                display_name=excluded.display_name,
-                updated_at=excluded.updated_at
-            """,
-            (user_id, email, display_name, now, now),
-        )
-        conn.commit()
-    finally:
-        conn.close()
+    with db_connection() as conn, conn:
+        conn.execute(UPSERT_USER_PROFILE_SQL, (user_id, email, display_name, now, now))
 
 
-def save_user_data(user_id, data):
-    """Saves user projects and preferences to SQLite by immutable user_id."""
-    init_persistence()
-    projects = data.get('projects', [])
-    preferences = data.get('preferences', {})
-    selected_project_index = data.get('selected_project_index')
-    updated_at = data.get('last_update', pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S"))
+def _load_impact_results(conn, user_id):
+    """Groups a user's impact result rows by project key."""
+    impacts = {}
+    for key_code, category, value, unit, icon in conn.execute(
+        "SELECT key_code, category, value, unit, icon FROM impact_results "
+        "WHERE user_id = ? ORDER BY key_code, position",
+        (user_id,),
+    ):
+        impacts.setdefault(key_code, {})[category] = {'value': value, 'unit': unit, 'icon': icon}
+    return impacts
 
-    conn = sqlite3.connect(get_database_path())
-    try:
-        conn.execute(
-            """
-            INSERT INTO user_state(user_id, projects_json, preferences_json, selected_project_index, updated_at)
-            VALUES (?, ?, ?, ?, ?)
-            ON CONFLICT(user_id) DO UPDATE SET
-                projects_json=excluded.projects_json,
-                preferences_json=excluded.preferences_json,
-                selected_project_index=excluded.selected_project_index,
-                updated_at=excluded.updated_at
-            """,
-            (
-                user_id,
-                json.dumps(projects, default=str, ensure_ascii=False),
-                json.dumps(preferences, default=str, ensure_ascii=False),
-                selected_project_index,
-                updated_at,
-            ),
+
+def _load_inventory_rows(conn, user_id, key_code):
+    """Rebuilds one project's inventory from its activity and exchange rows."""
+    activities = [
+        dict(zip(ACTIVITY_COLUMNS, row))
+        for row in conn.execute(
+            f"SELECT {', '.join(ACTIVITY_COLUMNS)} FROM activities "
+            "WHERE user_id = ? AND key_code = ? ORDER BY position",
+            (user_id, key_code),
         )
-        conn.commit()
-    finally:
-        conn.close()
+    ]
+    rows = conn.execute(
+        f"SELECT {', '.join(EXCHANGE_COLUMNS)} FROM exchanges "
+        "WHERE user_id = ? AND key_code = ? ORDER BY position",
+        (user_id, key_code),
+    ).fetchall()
+    columns = list(zip(*rows)) if rows else [() for _ in EXCHANGE_COLUMNS]
+    return LCIInventory(activities, dict(zip(EXCHANGE_COLUMNS, columns)))
+
+
+def load_project_inventory(user_id, key_code, inventory_hash=None):
+    """Loads a project's inventory, memory-mapping its Arrow file when available."""
+    if PYARROW_AVAILABLE and inventory_hash:
+        inventory_path = get_inventory_path(inventory_hash)
+        if inventory_path.exists():
+            return read_inventory_file(inventory_path)
+
+    init_persistence()
+    with db_connection() as conn:
+        inventory = _load_inventory_rows(conn, user_id, key_code)
+    if store_inventory(inventory):
+        # Projects saved before inventory files existed get one on first use
+        with db_connection() as conn, conn:
+            conn.execute(
+                "UPDATE projects SET inventory_hash = ? WHERE user_id = ? AND key_code = ? "
+                "AND inventory_hash IS NULL",
+                (inventory.content_hash(), user_id, key_code),
+            )
+    return inventory
 
 
 def load_user_data(user_id):
     """Loads user projects and preferences from SQLite by immutable user_id."""
     init_persistence()
-    conn = sqlite3.connect(get_database_path())
-    try:
-        row = conn.execute(
-            """
-            SELECT projects_json, preferences_json, selected_project_index, updated_at
-            FROM user_state
-            WHERE user_id = ?
-            """,
-            (user_id,),
-        ).fetchone()
-    finally:
-        conn.close()
+    with db_connection() as conn:
+        row = conn.execute(SELECT_USER_STATE_SQL, (user_id,)).fetchone()
+        project_rows = conn.execute(SELECT_PROJECTS_SQL, (user_id,)).fetchall()
+        impacts = _load_impact_results(conn, user_id)
+
+    projects = []
+    for key_code, project_json, metadata_json, flow_mapping_json, lci_hash, inventory_hash in project_rows:
+        project = json.loads(project_json)
+        if lci_hash is not None:
+            # Inventories are only read when a page actually touches activities/exchanges
+            project['lci_data'] = LazyLCIData(
+                json.loads(metadata_json or '{}'),
+                json.loads(flow_mapping_json or '{}'),
+                partial(load_project_inventory, user_id, key_code, inventory_hash),
+                inventory_hash,
+            )
+        if key_code in impacts:
+            project['impact_results'] = impacts[key_code]
+        projects.append(project)
 
-    if not row:
+    if not row and not projects:
         return {'projects': [], 'preferences': {}}
 
-    projects_json, preferences_json, selected_project_index, updated_at = row
+    preferences_json, selected_project_index, updated_at = row or (None, None, None)
     return {
-        'projects': json.loads(projects_json or '[]'),
+        'projects': projects,
         'preferences': json.loads(preferences_json or '{}'),
         'selected_project_index': selected_project_index,
         'last_update': updated_at,
@@ -317,9 +766,15 @@ def load_user_data_on_login(user_id):
             st.session_state.selected_project = selected_idx
             st.session_state.current_project = projects[selected_idx]
     
+    # Nothing is pending for a freshly loaded user
+    st.session_state._dirty_projects = set()
+    st.session_state._deleted_projects = set()
+    st.session_state._user_state_dirty = False
+    
     # Load personal settings
     if 'preferences' in user_data:
         preferences = user_data['preferences']
+        st.session_state.user_preferences = dict(preferences)
         if 'theme' in preferences:
             st.session_state.theme = preferences['theme']
         if 'notifications' in preferences:
@@ -329,9 +784,100 @@ def load_user_data_on_login(user_id):
     if 'custom_data' in user_data:
         st.session_state.custom_data = user_data['custom_data']
 
+def mark_project_dirty(project):
+    """Records that a project (dict or storage key) changed since the last flush."""
+    key_code = project if isinstance(project, str) else project_storage_key(project)
+    st.session_state.setdefault('_dirty_projects', set()).add(key_code)
+    st.session_state.setdefault('_deleted_projects', set()).discard(key_code)
+
+
+def mark_project_deleted(project):
+    """Records that a project (dict or storage key) was removed since the last flush."""
+    key_code = project if isinstance(project, str) else project_storage_key(project)
+    st.session_state.setdefault('_deleted_projects', set()).add(key_code)
+    st.session_state.setdefault('_dirty_projects', set()).discard(key_code)
+
+
+def mark_user_state_dirty():
+    """Records that preferences or the selected project changed since the last flush."""
+    st.session_state._user_state_dirty = True
+
+
+def _session_preferences():
+    """Builds the preferences payload from the session's current settings."""
+    preferences = dict(st.session_state.get('user_preferences') or {})
+    preferences['theme'] = st.session_state.get('theme', 'Light')
+    preferences['notifications'] = st.session_state.get('notifications', True)
+    return preferences
+
+
+def flush_user_data(user_id=None, preferences=None, force=False):
+    """Writes only the projects and user state changed since the last flush.
+
+    Returns False without touching the database when nothing is dirty.
+    """
+    user_id = user_id or st.session_state.get('user_id')
+    if not user_id:
+        return False
+
+    if preferences is not None:
+        st.session_state.user_preferences = dict(preferences)
+        mark_user_state_dirty()
+
+    projects = st.session_state.get('user_projects', {}).get(user_id, [])
+    dirty_projects = set(st.session_state.get('_dirty_projects') or ())
+    deleted_projects = set(st.session_state.get('_deleted_projects') or ())
+    user_state_dirty = bool(st.session_state.get('_user_state_dirty'))
+    if force:
+        dirty_projects = {project_storage_key(project) for project in projects}
+        user_state_dirty = True
+    if not (dirty_projects or deleted_projects or user_state_dirty):
+        return False
+
+    init_persistence()
+    with db_connection() as conn, conn:
+        for key_code in deleted_projects:
+            conn.execute("DELETE FROM projects WHERE user_id = ? AND key_code = ?", (user_id, key_code))
+            _delete_project_rows(conn, user_id, key_code)
+
+        if dirty_projects:
+            existing = _existing_project_hashes(conn, user_id)
+            for position, project in enumerate(projects):
+                key_code = project_storage_key(project)
+                if key_code in dirty_projects:
+                    _write_project(conn, user_id, project, position, existing.get(key_code))
+
+        if dirty_projects or deleted_projects:
+            # Keep stored order in sync after inserts/deletes; unchanged rows are not rewritten
+            conn.executemany(
+                UPDATE_PROJECT_POSITION_SQL,
+                (
+                    (position, user_id, project_storage_key(project), position)
+                    for position, project in enumerate(projects)
+                ),
+            )
+
+        if user_state_dirty:
+            conn.execute(
+                UPSERT_USER_STATE_SQL,
+                (
+                    user_id,
+                    json.dumps(_session_preferences(), default=str, ensure_ascii=False),
+                    st.session_state.get('selected_project'),
+                    pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S"),
+                ),
+            )
+
+    st.session_state._dirty_projects = set()
+    st.session_state._deleted_projects = set()
+    st.session_state._user_state_dirty = False
+    st.session_state.last_save_time = pd.Timestamp.now()
+    return True
+
+
 # Function to auto-save user data
 def auto_save_user_data():
-    """Auto-save user data every 5 minutes"""
+    """Flushes pending changes every 5 minutes; idle sessions write nothing"""
     user_id = st.session_state.get('user_id')
     if not user_id:
         return
@@ -341,23 +887,8 @@ def auto_save_user_data():
     
     # Check if at least 5 minutes have passed since the last save
     if (current_time - last_save).total_seconds() >= 300:  # 300 seconds = 5 minutes
-        # Retrieve existing projects
-        user_projects = st.session_state.user_projects.get(user_id, [])
-        
-        # Data to be saved
-        user_data = {
-            'projects': user_projects,
-            'preferences': {
-                'theme': st.session_state.theme,
-                'notifications': st.session_state.notifications
-            },
-            'last_update': current_time.strftime("%Y-%m-%d %H:%M:%S"),
-            'auto_saved': True
-        }
-        
-        # Save user data
-        save_user_data(user_id, user_data)
-        st.session_state.last_save_time = current_time
+        if not flush_user_data(user_id):
+            st.session_state.last_save_time = current_time
 
 
 def clear_app_session_state():
@@ -366,342 +897,183 @@ def clear_app_session_state():
         if key in APP_SESSION_KEYS or key.startswith('form_') or key.startswith('edit_'):
             del st.session_state[key]
 
-# Function to generate PDF report for project
-def generate_project_pdf(project_data, project_name):
-    """Generate a PDF report with project information"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
-    
-    # Container for the 'Flowable' objects
-    story = []
-    
-    # Define styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=20,
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        textColor=colors.darkblue
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceAfter=12,
-        spaceBefore=15,
-        textColor=colors.darkgreen
-    )
-    
-    normal_style = styles['Normal']
-    normal_style.fontSize = 10
-    normal_style.spaceAfter = 6
-    
-    # Title
-    story.append(Paragraph(f"Project Report: {project_name}", title_style))
-    story.append(Spacer(1, 12))
-    
-    # Generated timestamp
-    generated_time = pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
-    story.append(Paragraph(f"<i>Generated on: {generated_time}</i>", normal_style))
-    story.append(Spacer(1, 20))
-    
-    # Project Information Section
-    story.append(Paragraph("Project Information", heading_style))
-    
-    # Create data for basic information table
-    basic_info = [
-        ['Project Code', project_data.get('key_code', 'N/A')],
-        ['Goal Statement', project_data.get('goal_statement', project_data.get('description', 'N/A'))],
-        ['Intended Application', project_data.get('intended_application', 'N/A')],
-        ['Type of LCA Study', project_data.get('type_of_lca', project_data.get('type', 'N/A'))],
-        ['Methodology', project_data.get('methodology', 'N/A')],
-        ['Scale', project_data.get('scale', 'N/A')],
-        ['Level of Detail', project_data.get('level_of_detail', 'N/A')],
-        ['Product/System', project_data.get('product_system', 'N/A')],
-        ['System Boundaries', project_data.get('system_boundaries', 'N/A')],
-        ['Region', project_data.get('region', 'N/A')]
-    ]
-    
-    # Format Reference Flow
-    ref_flow = project_data.get('reference_flow', 'N/A')
-    ref_unit = project_data.get('reference_flow_unit', '')
-    ref_time = project_data.get('reference_flow_time_unit') or project_data.get('reference_flow_description', '')
-    if ref_flow != 'N/A' and ref_unit and ref_time:
-        reference_flow_display = f"{ref_flow} {ref_unit}/{ref_time}"
-    else:
-        reference_flow_display = str(ref_flow)
-    basic_info.append(['Reference Flow', reference_flow_display])
-    
-    # Format Functional Unit
-    functional_unit_unit = project_data.get('functional_unit_unit')
-    functional_unit_object = project_data.get('functional_unit_object')
-    if functional_unit_unit and functional_unit_object:
-        functional_unit_display = f"{functional_unit_unit} of {functional_unit_object}"
-    else:
-        functional_unit_display = project_data.get('functional_unit', 'N/A')
-    basic_info.append(['Functional Unit', functional_unit_display])
-    
-    # Create table for basic information
-    basic_table = Table(basic_info, colWidths=[2*inch, 4*inch])
-    basic_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-    ]))
-    
-    story.append(basic_table)
-    story.append(Spacer(1, 20))
-    
-    # Absolute Sustainability Section (if applicable)
-    if project_data.get('sharing_principle') and project_data.get('reason_sharing_principle'):
-        story.append(Paragraph("Absolute Sustainability Study", heading_style))
-        
-        abs_sustainability_info = [
-            ['Absolute Sustainability Study', 'Yes'],
-            ['Sharing Principle', project_data.get('sharing_principle', 'N/A')],
-            ['Reason for Sharing Principle', project_data.get('reason_sharing_principle', 'N/A')]
-        ]
-        
-        abs_table = Table(abs_sustainability_info, colWidths=[2*inch, 4*inch])
-        abs_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ]))
-        
-        story.append(abs_table)
-        story.append(Spacer(1, 20))
-    
-    # LCI Status Section
-    story.append(Paragraph("Life Cycle Inventory (LCI) Status", heading_style))
-    
-    # Check if LCI was started
+REPORT_CACHE_MAX_ENTRIES = 64
+
+_report_lock = threading.Lock()
+_report_cache = OrderedDict()  # report key -> PDF bytes
+_report_jobs = {}  # report key -> Future of a build in progress
+_report_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='report')
+
+
+def project_report_state(project_data):
+    """Returns the (lci_initiated, user_level) session values a project report shows."""
     project_key = project_data.get('key_code', project_data['name'])
     lci_initiated = st.session_state.get('lci_started', {}).get(project_key, False)
-    has_lci_data = project_data.get('lci_data') is not None
-    
-    lci_status = "Not Started"
-    if has_lci_data:
-        lci_status = "Completed - Data Available"
-    elif lci_initiated:
-        # Check user level if available
-        user_level = st.session_state.get('user_lci_level', {}).get(project_key, 0)
-        level_descriptions = {
-            0: "Level 0 - Process identification needed",
-            1: "Level 1 - Data collection needed", 
-            2: "Level 2 - Partial data available",
-            3: "Level 3 - Ready for data input"
-        }
-        lci_status = f"In Progress - {level_descriptions.get(user_level, 'Unknown level')}"
-    
-    story.append(Paragraph(f"<b>Current LCI Status:</b> {lci_status}", normal_style))
-    story.append(Spacer(1, 12))
-    
-    # If LCI data is complete, add detailed information
-    if has_lci_data:
-        lci_data = project_data.get('lci_data', {})
-        db_name = project_data.get('lci_database_name', 'N/A')
-        upload_date = project_data.get('lci_upload_date', 'N/A')
-        
-        story.append(Paragraph("LCI Database Details", heading_style))
-        
-        # LCI summary metrics
-        activities_count = len(lci_data.get('activities', []))
-        exchanges_count = len(lci_data.get('exchanges', []))
-        biosphere_count = sum(1 for e in lci_data.get('exchanges', []) 
-                             if e.get('type') in ['emission', 'resource'])
-        technosphere_count = sum(1 for e in lci_data.get('exchanges', []) 
-                                if e.get('type') == 'input')
-        
-        lci_summary = [
-            ['Database Name', db_name],
-            ['Upload Date', upload_date],
-            ['Total Activities', str(activities_count)],
-            ['Total Exchanges', str(exchanges_count)],
-            ['Biosphere Flows', str(biosphere_count)],
-            ['Technosphere Inputs', str(technosphere_count)],
-            ['Data Source', project_data.get('lci_data_source', 'User upload')]
-        ]
-        
-        # Add metadata if available
-        metadata = lci_data.get('metadata', {})
-        if metadata.get('location'):
-            lci_summary.append(['Location', metadata.get('location')])
-        if metadata.get('time_period'):
-            lci_summary.append(['Time Period', metadata.get('time_period')])
-        
-        lci_table = Table(lci_summary, colWidths=[2*inch, 4*inch])
-        lci_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ]))
-        
-        story.append(lci_table)
-        story.append(Spacer(1, 15))
-        
-        # Activities summary (top 10)
-        activities = lci_data.get('activities', [])
-        if activities:
-            story.append(Paragraph("Main Process Activities (Top 10)", heading_style))
-            
-            activities_data = [['Code', 'Name', 'Location', 'Unit']]
-            for i, activity in enumerate(activities[:10]):  # Limit to top 10
-                activities_data.append([
-                    str(activity.get('code', 'N/A'))[:20],  # type: ignore  # Limit length
-                    str(activity.get('name', 'N/A'))[:40],  # type: ignore
-                    str(activity.get('location', 'N/A'))[:15],  # type: ignore
-                    str(activity.get('unit', 'N/A'))[:10]  # type: ignore
-                ])
-            
-            activities_table = Table(activities_data, colWidths=[1.2*inch, 2.5*inch, 1.2*inch, 0.9*inch])
-            activities_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.darkgreen),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 8),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.lightgreen),
-                ('FONTSIZE', (0, 1), (-1, -1), 7),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ]))
-            
-            story.append(activities_table)
-            
-            if len(activities) > 10:
-                story.append(Paragraph(f"<i>... and {len(activities) - 10} more activities</i>", normal_style))
-            
-            story.append(Spacer(1, 15))
-    
-    # Impact Assessment Results Section
-    story.append(Paragraph("Environmental Impact Assessment Results", heading_style))
-    
-    # Check if impact assessment was performed
-    if project_data.get('impact_results'):
-        impact_results = project_data.get('impact_results', {})
-        
-        story.append(Paragraph("<b>Impact Assessment Status:</b> Completed", normal_style))
-        story.append(Spacer(1, 10))
-        
-        # Create table for impact results
-        impact_data = [['Impact Category', 'Value', 'Unit']]
-        
-        for category, data in impact_results.items():
-            impact_data.append([
-                f"{data.get('icon', '')} {category}",
-                f"{data.get('value', 0):,.3f}",
-                data.get('unit', 'N/A')
-            ])
-        
-        impact_table = Table(impact_data, colWidths=[2.5*inch, 2*inch, 1.5*inch])
-        impact_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('ALIGN', (1, 1), (1, -1), 'RIGHT'),  # Right align values
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.lightblue),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-        
-        story.append(impact_table)
-        story.append(Spacer(1, 15))
-        
-        # Interpretation guidance
-        story.append(Paragraph("Impact Interpretation Guide", heading_style))
-        
-        interpretation_text = """
-        <b>How to Interpret Results:</b><br/>
-        • <b>Climate Change (GWP):</b> Lower values indicate less contribution to global warming<br/>
-        • <b>Water Use:</b> Represents total water consumed throughout the lifecycle<br/>
-        • <b>Land Use:</b> Total land area occupied over time<br/>
-        • <b>Energy Demand:</b> Cumulative energy required (renewable + non-renewable)<br/>
-        • <b>Acidification:</b> Contribution to acid rain and soil acidification<br/>
-        • <b>Eutrophication:</b> Contribution to algal blooms and oxygen depletion in water bodies<br/>
-        <br/>
-        <b>Important Notes:</b><br/>
-        • Results are based on LCI data quality and completeness<br/>
-        • Consider uncertainty in input data when interpreting results<br/>
-        • Compare with industry benchmarks for context<br/>
-        """
-        
-        story.append(Paragraph(interpretation_text, normal_style))
-        story.append(Spacer(1, 15))
-        
-    else:
-        story.append(Paragraph("<b>Impact Assessment Status:</b> Not Performed", normal_style))
-        story.append(Paragraph("<i>Run impact assessment to calculate environmental impacts</i>", normal_style))
-        story.append(Spacer(1, 12))
-    
-    # Timestamps
-    story.append(Paragraph("Project Timeline", heading_style))
-    timeline_info = [
-        ['Created', project_data.get('created_at', 'N/A')],
-        ['Last Updated', project_data.get('updated_at', 'N/A')]
-    ]
-    
-    timeline_table = Table(timeline_info, colWidths=[2*inch, 4*inch])
-    timeline_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    user_level = st.session_state.get('user_lci_level', {}).get(project_key, 0)
+    return lci_initiated, user_level
+
+
+def project_report_key(project_data, project_name, lci_initiated=False, user_level=0):
+    """Returns the content digest of everything a project report shows."""
+    lci_data = project_data.get('lci_data')
+    lci_hash = _lci_hash(lci_data, _inventory_hash(lci_data)) if lci_data is not None else None
+    project_row = {k: v for k, v in project_data.items() if k not in PROJECT_ROW_EXCLUDED_KEYS}
+    return _content_hash(_json_text([
+        project_row, project_data.get('impact_results'), lci_hash, project_name, bool(lci_initiated), user_level
     ]))
-    
-    story.append(timeline_table)
-    story.append(Spacer(1, 30))
-    
-    # Footer
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=8,
-        alignment=TA_CENTER,
-        textColor=colors.grey
-    )
-    story.append(Paragraph("Generated by Sustain 4.0 BioEngine", footer_style))
-    
-    # Build PDF
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
+
+
+def _cache_report(key, pdf_bytes):
+    """Stores rendered report bytes, evicting the least recently used reports."""
+    with _report_lock:
+        _report_cache[key] = pdf_bytes
+        _report_cache.move_to_end(key)
+        while len(_report_cache) > REPORT_CACHE_MAX_ENTRIES:
+            _report_cache.popitem(last=False)
+
+
+def _render_report(key, project_data, project_name, lci_initiated, user_level):
+    """Builds a report on the worker thread and caches its bytes."""
+    try:
+        pdf_bytes = build_project_pdf(project_data, project_name, lci_initiated, user_level)
+        _cache_report(key, pdf_bytes)
+        return pdf_bytes
+    finally:
+        with _report_lock:
+            _report_jobs.pop(key, None)
+
+
+def request_project_pdf(project_data, project_name, lci_initiated=False, user_level=0):
+    """Returns a Future of the report's PDF bytes, rendering it in the background unless cached."""
+    key = project_report_key(project_data, project_name, lci_initiated, user_level)
+    with _report_lock:
+        pdf_bytes = _report_cache.get(key)
+        if pdf_bytes is not None:
+            _report_cache.move_to_end(key)
+            future = Future()
+            future.set_result(pdf_bytes)
+            return future
+        future = _report_jobs.get(key)
+        if future is None:
+            # Shallow snapshot: project edits replace top-level values instead of mutating them
+            future = _report_jobs[key] = _report_executor.submit(
+                _render_report, key, dict(project_data), project_name, lci_initiated, user_level
+            )
+        return future
+
+
+# Function to generate PDF report for project
+def generate_project_pdf(project_data, project_name):
+    """Generate a PDF report with project information (cached until the project changes)"""
+    lci_initiated, user_level = project_report_state(project_data)
+    future = request_project_pdf(project_data, project_name, lci_initiated, user_level)
+    return io.BytesIO(future.result())
+
+
+# Worker processes pay a start-up cost, so small batches render in the calling thread
+PORTFOLIO_DEFAULT_WORKERS = max(1, min(4, os.cpu_count() or 1))
+PORTFOLIO_PROCESS_MIN_REPORTS = 8
+
+
+def project_results_csv(project_data):
+    """Returns the impact results of a project as CSV bytes (None when not assessed)."""
+    impact_results = project_data.get('impact_results')
+    if not impact_results:
+        return None
+    df_export = pd.DataFrame([
+        {
+            'Impact Category': category,
+            'Value': data['value'],
+            'Unit': data['unit']
+        }
+        for category, data in impact_results.items()
+    ])
+    return df_export.to_csv(index=False).encode('utf-8')
+
+
+def _portfolio_folder(project_data):
+    """Returns a zip-safe, unique folder name for a project."""
+    label = f"{project_storage_key(project_data)}_{project_data.get('name', '')}"
+    return re.sub(r'[^\w.-]+', '_', label).strip('_') or 'project'
+
+
+def _report_payload(project_data):
+    """Returns a picklable copy of a project for a report worker (lazy inventories are loaded)."""
+    payload = dict(project_data)
+    lci_data = project_data.get('lci_data')
+    if lci_data is not None:
+        payload['lci_data'] = {key: lci_data.get(key) for key in ('metadata', 'flow_mapping', 'activities', 'exchanges')}
+    return payload
+
+
+def export_portfolio(projects, output, report_states=None, workers=PORTFOLIO_DEFAULT_WORKERS, progress_callback=None):
+    """
+    Writes the PDF report and impact CSV of every project into one zip archive.
+
+    Reports already in the report cache are reused; the others are rendered in worker
+    processes and streamed into the archive as they complete.
+
+    Args:
+        output: Path or writable binary file receiving the zip archive
+        report_states: (lci_initiated, user_level) per project, as returned by project_report_state
+        workers: Number of worker processes (1, or fewer than PORTFOLIO_PROCESS_MIN_REPORTS
+                 uncached reports, renders in the calling thread)
+        progress_callback: Called as progress_callback(done_projects, total_projects)
+
+    Returns:
+        int: Number of projects exported
+    """
+    projects = list(projects)
+    report_states = report_states or [(False, 0)] * len(projects)
+    total = len(projects)
+    done = 0
+
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        def write_project(idx, pdf_bytes):
+            nonlocal done
+            project = projects[idx]
+            folder = f"{idx + 1:03d}_{_portfolio_folder(project)}"
+            # PDF streams are already compressed
+            archive.writestr(f"{folder}/report.pdf", pdf_bytes, compress_type=zipfile.ZIP_STORED)
+            csv_bytes = project_results_csv(project)
+            if csv_bytes is not None:
+                archive.writestr(f"{folder}/impact_results.csv", csv_bytes)
+            done += 1
+            if progress_callback:
+                progress_callback(done, total)
+
+        pending = []
+        for idx, (project, (lci_initiated, user_level)) in enumerate(zip(projects, report_states)):
+            key = project_report_key(project, project['name'], lci_initiated, user_level)
+            with _report_lock:
+                pdf_bytes = _report_cache.get(key)
+            if pdf_bytes is not None:
+                write_project(idx, pdf_bytes)
+            else:
+                pending.append((idx, key, lci_initiated, user_level))
+
+        if workers <= 1 or len(pending) < PORTFOLIO_PROCESS_MIN_REPORTS:
+            for idx, key, lci_initiated, user_level in pending:
+                # Not _render_report: that would drop an in-flight background job for the same key
+                pdf_bytes = build_project_pdf(projects[idx], projects[idx]['name'], lci_initiated, user_level)
+                _cache_report(key, pdf_bytes)
+                write_project(idx, pdf_bytes)
+        elif pending:
+            # spawn avoids forking the multi-threaded Streamlit server process
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(pending)),
+                mp_context=multiprocessing.get_context('spawn'),
+            ) as pool:
+                futures = {
+                    pool.submit(
+                        build_project_pdf, _report_payload(projects[idx]), projects[idx]['name'], lci_initiated, user_level
+                    ): (idx, key)
+                    for idx, key, lci_initiated, user_level in pending
+                }
+                for future in as_completed(futures):
+                    idx, key = futures[future]
+                    pdf_bytes = future.result()
+                    _cache_report(key, pdf_bytes)
+                    write_project(idx, pdf_bytes)
+
+    return total